@@ -1,25 +1,19 @@
-"""KCH Daemon."""
+"""
+KCH Daemon.
 
-import asyncio
-import logging
-from typing import Optional
+This package is imported before the boot progress LED is lit, so nothing
+other than the boot path is imported here.
+"""
 
-import click
+from .boot import light_boot_led
 
-from .app import KCHDaemon
 
-LOGGER = logging.getLogger(__name__)
-
-loop = asyncio.get_event_loop()
-
-
-@click.command("kchd")
-@click.option("-v", "--verbose", is_flag=True)
-@click.option("-c", "--astoria-config-file", type=click.Path(exists=True))
-def main(*, verbose: bool, astoria_config_file: Optional[str]) -> None:
+def main() -> None:
     """KCH Daemon Application Entrypoint."""
-    kchd = KCHDaemon(verbose, astoria_config_file)
-    loop.run_until_complete(kchd.run())
+    light_boot_led()
+
+    from .cli import cli
+    cli()
 
 
 if __name__ == "__main__":
@@ -1,61 +1,174 @@
 """kchd - KCH LED Controller."""
 import asyncio
 import logging
-from typing import Dict
+from signal import SIGUSR1
+from time import perf_counter
+from typing import Dict, Optional
 
 from astoria.common.components import StateManager
+from astoria.common.ipc import RequestResponse
 
+from .config import KCHDConfig
 from .controllers import (
-    AstmetadController,
-    AstprocdController,
-    AstwifidController,
-    SystemStatusController,
+    LEDController,
+    MessageDecoder,
+    available_controllers,
+    load_controller,
 )
-from .driver import get_driver
-from .hardware import KCHLED
+from .driver import LEDDriver, ThreadedDriver, get_driver
+from .driver.cache import CACHE_FILE_NAME
+from .effects import FAST_BLINK, HEARTBEAT, NO_EFFECTS, EffectsEngine
+from .hardware import KCHLED, compact_state, led_mask
+from .metrics import Metrics
+from .ownership import (
+    FAULT_PRIORITY,
+    OVERRIDE_PRIORITY,
+    Override,
+    OwnershipTable,
+    restrict,
+)
+from .profile import SamplingProfiler
+from .pwm import PWMWorker
+from .trace import Tracer
 from .types import (
-    ControllerDictionary,
-    KCHInfo,
+    KCHIdentifyManagerRequest,
+    KCHLEDState,
     KCHManagerMessage,
-    NoKCHException,
+    KCHProfileManagerRequest,
 )
+from .watchdog import LoopWatchdog
 
 LOGGER = logging.getLogger(__name__)
 
+TRACE_FILE_NAME = "kchd-trace.bin"
+
+IDENTIFY_OVERRIDE = "identify"
+
+# While the event loop is lagging, the STATUS LED shows a red heartbeat.
+LOOP_LAG_OVERRIDE = "loop_lag"
+STATUS_MASK = led_mask([KCHLED.STATUS_RED, KCHLED.STATUS_GREEN, KCHLED.STATUS_BLUE])
+STATUS_RED_MASK = led_mask([KCHLED.STATUS_RED])
+LOOP_LAG_SIGNAL = Override(STATUS_MASK, STATUS_RED_MASK, {STATUS_RED_MASK: HEARTBEAT})
+
 
 class KCHDaemon(StateManager[KCHManagerMessage]):
     """KCH LED Controller Daemon."""
 
     name = "kchd"
 
+    _driver: LEDDriver
+
+    def __init__(
+        self,
+        verbose: bool,
+        config_file: Optional[str],
+        *,
+        kchd_config_file: Optional[str] = None,
+        profile: bool = False,
+    ) -> None:
+        self.kchd_config = KCHDConfig.load(kchd_config_file)
+        self._profile_at_start = profile
+        super().__init__(verbose, config_file)
+
+    def _setup_event_loop(self) -> None:
+        super()._setup_event_loop()
+        asyncio.get_event_loop().add_signal_handler(SIGUSR1, self.toggle_profile)
+
     def _init(self) -> None:
         self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task[None]] = None
+        self._metrics = Metrics()
+        self._setup_tracer()
+        self._state = 0
+        self._effects = EffectsEngine(
+            self._write_state,
+            tick_duration=self._metrics.effect_tick,
+        )
+
+        decoder = MessageDecoder()
+        available = available_controllers()
+        self._controllers: Dict[str, LEDController] = {}
+        for name in self.kchd_config.controllers:
+            controller_class = load_controller(name, available)
+            self._controllers[name] = controller_class(
+                self._mqtt,
+                self.request_update,
+                self._metrics,
+                self._tracer,
+                decoder,
+                self.kchd_config,
+            )
+            self._controllers[name].register_requests(self._register_request)
+        self._register_request(
+            "identify",
+            KCHIdentifyManagerRequest,
+            self.handle_identify,
+        )
+        self._register_request(
+            "profile",
+            KCHProfileManagerRequest,
+            self.handle_profile,
+        )
+        self._profiler = SamplingProfiler(
+            self.config.system.cache_dir,
+            interval=self.kchd_config.profile_interval,
+            loop=asyncio.get_event_loop(),
+        )
+        self._identify_timer: Optional[asyncio.TimerHandle] = None
+        self._overrides: Dict[str, Override] = {}
+        self._published_state: Optional[int] = None
+        self._state_published_at = float("-inf")
+        self._state_timer: Optional[asyncio.TimerHandle] = None
 
-        self._controllers: ControllerDictionary = {
-            "astmetad": AstmetadController(self._mqtt, self.update_leds),
-            "astprocd": AstprocdController(self._mqtt, self.update_leds),
-            "astwifid": AstwifidController(self._mqtt, self.update_leds),
-            "status": SystemStatusController(self._mqtt, self.update_leds),
-        }
-
-        # Create a flattened, unique set of all leds used by all controllers
-        self._leds = {
-            led
-            for controller in self._controllers.values()
-            for led in controller.leds  # type: ignore[attr-defined]
-        }
+        self._ownership = OwnershipTable()
+        for name, controller in self._controllers.items():
+            self._ownership.add(
+                name,
+                controller.mask,
+                controller.priority,
+            )
+        self._leds = self._ownership.leds
+        self._check_led_ownership()
         self._setup_driver()
-        try:
-            self._kch_info = self._driver.get_kch_info()
-        except NoKCHException as e:
-            LOGGER.exception(e)
-            self._kch_info = KCHInfo(
-                vendor="Student Robotics", product="No KCH", asset_code="SR0000",
+        LOGGER.info(f"Using {type(self._driver).__name__} for {self._kch_info.product}.")
+        driver = self._driver
+        if self.kchd_config.threaded_driver:
+            self._driver = ThreadedDriver(driver, self._metrics)
+        # The PWM worker thread writes directly, rather than through the thread.
+        self._pwm = PWMWorker(
+            driver,
+            self.kchd_config.pwm_frequency,
+            jitter=self._metrics.pwm_jitter,
+            writer=self._driver,
+        )
+        self._watchdog = LoopWatchdog(
+            self.handle_loop_lag,
+            interval=self.kchd_config.lag_interval,
+            threshold=self.kchd_config.lag_threshold,
+            lag=self._metrics.loop_lag,
+        )
+
+    def _check_led_ownership(self) -> None:
+        """Check that each LED has a single controller at the highest priority."""
+        for led, owners in self._ownership.conflicts():
+            LOGGER.warning(
+                f"{led.name} is owned by {', '.join(owners)} at the same priority, "
+                f"{owners[0]} is used.",
             )
 
+    def _setup_tracer(self) -> None:
+        """Setup the trace, in the astoria cache directory."""
+        self._tracer = Tracer(
+            self.config.system.cache_dir / TRACE_FILE_NAME,
+            self.kchd_config.trace_records,
+        )
+
     def _setup_driver(self) -> None:
-        """Setup the LED Driver."""
-        self._driver = get_driver(self._leds)
+        """Setup the LED Driver, using the cached choice of driver if possible."""
+        self._driver, self._kch_info = get_driver(
+            self._leds,
+            cache_path=self.config.system.cache_dir / CACHE_FILE_NAME,
+        )
 
     async def main(self) -> None:
         """Main loop and entrypoint."""
@@ -63,7 +176,32 @@ class KCHDaemon(StateManager[KCHManagerMessage]):
             status=KCHManagerMessage.Status.RUNNING,
             kch=self._kch_info,
         )
+        metrics_task = asyncio.ensure_future(self._publish_metrics())
+        self._watchdog.start()
+        if self._profile_at_start:
+            self._profiler.start(self.kchd_config.profile_duration)
         await self.wait_loop()
+        self._profiler.stop()
+        self._watchdog.stop()
+        metrics_task.cancel()
+        self._effects.stop()
+        self._pwm.stop()
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        if self._identify_timer is not None:
+            self._identify_timer.cancel()
+        if self._state_timer is not None:
+            self._state_timer.cancel()
+
+    async def _publish_metrics(self) -> None:
+        """Periodically publish the metrics, while connected to MQTT."""
+        interval = self.kchd_config.metrics_interval
+        if interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            if self._mqtt.is_connected:
+                self._mqtt.publish("metrics", self._metrics.snapshot())
 
     @property
     def offline_status(self) -> KCHManagerMessage:
@@ -77,34 +215,178 @@ class KCHDaemon(StateManager[KCHManagerMessage]):
             status=KCHManagerMessage.Status.STOPPED,
         )
 
+    def request_update(self) -> None:
+        """
+        Mark the LED state as dirty.
+
+        The LEDs are updated by a single flush task, so that any updates
+        requested before it runs are coalesced into one write.
+        """
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush())
+
+    async def _flush(self) -> None:
+        """Wait for further updates to coalesce, and then update the LEDs."""
+        await asyncio.sleep(self.kchd_config.update_latency)
+        # Any update requested from here on needs to schedule a new flush.
+        self._flush_task = None
+        try:
+            await self.update_leds()
+        except Exception:
+            LOGGER.exception("Unable to update the LEDs.")
+
+    def set_override(
+        self,
+        name: str,
+        override: Override,
+        priority: int = OVERRIDE_PRIORITY,
+    ) -> None:
+        """Take over some LEDs from their controllers, until the override is cleared."""
+        self._overrides[name] = override
+        self._ownership.add(name, override.mask & led_mask(self._leds), priority)
+        self.request_update()
+
+    def clear_override(self, name: str) -> None:
+        """Return the LEDs of an override to their controllers."""
+        if self._overrides.pop(name, None) is not None:
+            self._ownership.remove(name)
+            self._effects.set_effects(name, NO_EFFECTS)
+            self.request_update()
+
+    async def handle_identify(
+        self,
+        request: KCHIdentifyManagerRequest,
+    ) -> RequestResponse:
+        """Flash all of the LEDs, to identify the robot."""
+        mask = led_mask(self._leds)
+        self.set_override(IDENTIFY_OVERRIDE, Override(mask, mask, {mask: FAST_BLINK}))
+        if self._identify_timer is not None:
+            self._identify_timer.cancel()
+        self._identify_timer = asyncio.get_event_loop().call_later(
+            request.duration,
+            self.clear_override,
+            IDENTIFY_OVERRIDE,
+        )
+        return RequestResponse(uuid=request.uuid, success=True)
+
+    def toggle_profile(self, duration: Optional[float] = None) -> bool:
+        """
+        Start capturing a profile, or end the profile being captured early.
+
+        :param duration: The window of the profile, in seconds. If not given,
+            the profile_duration from the config is used.
+        :returns: True if a profile was started.
+        """
+        if self._profiler.running:
+            self._profiler.stop()
+            return False
+        return self._profiler.start(duration or self.kchd_config.profile_duration)
+
+    async def handle_profile(
+        self,
+        request: KCHProfileManagerRequest,
+    ) -> RequestResponse:
+        """Start capturing a profile, or end the profile being captured early."""
+        self.toggle_profile(request.duration)
+        return RequestResponse(uuid=request.uuid, success=True)
+
+    def handle_loop_lag(self, lagging: bool) -> None:
+        """Signal whether the event loop is lagging, on the STATUS LED and the status."""
+        if lagging:
+            LOGGER.warning("The event loop is lagging, kchd is running late.")
+            self.set_override(LOOP_LAG_OVERRIDE, LOOP_LAG_SIGNAL, FAULT_PRIORITY)
+        else:
+            LOGGER.info("The event loop has recovered.")
+            self.clear_override(LOOP_LAG_OVERRIDE)
+        self.status = KCHManagerMessage(
+            status=KCHManagerMessage.Status.RUNNING,
+            kch=self._kch_info,
+            loop_lagging=lagging,
+        )
+
     async def update_leds(self) -> None:
         """Update the LEDs on the KCH."""
+        waiting = perf_counter()
         async with self._lock:
-            state: Dict[KCHLED, bool] = {}
-            for controller in self._controllers.values():
-                partial_state = controller.get_state()  # type: ignore
-                if partial_state.keys() & state.keys():
-                    LOGGER.warning(
-                        "Multiple controllers returned the same LED.",
-                    )
-                state.update(partial_state)
-            LOGGER.debug(f"Current state: {state}")
-            self._driver.set_state(state)
+            self._metrics.lock_wait.observe(perf_counter() - waiting)
+
+            state = 0
+            for name, controller in self._controllers.items():
+                # Only the LEDs the controller has the highest priority for are used.
+                mask = self._ownership.effective_mask(name)
+                state |= controller.get_state() & mask
+                effects = controller.get_effects()
+                self._effects.set_effects(name, restrict(effects, mask))
+                brightness = controller.get_brightness()
+                self._pwm.set_brightness(name, restrict(brightness, mask))
+            for name, override in self._overrides.items():
+                mask = self._ownership.effective_mask(name)
+                state |= override.state & mask
+                self._effects.set_effects(name, restrict(override.effects, mask))
+            LOGGER.debug("Current state: %#010x", state)
+            self._tracer.state(state)
+            self._state = state
+            self._write_state()
+            self._publish_state()
+
+    def _publish_state(self) -> None:
+        """
+        Publish the state of the LEDs, if it has changed since it was last published.
+
+        Publications are at least state_interval apart, and the latest state
+        is published once the interval has passed.
+        """
+        if self._state == self._published_state or not self._mqtt.is_connected:
+            return
+        loop = asyncio.get_event_loop()
+        delay = self._state_published_at + self.kchd_config.state_interval - loop.time()
+        if delay > 0:
+            if self._state_timer is None:
+                self._state_timer = loop.call_later(delay, self._publish_delayed_state)
+            return
+        self._published_state = self._state
+        self._state_published_at = loop.time()
+        self._mqtt.publish(
+            "state",
+            KCHLEDState(state=compact_state(self._state)),
+            retain=True,
+        )
+
+    def _publish_delayed_state(self) -> None:
+        """Publish the latest state of the LEDs, once the interval has passed."""
+        self._state_timer = None
+        self._publish_state()
+
+    def _write_state(self) -> None:
+        """Write the current state to the LEDs, with the effects and PWM applied."""
+        start = perf_counter()
+        state = self._effects.apply(self._state)
+        self._pwm.set_state(state)
+        duration = perf_counter() - start
+        self._metrics.driver_write.observe(duration)
+        self._tracer.write(state, duration)
 
     async def _pre_connect(self) -> None:
         """Before connecting to MQTT, we turn on 60% boot."""
         LOGGER.info("kchd is live.")
-        self._controllers["status"].kchd_running = True
+        for controller in self._controllers.values():
+            controller.on_kchd_running()
         await self.update_leds()
         await asyncio.sleep(0.1)
 
     async def _post_connect(self) -> None:
         """After connecting to MQTT, we turn on 80% boot."""
         LOGGER.info("Connected to Event Broker")
-        self._controllers["status"].mqtt_up = True
+        for controller in self._controllers.values():
+            controller.on_mqtt_connected()
         await self.update_leds()
         await asyncio.sleep(0.1)
 
     async def _post_disconnect(self) -> None:
         """Before connecting to MQTT, we turn on 60% boot."""
         LOGGER.info("Disconnecting, turn off all LEDs.")
+        # Closed last, as handlers may update the LEDs until MQTT is disconnected.
+        if isinstance(self._driver, ThreadedDriver):
+            # Wait for the final state to reach the LEDs.
+            self._driver.close()
+        self._tracer.close()
@@ -0,0 +1,58 @@
+"""
+Light a boot progress LED as soon as kchd starts.
+
+Importing the rest of kchd, astoria and pydantic takes a while on a Pi,
+so the BOOT_60 LED is lit directly through the GPIO registers first. Only
+the standard library and kchd.hardware are imported by this module.
+
+The LED is left lit as an output, and is taken over by the driver later.
+BOOT_40 is lit earlier by boot_40.service, which must stay enabled even if
+the boot controller is, as the config is not read by the boot path.
+"""
+import mmap
+import os
+from pathlib import Path
+
+from .hardware import (
+    DEVICE_TREE_SYS_PATH,
+    GPIO_BLOCK_SIZE,
+    GPIO_FSEL_OUTPUT,
+    GPIOMEM_PATH,
+    GPSET0,
+    KCHLED,
+    is_kch_fitted,
+    set_gpio_function,
+)
+
+
+def light_boot_led(
+    led: KCHLED = KCHLED.BOOT_60,
+    *,
+    sys_path: Path = DEVICE_TREE_SYS_PATH,
+    gpiomem_path: Path = GPIOMEM_PATH,
+) -> bool:
+    """
+    Light a boot progress LED, if a KCH is fitted.
+
+    :returns: True if the LED was lit.
+    """
+    if not is_kch_fitted(sys_path):
+        return False
+
+    try:
+        fd = os.open(gpiomem_path, os.O_RDWR | os.O_SYNC)
+    except OSError:
+        return False
+    try:
+        gpiomem = mmap.mmap(fd, GPIO_BLOCK_SIZE)
+    except (OSError, ValueError):
+        return False
+    finally:
+        os.close(fd)
+
+    with gpiomem:
+        registers = memoryview(gpiomem).cast("I")
+        registers[GPSET0] = 1 << led.value
+        set_gpio_function(registers, led.value, GPIO_FSEL_OUTPUT)
+        registers.release()
+    return True
@@ -0,0 +1,44 @@
+"""KCH Daemon command line interface."""
+
+import asyncio
+from pathlib import Path
+from typing import Optional
+
+import click
+
+from .app import KCHDaemon
+from .trace import read_trace
+
+
+@click.command("kchd")
+@click.option("-v", "--verbose", is_flag=True)
+@click.option("-c", "--astoria-config-file", type=click.Path(exists=True))
+@click.option("-k", "--kchd-config-file", type=click.Path(exists=True))
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Capture a profile of kchd for profile_duration seconds after it starts.",
+)
+def cli(
+    *,
+    verbose: bool,
+    astoria_config_file: Optional[str],
+    kchd_config_file: Optional[str],
+    profile: bool,
+) -> None:
+    """KCH Daemon Application Entrypoint."""
+    kchd = KCHDaemon(
+        verbose,
+        astoria_config_file,
+        kchd_config_file=kchd_config_file,
+        profile=profile,
+    )
+    asyncio.get_event_loop().run_until_complete(kchd.run())
+
+
+@click.command("kchd-trace")
+@click.argument("trace_file", type=click.Path(exists=True, dir_okay=False))
+def trace_cli(*, trace_file: str) -> None:
+    """Decode a kchd trace file."""
+    for record in read_trace(Path(trace_file)):
+        click.echo(record.format())
@@ -0,0 +1,177 @@
+"""
+Configuration schema for kchd.
+
+Astoria forbids unknown sections in astoria.toml, so the kchd specific
+settings are stored in their own file, kchd.toml. All of the settings
+are optional, and the defaults are used if no file is found.
+"""
+import enum
+import sys
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from astoria.common.code_status import CodeStatus
+from astoria.common.metadata import RobotMode
+from pydantic import BaseModel, parse_obj_as, validator
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
+
+
+class Colour(str, enum.Enum):
+    """A colour of an RGB LED, each of which is red, green and blue on or off."""
+
+    OFF = "off"
+    RED = "red"
+    GREEN = "green"
+    BLUE = "blue"
+    YELLOW = "yellow"
+    CYAN = "cyan"
+    MAGENTA = "magenta"
+    WHITE = "white"
+
+    @property
+    def channels(self) -> Tuple[bool, bool, bool]:
+        """Whether each of red, green and blue is on."""
+        return COLOUR_CHANNELS[self]
+
+
+COLOUR_CHANNELS = {
+    Colour.OFF: (False, False, False),
+    Colour.RED: (True, False, False),
+    Colour.GREEN: (False, True, False),
+    Colour.BLUE: (False, False, True),
+    Colour.YELLOW: (True, True, False),
+    Colour.CYAN: (False, True, True),
+    Colour.MAGENTA: (True, False, True),
+    Colour.WHITE: (True, True, True),
+}
+
+DEFAULT_CODE_STATUS_COLOURS = {
+    CodeStatus.STARTING: Colour.CYAN,
+    CodeStatus.RUNNING: Colour.YELLOW,
+    CodeStatus.KILLED: Colour.MAGENTA,
+    CodeStatus.FINISHED: Colour.GREEN,
+    CodeStatus.CRASHED: Colour.RED,
+}
+
+
+class ColoursConfig(BaseModel):
+    """
+    Config schema for the colours that show the state of astoria.
+
+    They are compiled into a table of LED states by each controller when
+    kchd starts, so they cost nothing to look up.
+    """
+
+    # The colour of the STATUS LED for each status of the usercode, by the
+    # value of the status, for example code_crashed. Statuses that are not
+    # given keep their default colour.
+    code_status: Dict[CodeStatus, Colour] = DEFAULT_CODE_STATUS_COLOURS
+
+    # The colour of the STATUS LED when there is no usercode status.
+    no_code_status: Colour = Colour.OFF
+
+    # The statuses of the usercode in which the STATUS LED blinks.
+    blink: List[CodeStatus] = [CodeStatus.CRASHED]
+
+    # The modes of the robot in which the COMP LED is lit.
+    comp_modes: List[RobotMode] = [RobotMode.COMP]
+
+    class Config:
+        """Pydantic config."""
+
+        extra = "forbid"
+
+    @validator("code_status")
+    def _fill_code_status(
+        cls,
+        code_status: Dict[CodeStatus, Colour],
+    ) -> Dict[CodeStatus, Colour]:
+        return {**DEFAULT_CODE_STATUS_COLOURS, **code_status}
+
+
+class KCHDConfig(BaseModel):
+    """Config schema for kchd."""
+
+    # The maximum time in seconds that an LED update is delayed by, in order
+    # to coalesce it with other updates. Zero coalesces within one loop tick.
+    update_latency: float = 0.0
+
+    # How often to publish metrics to astoria/kchd/metrics, in seconds.
+    # Zero disables the publication of metrics.
+    metrics_interval: float = 10.0
+
+    # The number of software PWM periods per second, used to set the brightness
+    # of the RGB LEDs. Zero disables PWM, and any LED with a brightness is fully on.
+    pwm_frequency: float = 100.0
+
+    # Write the LEDs from a dedicated thread, so that a slow driver does not
+    # block the event loop. States are dropped if the driver is still busy.
+    threaded_driver: bool = False
+
+    # The number of records kept in the trace, kchd-trace.bin in the astoria
+    # cache directory. Zero disables the trace.
+    trace_records: int = 65536
+
+    # The minimum time in seconds between publications of the state of the
+    # LEDs to astoria/kchd/state. The state is only published when it changes.
+    state_interval: float = 0.1
+
+    # The scheduling lag of the event loop in seconds, above which kchd is
+    # lagging, and how often the lag is sampled. Zero disables the watchdog.
+    lag_threshold: float = 0.1
+    lag_interval: float = 0.25
+
+    # The window of a profile captured with --profile, SIGUSR1 or a profile
+    # request, and the time between its samples, in seconds.
+    profile_duration: float = 30.0
+    profile_interval: float = 0.005
+
+    # The LED controllers to enable, by name, see kchd.controllers.registry.
+    # If an LED has more than one controller, the first one listed is used.
+    controllers: List[str] = [
+        "astmetad", "astprocd", "astwifid", "request", "status",
+    ]
+
+    # The colours that show the state of astoria, see ColoursConfig.
+    colours: ColoursConfig = ColoursConfig()
+
+    class Config:
+        """Pydantic config."""
+
+        extra = "forbid"
+
+    @classmethod
+    def _get_config_path(cls, config_str: Optional[str] = None) -> Optional[Path]:
+        """Check for a config file or search the filesystem for one."""
+        CONFIG_SEARCH_PATHS = [
+            Path("kchd.toml"),
+            Path("/etc/kchd.toml"),
+        ]
+        if config_str is None:
+            for path in CONFIG_SEARCH_PATHS:
+                if path.exists() and path.is_file():
+                    return path
+            return None
+        else:
+            path = Path(config_str)
+            if path.exists() and path.is_file():
+                return path
+        raise FileNotFoundError("Unable to find config file.")
+
+    @classmethod
+    def load(cls, config_str: Optional[str] = None) -> 'KCHDConfig':
+        """Load the config, using the defaults if there is no config file."""
+        config_path = cls._get_config_path(config_str)
+        if config_path is None:
+            return cls()
+        with config_path.open("rb") as fh:
+            return cls.load_from_file(fh)
+
+    @classmethod
+    def load_from_file(cls, fh: BinaryIO) -> 'KCHDConfig':
+        """Load the config from a file."""
+        return parse_obj_as(cls, tomllib.load(fh))
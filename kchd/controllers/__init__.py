@@ -1,17 +1,46 @@
-"""LED Controllers."""
+"""
+LED Controllers.
+
+The built in controllers are only imported when they are first used, see
+kchd.controllers.registry.
+"""
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-from .astmetad import AstmetadController
-from .astprocd import AstprocdController
-from .astwifid import AstwifidController
 from .controller import LEDController
-from .request import MQTTRequestController
-from .system_status import SystemStatusController
+from .decode import MessageDecoder
+from .registry import (
+    BUILTIN_CONTROLLERS,
+    available_controllers,
+    load_controller,
+)
+
+if TYPE_CHECKING:
+    from .astmetad import AstmetadController
+    from .astprocd import AstprocdController
+    from .astwifid import AstwifidController
+    from .boot import BootController
+    from .request import MQTTRequestController
+    from .system_status import SystemStatusController
 
 __all__ = [
     "AstmetadController",
     "AstprocdController",
     "AstwifidController",
+    "BootController",
     "LEDController",
+    "MessageDecoder",
     "MQTTRequestController",
     "SystemStatusController",
+    "available_controllers",
+    "load_controller",
 ]
+
+
+def __getattr__(name: str) -> object:
+    """Import a built in controller class when it is first used."""
+    for value in BUILTIN_CONTROLLERS.values():
+        module, _, attr = value.partition(":")
+        if attr == name:
+            return getattr(import_module(module), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
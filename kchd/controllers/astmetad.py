@@ -1,19 +1,18 @@
 """LED Controllers."""
 
-import logging
-from json import JSONDecodeError, loads
-from typing import Callable, Coroutine, Dict, Match, Optional
+from typing import Callable, Match, cast
 
 from astoria.common.ipc import MetadataManagerMessage
 from astoria.common.metadata import RobotMode
 from astoria.common.mqtt.wrapper import MQTTWrapper
-from pydantic import ValidationError, parse_obj_as
 
-from kchd.hardware import KCHLED
+from kchd.config import KCHDConfig
+from kchd.hardware import KCHLED, led_mask
+from kchd.metrics import Metrics
+from kchd.trace import Tracer
 
 from .controller import LEDController
-
-LOGGER = logging.getLogger(__name__)
+from .decode import Field, MessageDecoder, MessageSchema
 
 
 class AstmetadController(LEDController):
@@ -23,19 +22,35 @@ class AstmetadController(LEDController):
     It determines the state of the LEDs based on the astmetad state.
     """
 
+    __slots__ = ("_state", "_table")
+
     leds = [KCHLED.COMP]
+    mask = led_mask(leds)
+
+    schema = MessageSchema(
+        MetadataManagerMessage,
+        {"mode": Field(("metadata", "mode"), RobotMode)},
+    )
 
     def __init__(
         self,
         mqtt: MQTTWrapper,
-        update_coro: Callable[[], Coroutine[None, None, None]],
+        request_update: Callable[[], None],
+        metrics: Metrics,
+        tracer: Tracer,
+        decoder: MessageDecoder,
+        config: KCHDConfig,
     ) -> None:
-        self._mqtt = mqtt
-        self._update_coro = update_coro
+        super().__init__(mqtt, request_update, metrics, tracer, decoder, config)
 
-        self._mqtt.subscribe("astmetad", self.handle_astmetad_manager_message)
+        self._subscribe("astmetad", self.handle_astmetad_manager_message)
 
-        self._mode: Optional[RobotMode] = None
+        self._state = 0
+        # The state of the LED in each mode.
+        self._table = {
+            mode: self.mask if mode in config.colours.comp_modes else 0
+            for mode in RobotMode
+        }
 
     async def handle_astmetad_manager_message(
             self,
@@ -43,21 +58,14 @@ class AstmetadController(LEDController):
             payload: str,
     ) -> None:
         """Event handler for astprocd state changes."""
-        if payload:
-            try:
-                data = loads(payload)
-                manager_message = parse_obj_as(MetadataManagerMessage, data)
-                self._mode = manager_message.metadata.mode
-                await self._update_coro()
-            except ValidationError:
-                LOGGER.warning("Received bad manager message.")
-            except JSONDecodeError:
-                LOGGER.warning("Received bad JSON in manager message.")
-        else:
-            LOGGER.warning("Received empty manager message.")
-
-    def get_state(self) -> Dict[KCHLED, bool]:
+        if self._is_duplicate(match.group(0), payload):
+            return
+
+        fields = self._decode(match.group(0), payload, self.schema)
+        if fields is not None:
+            self._state = self._table[cast(RobotMode, fields["mode"])]
+            self._request_update()
+
+    def get_state(self) -> int:
         """Get the state of controlled LEDs."""
-        return {
-            KCHLED.COMP: self._mode is RobotMode.COMP,
-        }
+        return self._state
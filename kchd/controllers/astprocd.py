@@ -1,19 +1,52 @@
 """LED Controllers."""
 
-import logging
-from json import JSONDecodeError, loads
-from typing import Callable, Coroutine, Dict, Match, Optional, Tuple
+from typing import Callable, Dict, List, Match, Optional, Tuple, cast
 
 from astoria.common.code_status import CodeStatus
 from astoria.common.ipc import ProcessManagerMessage
 from astoria.common.mqtt.wrapper import MQTTWrapper
-from pydantic import ValidationError, parse_obj_as
 
-from kchd.hardware import KCHLED
+from kchd.config import Colour, ColoursConfig, KCHDConfig
+from kchd.effects import BLINK, NO_EFFECTS, Effects
+from kchd.hardware import KCHLED, led_mask
+from kchd.metrics import Metrics
+from kchd.trace import Tracer
 
 from .controller import LEDController
+from .decode import Field, MessageDecoder, MessageSchema, is_present
 
-LOGGER = logging.getLogger(__name__)
+STATUS_LEDS = (KCHLED.STATUS_RED, KCHLED.STATUS_GREEN, KCHLED.STATUS_BLUE)
+CODE_MASK = led_mask([KCHLED.CODE])
+
+# The state and effects of the LEDs, by code status and whether there is code.
+StatusTable = Dict[Tuple[Optional[CodeStatus], bool], Tuple[int, Effects]]
+
+
+def optional_code_status(value: object) -> Optional[CodeStatus]:
+    """Convert the code status of a process manager message, which may be null."""
+    return None if value is None else CodeStatus(value)
+
+
+def colour_mask(colour: Colour) -> int:
+    """Get the bitmask of the STATUS LED in a colour."""
+    return led_mask(led for led, on in zip(STATUS_LEDS, colour.channels) if on)
+
+
+def compile_status_table(colours: ColoursConfig) -> StatusTable:
+    """Compile the colours of each code status into a table of LED states."""
+    status_colours: List[Tuple[Optional[CodeStatus], Colour]] = [
+        (None, colours.no_code_status),
+        *colours.code_status.items(),
+    ]
+    table: StatusTable = {}
+    for status, colour in status_colours:
+        effects: Effects = NO_EFFECTS
+        if status in colours.blink:
+            effects = {led_mask(STATUS_LEDS): BLINK}
+        for code in (False, True):
+            state = colour_mask(colour) | (CODE_MASK if code else 0)
+            table[status, code] = (state, effects)
+    return table
 
 
 class AstprocdController(LEDController):
@@ -23,20 +56,35 @@ class AstprocdController(LEDController):
     It determines the state of the LEDs based on the astprocd state.
     """
 
+    __slots__ = ("_state", "_effects", "_table")
+
     leds = [KCHLED.STATUS_RED, KCHLED.STATUS_GREEN, KCHLED.STATUS_BLUE, KCHLED.CODE]
+    mask = led_mask(leds)
+
+    schema = MessageSchema(
+        ProcessManagerMessage,
+        {
+            "code_status": Field(("code_status",), optional_code_status),
+            "code": Field(("disk_info",), is_present),
+        },
+    )
 
     def __init__(
         self,
         mqtt: MQTTWrapper,
-        update_coro: Callable[[], Coroutine[None, None, None]],
+        request_update: Callable[[], None],
+        metrics: Metrics,
+        tracer: Tracer,
+        decoder: MessageDecoder,
+        config: KCHDConfig,
     ) -> None:
-        self._mqtt = mqtt
-        self._update_coro = update_coro
+        super().__init__(mqtt, request_update, metrics, tracer, decoder, config)
 
-        self._mqtt.subscribe("astprocd", self.handle_astprocd_manager_message)
+        self._subscribe("astprocd", self.handle_astprocd_manager_message)
 
-        self._code: bool = False
-        self._status: Optional[CodeStatus] = None
+        self._state = 0
+        self._effects = NO_EFFECTS
+        self._table = compile_status_table(config.colours)
 
     async def handle_astprocd_manager_message(
             self,
@@ -44,41 +92,19 @@ class AstprocdController(LEDController):
             payload: str,
     ) -> None:
         """Event handler for astprocd state changes."""
-        if payload:
-            try:
-                data = loads(payload)
-                manager_message = parse_obj_as(ProcessManagerMessage, data)
-                self._code = manager_message.disk_info is not None
-                self._status = manager_message.code_status
-                await self._update_coro()
-            except ValidationError:
-                LOGGER.warning("Received bad manager message.")
-            except JSONDecodeError:
-                LOGGER.warning("Received bad JSON in manager message.")
-        else:
-            LOGGER.warning("Received empty manager message.")
-
-    def get_led_status_from_code_status(
-        self,
-        status: Optional[CodeStatus],
-    ) -> Tuple[bool, bool, bool]:
-        """Get the RGB state of the OK LED from a CodeStatus."""
-        status_map = {
-            CodeStatus.STARTING: (False, True, True),  # Cyan
-            CodeStatus.RUNNING: (True, True, False),  # Yellow
-            CodeStatus.KILLED: (True, False, True),  # Magenta
-            CodeStatus.FINISHED: (False, True, False),  # Green
-            CodeStatus.CRASHED: (True, False, False),  # Red
-            None: (False, False, False),  # Off
-        }
-        return status_map[status]
-
-    def get_state(self) -> Dict[KCHLED, bool]:
+        if self._is_duplicate(match.group(0), payload):
+            return
+
+        fields = self._decode(match.group(0), payload, self.schema)
+        if fields is not None:
+            code_status = cast(Optional[CodeStatus], fields["code_status"])
+            self._state, self._effects = self._table[code_status, bool(fields["code"])]
+            self._request_update()
+
+    def get_state(self) -> int:
         """Get the state of controlled LEDs."""
-        red, green, blue = self.get_led_status_from_code_status(self._status)
-        return {
-            KCHLED.CODE: self._code,
-            KCHLED.STATUS_RED: red,
-            KCHLED.STATUS_GREEN: green,
-            KCHLED.STATUS_BLUE: blue,
-        }
+        return self._state
+
+    def get_effects(self) -> Effects:
+        """Get the effects to apply to the controlled LEDs."""
+        return self._effects
@@ -1,18 +1,17 @@
 """LED Controllers."""
 
-import logging
-from json import JSONDecodeError, loads
-from typing import Callable, Coroutine, Dict, Match
+from typing import Callable, Match
 
 from astoria.common.ipc import WiFiManagerMessage
 from astoria.common.mqtt.wrapper import MQTTWrapper
-from pydantic import ValidationError, parse_obj_as
 
-from kchd.hardware import KCHLED
+from kchd.config import KCHDConfig
+from kchd.hardware import KCHLED, led_mask
+from kchd.metrics import Metrics
+from kchd.trace import Tracer
 
 from .controller import LEDController
-
-LOGGER = logging.getLogger(__name__)
+from .decode import Field, MessageDecoder, MessageSchema, strict_bool
 
 
 class AstwifidController(LEDController):
@@ -22,20 +21,31 @@ class AstwifidController(LEDController):
     It determines the state of the LEDs based on the astwifid state.
     """
 
+    __slots__ = ("_state",)
+
     leds = [KCHLED.WIFI]
+    mask = led_mask(leds)
+
+    schema = MessageSchema(
+        WiFiManagerMessage,
+        {"hotspot_running": Field(("hotspot_running",), strict_bool)},
+    )
 
     def __init__(
         self,
         mqtt: MQTTWrapper,
-        update_coro: Callable[[], Coroutine[None, None, None]],
+        request_update: Callable[[], None],
+        metrics: Metrics,
+        tracer: Tracer,
+        decoder: MessageDecoder,
+        config: KCHDConfig,
     ) -> None:
-        self._mqtt = mqtt
-        self._update_coro = update_coro
+        super().__init__(mqtt, request_update, metrics, tracer, decoder, config)
 
-        self._mqtt.subscribe("astwifid", self.handle_astwifid_manager_message)
+        self._subscribe("astwifid", self.handle_astwifid_manager_message)
 
         # Assume not running to start with
-        self._hotspot_running = False
+        self._state = 0
 
     async def handle_astwifid_manager_message(
         self,
@@ -43,21 +53,14 @@ class AstwifidController(LEDController):
         payload: str,
     ) -> None:
         """Event handler for astwifid state changes."""
-        if payload:
-            try:
-                data = loads(payload)
-                manager_message = parse_obj_as(WiFiManagerMessage, data)
-                self._hotspot_running = manager_message.hotspot_running
-                await self._update_coro()
-            except ValidationError:
-                LOGGER.warning("Received bad manager message.")
-            except JSONDecodeError:
-                LOGGER.warning("Received bad JSON in manager message.")
-        else:
-            LOGGER.warning("Received empty manager message.")
-
-    def get_state(self) -> Dict[KCHLED, bool]:
+        if self._is_duplicate(match.group(0), payload):
+            return
+
+        fields = self._decode(match.group(0), payload, self.schema)
+        if fields is not None:
+            self._state = self.mask if fields["hotspot_running"] else 0
+            self._request_update()
+
+    def get_state(self) -> int:
         """Get the state of controlled LEDs."""
-        return {
-            KCHLED.WIFI: self._hotspot_running,
-        }
+        return self._state
@@ -0,0 +1,25 @@
+"""LED Controllers."""
+
+from kchd.hardware import KCHLED, led_mask
+
+from .controller import LEDController
+
+
+class BootController(LEDController):
+    """
+    LED Controller for the BOOT_40 LED.
+
+    The LED is lit by boot_40.service by default. If this controller is
+    enabled, kchd also lights the LED itself while it is running. The
+    service must stay enabled, as only BOOT_60 is lit by the boot path, so
+    BOOT_40 would otherwise be lit after it.
+    """
+
+    __slots__ = ()
+
+    leds = [KCHLED.BOOT_40]
+    mask = led_mask(leds)
+
+    def get_state(self) -> int:
+        """Get the state of controlled LEDs."""
+        return self.mask
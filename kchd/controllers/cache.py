@@ -0,0 +1,35 @@
+"""Cache of received payloads."""
+from typing import Dict
+
+
+class PayloadCache:
+    """
+    Cache of the last payload received on each topic.
+
+    Astoria managers re-publish identical retained payloads, which can be
+    dropped before they are decoded. The payload itself is used as the
+    fingerprint, so that only byte-identical payloads are considered equal.
+    """
+
+    __slots__ = ("_payloads", "_hits")
+
+    def __init__(self) -> None:
+        self._payloads: Dict[str, str] = {}
+        self._hits = 0
+
+    @property
+    def hits(self) -> int:
+        """The number of duplicate payloads that have been seen."""
+        return self._hits
+
+    def is_duplicate(self, topic: str, payload: str) -> bool:
+        """
+        Record a payload, and determine if it has not changed.
+
+        :returns: True if the payload is identical to the last one on the topic.
+        """
+        if self._payloads.get(topic) == payload:
+            self._hits += 1
+            return True
+        self._payloads[topic] = payload
+        return False
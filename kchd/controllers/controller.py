@@ -1,11 +1,57 @@
 """LED Controller Base Class."""
 
+import logging
 from abc import ABCMeta, abstractmethod
-from typing import Callable, Coroutine, Dict, List
+from time import perf_counter
+from typing import (
+    Callable,
+    Coroutine,
+    List,
+    Match,
+    Optional,
+    Protocol,
+    Type,
+    TypeVar,
+)
 
+from astoria.common.ipc import ManagerRequest, RequestResponse
 from astoria.common.mqtt.wrapper import MQTTWrapper
 
+from kchd.config import KCHDConfig
+from kchd.effects import NO_EFFECTS, Effects
 from kchd.hardware import KCHLED
+from kchd.metrics import Metrics
+from kchd.ownership import CONTROLLER_PRIORITY
+from kchd.pwm import NO_BRIGHTNESS, Brightness
+from kchd.trace import Tracer
+
+from .cache import PayloadCache
+from .decode import DecodeError, Fields, MessageDecoder, MessageSchema
+from .inbound import LatestQueue
+
+LOGGER = logging.getLogger(__name__)
+
+RequestT = TypeVar("RequestT", bound=ManagerRequest)
+
+
+class RegisterRequest(Protocol):
+    """Register a handler of a request to kchd, as StateManager._register_request."""
+
+    def __call__(
+        self,
+        name: str,
+        typ: Type[RequestT],
+        handler: Callable[[RequestT], Coroutine[None, None, RequestResponse]],
+    ) -> None:
+        """Register the handler of a request."""
+
+
+# The warning logged for each reason that a manager message could not be decoded.
+DECODE_WARNINGS = {
+    "empty": "Received empty manager message.",
+    "json": "Received bad JSON in manager message.",
+    "validation": "Received bad manager message.",
+}
 
 
 class LEDController(metaclass=ABCMeta):
@@ -13,14 +59,99 @@ class LEDController(metaclass=ABCMeta):
     LED Controller.
 
     An LED Controller is responsible for the state of a group of LEDs.
+
+    If an LED is in the mask of more than one controller, it is set by the
+    controller with the highest priority.
     """
 
+    __slots__ = (
+        "_mqtt", "_request_update", "_metrics", "_tracer", "_decoder", "_config",
+        "_payload_cache",
+    )
+
+    priority = CONTROLLER_PRIORITY
+
     def __init__(
         self,
         mqtt: MQTTWrapper,
-        update_coro: Callable[[], Coroutine[None, None, None]],
+        request_update: Callable[[], None],
+        metrics: Metrics,
+        tracer: Tracer,
+        decoder: MessageDecoder,
+        config: KCHDConfig,
+    ) -> None:
+        self._mqtt = mqtt
+        self._request_update = request_update
+        self._metrics = metrics
+        self._tracer = tracer
+        self._decoder = decoder
+        self._config = config
+        self._payload_cache = PayloadCache()
+
+    def _subscribe(
+        self,
+        topic: str,
+        handler: Callable[[Match[str], str], Coroutine[None, None, None]],
     ) -> None:
-        pass
+        """
+        Subscribe to a topic, recording metrics and a trace of each message.
+
+        Only the newest message on each topic that matches is handled, see
+        kchd.controllers.inbound.
+        """
+        received = self._metrics.messages_received
+        duration = self._metrics.handler_duration(type(self).__name__)
+        tracer = self._tracer
+
+        async def _handler(match: Match[str], payload: str) -> None:
+            start = perf_counter()
+            try:
+                await handler(match, payload)
+            finally:
+                duration.observe(perf_counter() - start)
+
+        queue = LatestQueue(
+            _handler,
+            self._metrics.messages_pending,
+            self._metrics.messages_superseded,
+        )
+
+        async def _receive(match: Match[str], payload: str) -> None:
+            received[match.group(0)] += 1
+            tracer.message(match.group(0), payload)
+            await queue.put(match, payload)
+
+        self._mqtt.subscribe(topic, _receive)
+
+    def _is_duplicate(self, topic: str, payload: str) -> bool:
+        """Determine if a payload is identical to the last one on the topic."""
+        if self._payload_cache.is_duplicate(topic, payload):
+            self._metrics.messages_duplicate[topic] += 1
+            return True
+        return False
+
+    def _decode(
+        self,
+        topic: str,
+        payload: str,
+        schema: MessageSchema,
+    ) -> Optional[Fields]:
+        """
+        Decode the fields of a manager message, with the shared decoder.
+
+        :returns: The fields, or None if the message could not be decoded.
+        """
+        try:
+            return self._decoder.decode(topic, payload, schema)
+        except DecodeError as e:
+            self._metrics.parse_failures[e.reason] += 1
+            LOGGER.warning(DECODE_WARNINGS[e.reason])
+            return None
+
+    @property
+    def duplicate_payloads(self) -> int:
+        """The number of payloads dropped as they were identical to the last one."""
+        return self._payload_cache.hits
 
     @property
     @abstractmethod
@@ -28,7 +159,43 @@ class LEDController(metaclass=ABCMeta):
         """The LEDs that this controller is responsible for."""
         raise NotImplementedError  # pragma: nocover
 
+    @property
     @abstractmethod
-    def get_state(self) -> Dict[KCHLED, bool]:
-        """Get the state of controlled LEDs."""
+    def mask(self) -> int:
+        """The bitmask of the LEDs that this controller is responsible for."""
         raise NotImplementedError  # pragma: nocover
+
+    @abstractmethod
+    def get_state(self) -> int:
+        """
+        Get the state of controlled LEDs.
+
+        The state is a bitmask, in which only the bits in mask may be set.
+        """
+        raise NotImplementedError  # pragma: nocover
+
+    def register_requests(self, register: RegisterRequest) -> None:
+        """Register the requests that the controller handles, if any."""
+
+    def on_kchd_running(self) -> None:
+        """Called when kchd is running, before it connects to the broker."""
+
+    def on_mqtt_connected(self) -> None:
+        """Called when kchd has connected to the broker."""
+
+    def get_effects(self) -> Effects:
+        """
+        Get the effects to apply to the controlled LEDs.
+
+        The effects are a mapping of an LED bitmask to the pattern to apply.
+        """
+        return NO_EFFECTS
+
+    def get_brightness(self) -> Brightness:
+        """
+        Get the brightness of the controlled LEDs.
+
+        The brightness is a mapping of an LED bitmask to a brightness between
+        0 and kchd.pwm.MAX_BRIGHTNESS. LEDs that are not in it are fully on.
+        """
+        return NO_BRIGHTNESS
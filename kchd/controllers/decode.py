@@ -0,0 +1,131 @@
+"""
+Decoding of manager messages.
+
+Each controller declares the fields of a manager message that it reads as
+a MessageSchema. A payload is parsed as JSON once, and the result is shared
+by all of the controllers subscribed to its topic. The fields are then read
+straight from the JSON, and only if that fails is the whole message
+validated with pydantic, and the fields read from the model instead.
+"""
+from json import JSONDecodeError, loads
+from typing import Callable, Dict, Mapping, NamedTuple, Tuple, Type
+
+from pydantic import BaseModel, ValidationError, parse_obj_as
+
+# The fields read from a manager message, by name.
+Fields = Dict[str, object]
+
+# The exceptions raised by reading a field that is missing or has a bad value.
+FIELD_ERRORS = (KeyError, IndexError, TypeError, ValueError, AttributeError)
+
+
+class DecodeError(Exception):
+    """
+    A payload could not be decoded.
+
+    The reason is the key of the failure in the parse_failures metric.
+    """
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+def strict_bool(value: object) -> bool:
+    """Check that a value from the JSON is a bool, rather than coercing it."""
+    if not isinstance(value, bool):
+        raise TypeError(f"{value!r} is not a bool.")
+    return value
+
+
+def is_present(value: object) -> bool:
+    """Determine whether an optional value is present."""
+    return value is not None
+
+
+class Field(NamedTuple):
+    """
+    A field of a manager message.
+
+    :param path: The keys of the field, from the top level of the message.
+    :param convert: Convert the value of the field, raising TypeError or
+        ValueError if it is not valid. It is given the raw value from the
+        JSON, or the value from the model.
+    """
+
+    path: Tuple[str, ...]
+    convert: Callable[[object], object]
+
+
+class MessageSchema(NamedTuple):
+    """The fields of a manager message that a controller reads."""
+
+    model: Type[BaseModel]
+    fields: Mapping[str, Field]
+
+    def read(self, data: object) -> Fields:
+        """Read the fields from the JSON of a message."""
+        fields = {}
+        for name, field in self.fields.items():
+            value = data
+            for key in field.path:
+                value = value[key]  # type: ignore[index]
+            fields[name] = field.convert(value)
+        return fields
+
+    def read_model(self, message: BaseModel) -> Fields:
+        """Read the fields from a validated message."""
+        fields = {}
+        for name, field in self.fields.items():
+            value: object = message
+            for key in field.path:
+                value = getattr(value, key)
+            fields[name] = field.convert(value)
+        return fields
+
+
+class MessageDecoder:
+    """
+    Decode manager messages, sharing the JSON of the last payload on each topic.
+
+    A payload is delivered to each controller subscribed to its topic in
+    turn, so only the last payload on a topic needs to be kept.
+    """
+
+    __slots__ = ("_last",)
+
+    def __init__(self) -> None:
+        self._last: Dict[str, Tuple[str, object]] = {}
+
+    def _parse(self, topic: str, payload: str) -> object:
+        """Parse a payload as JSON, unless it was the last payload on the topic."""
+        last = self._last.get(topic)
+        if last is not None and last[0] == payload:
+            return last[1]
+        try:
+            data = loads(payload)
+        except JSONDecodeError as e:
+            raise DecodeError("json") from e
+        self._last[topic] = (payload, data)
+        return data
+
+    def decode(self, topic: str, payload: str, schema: MessageSchema) -> Fields:
+        """
+        Decode the fields of a schema from a payload.
+
+        :raises DecodeError: The payload is empty, not JSON, or not a valid message.
+        """
+        if not payload:
+            raise DecodeError("empty")
+        data = self._parse(topic, payload)
+        try:
+            return schema.read(data)
+        except FIELD_ERRORS:
+            pass
+
+        # Pydantic may still accept the message, for example by coercing a value.
+        try:
+            message = parse_obj_as(schema.model, data)
+            return schema.read_model(message)
+        except (ValidationError, *FIELD_ERRORS) as e:
+            raise DecodeError("validation") from e
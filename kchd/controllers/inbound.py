@@ -0,0 +1,75 @@
+"""
+Inbound queue of manager messages.
+
+The MQTT wrapper starts a task for each message that arrives, so a
+manager that publishes faster than its messages are handled would build
+an unbounded backlog of handlers. Each subscription of a controller
+instead keeps only the newest unhandled payload on each topic, and the
+payloads that it replaces are dropped before they are decoded.
+"""
+import asyncio
+import logging
+from typing import Callable, Coroutine, DefaultDict, Dict, Match, Set, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+Handler = Callable[[Match[str], str], Coroutine[None, None, None]]
+
+
+class LatestQueue:
+    """
+    Queue the messages on each topic for a handler, keeping only the newest.
+
+    The messages on a topic are handled one at a time, in order, so the
+    number of messages waiting on each topic is at most one. An error in
+    handling a message is logged, and the next message is still handled.
+
+    :param handler: The handler of the messages.
+    :param pending: The number of messages waiting on each topic.
+    :param superseded: The number of messages dropped on each topic, as a
+        newer message arrived before they were handled.
+    """
+
+    __slots__ = ("_handler", "_pending", "_superseded", "_messages", "_draining")
+
+    def __init__(
+        self,
+        handler: Handler,
+        pending: DefaultDict[str, int],
+        superseded: DefaultDict[str, int],
+    ) -> None:
+        self._handler = handler
+        self._pending = pending
+        self._superseded = superseded
+        self._messages: Dict[str, Tuple[Match[str], str]] = {}
+        self._draining: Set[str] = set()
+
+    async def put(self, match: Match[str], payload: str) -> None:
+        """
+        Queue a message, replacing any message waiting on its topic.
+
+        If no message on the topic is being handled, the messages on the
+        topic are handled until there are none waiting.
+        """
+        topic = match.group(0)
+        if topic in self._messages:
+            self._superseded[topic] += 1
+        else:
+            self._pending[topic] += 1
+        self._messages[topic] = (match, payload)
+
+        if topic in self._draining:
+            return
+        self._draining.add(topic)
+        try:
+            # Let the messages that have already arrived replace this one first.
+            await asyncio.sleep(0)
+            while topic in self._messages:
+                match, payload = self._messages.pop(topic)
+                self._pending[topic] -= 1
+                try:
+                    await self._handler(match, payload)
+                except Exception:
+                    LOGGER.exception(f"Unable to handle a message on {topic}.")
+        finally:
+            self._draining.discard(topic)
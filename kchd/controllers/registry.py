@@ -0,0 +1,75 @@
+"""
+Registry of the LED controllers.
+
+Controllers are found by name, from the controllers built into kchd and
+from the ``kchd.controllers`` entry point group, so that a site specific
+controller can be installed as a package of its own. The module of a
+controller is only imported when it is loaded, so the controllers that
+are not enabled in the config cost nothing.
+
+A package provides a controller with an entry point, for example::
+
+    [tool.poetry.plugins."kchd.controllers"]
+    scoreboard = "kchd_scoreboard:ScoreboardController"
+"""
+import sys
+from functools import lru_cache
+from importlib.metadata import EntryPoint, entry_points
+from typing import Mapping, Type
+
+from .controller import LEDController
+
+ENTRY_POINT_GROUP = "kchd.controllers"
+
+# The controllers built into kchd, as entry point values.
+BUILTIN_CONTROLLERS = {
+    "astmetad": "kchd.controllers.astmetad:AstmetadController",
+    "astprocd": "kchd.controllers.astprocd:AstprocdController",
+    "astwifid": "kchd.controllers.astwifid:AstwifidController",
+    "boot": "kchd.controllers.boot:BootController",
+    "request": "kchd.controllers.request:MQTTRequestController",
+    "status": "kchd.controllers.system_status:SystemStatusController",
+}
+
+
+@lru_cache(maxsize=None)
+def available_controllers() -> Mapping[str, EntryPoint]:
+    """
+    Get the entry point of each available controller, by name.
+
+    An installed controller with the name of a built in one replaces it.
+    The installed packages are only searched once, as that is slow.
+    """
+    controllers = {
+        name: EntryPoint(name, value, ENTRY_POINT_GROUP)
+        for name, value in BUILTIN_CONTROLLERS.items()
+    }
+    if sys.version_info >= (3, 10):
+        installed = entry_points(group=ENTRY_POINT_GROUP)
+    else:
+        installed = entry_points().get(ENTRY_POINT_GROUP, ())
+    for entry_point in installed:
+        controllers[entry_point.name] = entry_point
+    return controllers
+
+
+def load_controller(
+    name: str,
+    controllers: Mapping[str, EntryPoint],
+) -> Type[LEDController]:
+    """
+    Import a controller class.
+
+    :raises ValueError: There is no controller with the name.
+    :raises TypeError: The entry point is not an LEDController.
+    """
+    try:
+        entry_point = controllers[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown controller {name!r}, expected one of: {', '.join(controllers)}",
+        ) from None
+    controller = entry_point.load()
+    if not (isinstance(controller, type) and issubclass(controller, LEDController)):
+        raise TypeError(f"{entry_point.value} is not an LEDController.")
+    return controller
@@ -1,26 +1,61 @@
 """LED Controllers."""
 
 import logging
-from typing import Callable, Coroutine, Dict, Tuple
+from typing import Callable, Dict, List, Match, Optional, Sequence, Tuple
 
 from astoria.common.ipc import RequestResponse
 from astoria.common.mqtt.wrapper import MQTTWrapper
 
-from kchd.hardware import KCHLED
+from kchd.config import KCHDConfig
+from kchd.hardware import KCHLED, led_mask
+from kchd.metrics import Metrics
+from kchd.pwm import MAX_BRIGHTNESS, NO_BRIGHTNESS, Brightness
+from kchd.trace import Tracer
 from kchd.types import KCHLEDUpdateManagerRequest
 
-from .controller import LEDController
+from .controller import LEDController, RegisterRequest
+from .decode import MessageDecoder
 
 LOGGER = logging.getLogger(__name__)
 
+SEQUENCE_MODULUS = 1 << 32
+
+
+def _stream_table(leds: Sequence[KCHLED]) -> List[int]:
+    """Build the table of LED state for each value of a stream frame mask."""
+    return [
+        led_mask(led for i, led in enumerate(leds) if value >> i & 1)
+        for value in range(1 << len(leds))
+    ]
+
+
+def is_newer_sequence(sequence: int, last: int) -> bool:
+    """Determine if a sequence number is newer than the last, allowing for wrapping."""
+    return 0 < (sequence - last) % SEQUENCE_MODULUS < SEQUENCE_MODULUS // 2
+
 
 class MQTTRequestController(LEDController):
     """
-    LED Controller for the Comp LED.
+    LED Controller for the user LEDs.
 
     It determines the state of the LEDs based on the requested state.
+
+    The state can be changed in two ways:
+
+    1. A KCHLEDUpdateManagerRequest to astoria/kchd/request/leds, which is
+    validated and responded to. The RGB LEDs can be given a colour, which
+    is mixed with software PWM.
+
+    2. A stream of frames to astoria/kchd/stream/leds, for frequent changes.
+    Each frame is "<sequence>,<mask>", where the bits of the mask are the
+    LEDs in the order of self.leds. Frames are applied latest-wins, and
+    frames with an older sequence number than the last one are dropped.
+    There is no response to a frame. A sequence number of zero restarts
+    the sequence, for example when usercode is restarted.
     """
 
+    __slots__ = ("_state", "_brightness", "_sequence")
+
     leds = [
         KCHLED.USER_A_RED,
         KCHLED.USER_A_GREEN,
@@ -33,46 +68,90 @@ class MQTTRequestController(LEDController):
         KCHLED.USER_C_BLUE,
         KCHLED.START,
     ]
+    mask = led_mask(leds)
+    stream_masks = _stream_table(leds)
 
     def __init__(
         self,
         mqtt: MQTTWrapper,
-        update_coro: Callable[[], Coroutine[None, None, None]],
+        request_update: Callable[[], None],
+        metrics: Metrics,
+        tracer: Tracer,
+        decoder: MessageDecoder,
+        config: KCHDConfig,
     ) -> None:
-        self._mqtt = mqtt
-        self._update_coro = update_coro
+        super().__init__(mqtt, request_update, metrics, tracer, decoder, config)
 
-        self._a: Tuple[bool, bool, bool] = (False, False, False)
-        self._b: Tuple[bool, bool, bool] = (False, False, False)
-        self._c: Tuple[bool, bool, bool] = (False, False, False)
-        self._start: bool = False
+        self._state = 0
+        self._brightness: Brightness = NO_BRIGHTNESS
+        self._sequence = 0
+
+        self._subscribe("kchd/stream/leds", self.handle_led_stream_frame)
+
+    def register_requests(self, register: RegisterRequest) -> None:
+        """Register the request to change the LEDs."""
+        register("leds", KCHLEDUpdateManagerRequest, self.handle_led_update)
 
     async def handle_led_update(
             self,
             request: KCHLEDUpdateManagerRequest,
     ) -> RequestResponse:
         """Handle an LED Update Request."""
-        self._a = request.a
-        self._b = request.b
-        self._c = request.c
-        self._start = request.start
-        await self._update_coro()
+        # The order of the requested values matches the order of self.leds
+        values: Tuple[bool, ...] = request.a + request.b + request.c + (request.start,)
+        state = led_mask(led for led, on in zip(self.leds, values) if on)
+
+        brightness: Dict[int, int] = {}
+        colours: Tuple[Optional[Tuple[int, int, int]], ...] = (
+            request.a_colour, request.b_colour, request.c_colour,
+        )
+        for index, colour in enumerate(colours):
+            if colour is None:
+                continue
+            for led, value in zip(self.leds[index * 3:index * 3 + 3], colour):
+                led_bit = 1 << led.value
+                state &= ~led_bit
+                if value:
+                    state |= led_bit
+                if 0 < value < MAX_BRIGHTNESS:
+                    brightness[led_bit] = value
+
+        self._state = state
+        self._brightness = brightness or NO_BRIGHTNESS
+        self._request_update()
         return RequestResponse(uuid=request.uuid, success=True)
 
-    def get_state(self) -> Dict[KCHLED, bool]:
+    async def handle_led_stream_frame(
+            self,
+            match: Match[str],
+            payload: str,
+    ) -> None:
+        """Event handler for frames of the user LED stream."""
+        try:
+            sequence_str, mask_str = payload.split(",")
+            sequence, user_mask = int(sequence_str), int(mask_str)
+            if not 0 <= sequence < SEQUENCE_MODULUS:
+                raise ValueError("Sequence number out of range.")
+            if not 0 <= user_mask < len(self.stream_masks):
+                raise ValueError("Mask out of range.")
+        except ValueError:
+            self._metrics.parse_failures["stream"] += 1
+            LOGGER.warning("Received bad LED stream frame.")
+            return
+
+        if sequence != 0 and not is_newer_sequence(sequence, self._sequence):
+            self._metrics.messages_ignored[match.group(0)] += 1
+            return
+
+        self._sequence = sequence
+        self._state = self.stream_masks[user_mask]
+        self._brightness = NO_BRIGHTNESS
+        self._request_update()
+
+    def get_state(self) -> int:
         """Get the state of controlled LEDs."""
-        a_red, a_green, a_blue = self._a
-        b_red, b_green, b_blue = self._b
-        c_red, c_green, c_blue = self._c
-        return {
-            KCHLED.USER_A_RED: a_red,
-            KCHLED.USER_A_GREEN: a_green,
-            KCHLED.USER_A_BLUE: a_blue,
-            KCHLED.USER_B_RED: b_red,
-            KCHLED.USER_B_GREEN: b_green,
-            KCHLED.USER_B_BLUE: b_blue,
-            KCHLED.USER_C_RED: c_red,
-            KCHLED.USER_C_GREEN: c_green,
-            KCHLED.USER_C_BLUE: c_blue,
-            KCHLED.START: self._start,
-        }
+        return self._state
+
+    def get_brightness(self) -> Brightness:
+        """Get the brightness of the controlled LEDs."""
+        return self._brightness
@@ -1,19 +1,23 @@
 """LED Controllers."""
 
 import logging
-from json import JSONDecodeError, loads
-from typing import Callable, Coroutine, Dict, Match, Set, Tuple
+from typing import Callable, Dict, Match, Set
 
 from astoria.common.ipc import ManagerMessage
 from astoria.common.mqtt.wrapper import MQTTWrapper
-from pydantic import ValidationError, parse_obj_as
 
-from kchd.hardware import KCHLED
+from kchd.config import KCHDConfig
+from kchd.hardware import KCHLED, led_mask
+from kchd.metrics import Metrics
+from kchd.trace import Tracer
 
 from .controller import LEDController
+from .decode import Field, MessageDecoder, MessageSchema
 
 LOGGER = logging.getLogger(__name__)
 
+ManagerHandler = Callable[[str, str, str], None]
+
 
 class SystemStatusController(LEDController):
     """
@@ -32,68 +36,104 @@ class SystemStatusController(LEDController):
     required astoria managers are running, it will turn on an LED.
     """
 
+    __slots__ = ("kchd_running", "mqtt_up", "_seen_services", "_handlers")
+
     leds = [
         # The first 2 LEDs are externally controlled
         KCHLED.BOOT_60,
         KCHLED.BOOT_80,
         KCHLED.BOOT_100,
     ]
+    mask = led_mask(leds)
+    boot_60_mask, boot_80_mask, boot_100_mask = (led_mask([led]) for led in leds)
     _required_services = {"astdiskd", "astmetad", "astprocd"}
 
+    # Only the status is read, the rest of the message is not validated.
+    status_schema = MessageSchema(
+        ManagerMessage,
+        {"status": Field(("status",), ManagerMessage.Status)},
+    )
+
     def __init__(
         self,
         mqtt: MQTTWrapper,
-        update_coro: Callable[[], Coroutine[None, None, None]],
+        request_update: Callable[[], None],
+        metrics: Metrics,
+        tracer: Tracer,
+        decoder: MessageDecoder,
+        config: KCHDConfig,
     ) -> None:
-        self._mqtt = mqtt
-        self._update_coro = update_coro
+        super().__init__(mqtt, request_update, metrics, tracer, decoder, config)
 
         self.kchd_running: bool = False
         self.mqtt_up: bool = False
         self._seen_services: Set[str] = set()
 
-        self._mqtt.subscribe("+", self.handle_manager_message)
+        # Messages from managers that are not in this index are dropped
+        # before they are decoded.
+        self._handlers: Dict[str, ManagerHandler] = {
+            service: self.handle_required_service_message
+            for service in self._required_services
+        }
+
+        self._subscribe("+", self.handle_manager_message)
+
+    def on_kchd_running(self) -> None:
+        """Light the LED for kchd running."""
+        self.kchd_running = True
+
+    def on_mqtt_connected(self) -> None:
+        """Light the LED for the broker being connected."""
+        self.mqtt_up = True
 
     async def handle_manager_message(
             self,
             match: Match[str],
             payload: str,
     ) -> None:
-        """Event handler for metadata changes."""
-        if payload:
-            try:
-                data = loads(payload)
-                manager_name = match.group(1)
-                manager_message = parse_obj_as(ManagerMessage, data)
-                if manager_name in self._required_services:
-                    if manager_message.status is ManagerMessage.Status.RUNNING:
-                        LOGGER.info(f"{manager_name} is running.")
-                        self._seen_services |= {manager_name}
-                    else:
-                        LOGGER.info(f"{manager_name} is stopped.")
-                        self._seen_services -= {manager_name}
-                    await self._update_coro()
-            except ValidationError:
-                LOGGER.warning("Received bad manager message.")
-            except JSONDecodeError:
-                LOGGER.warning("Received bad JSON in manager message.")
+        """Event handler for all manager messages."""
+        manager_name = match.group(1)
+        handler = self._handlers.get(manager_name)
+        if handler is None:
+            self._metrics.messages_ignored[match.group(0)] += 1
+            return
+
+        if self._is_duplicate(match.group(0), payload):
+            return
+
+        handler(manager_name, match.group(0), payload)
+
+    def handle_required_service_message(
+        self,
+        manager_name: str,
+        topic: str,
+        payload: str,
+    ) -> None:
+        """Handle a status change of a required astoria manager."""
+        fields = self._decode(topic, payload, self.status_schema)
+        if fields is None:
+            return
+
+        if fields["status"] is ManagerMessage.Status.RUNNING:
+            LOGGER.info(f"{manager_name} is running.")
+            self._seen_services |= {manager_name}
         else:
-            LOGGER.warning("Received empty manager message.")
+            LOGGER.info(f"{manager_name} is stopped.")
+            self._seen_services -= {manager_name}
+        self._request_update()
 
     @property
     def astoria_good(self) -> bool:
         """Determine whether astoria services are in a good state."""
         return len(self._seen_services) == len(self._required_services)
 
-    def get_enabled_leds(self) -> Tuple[bool, bool, bool]:
-        """Get the state of each LED controlled by this class."""
-        return (
-            self.kchd_running,
-            self.mqtt_up,
-            self.astoria_good,
-        )
-
-    def get_state(self) -> Dict[KCHLED, bool]:
+    def get_state(self) -> int:
         """Get the state of controlled LEDs."""
-        # Pair each led to it's state
-        return dict(zip(self.leds, self.get_enabled_leds()))
+        state = 0
+        if self.kchd_running:
+            state |= self.boot_60_mask
+        if self.mqtt_up:
+            state |= self.boot_80_mask
+        if self.astoria_good:
+            state |= self.boot_100_mask
+        return state
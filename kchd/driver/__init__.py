@@ -1,25 +1,69 @@
 """Drivers for controlling the LEDs."""
-
-from typing import Set
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple, Type
 
 from kchd.hardware import KCHLED
-from kchd.types import NoKCHException
+from kchd.types import DriverChoice, KCHInfo, NoKCHException
 
+from .cache import load_driver_choice, read_hat_key, save_driver_choice
 from .driver import LEDDriver
 from .gpio import GPIODriver
+from .mmio import MMIODriver
 from .mock import MockDriver
+from .sysfs import SysfsDriver
+from .threaded import ThreadedDriver
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_driver(
+    leds: Set[KCHLED],
+    *,
+    cache_path: Optional[Path] = None,
+) -> Tuple[LEDDriver, KCHInfo]:
+    """
+    Get the driver to use, and information about the KCH it operates.
+
+    Each driver is probed before it is constructed, as the hardware drivers
+    reconfigure the LED pins. If a cache path is given, the choice is cached
+    for the fitted HAT, and later starts construct that driver without probing.
+    """
+    drivers: Dict[str, Type[LEDDriver]] = {
+        driver_cls.__name__: driver_cls
+        for driver_cls in (MMIODriver, SysfsDriver, GPIODriver, MockDriver)
+    }
+    hat_key = read_hat_key()
 
+    if cache_path is not None:
+        choice = load_driver_choice(cache_path, hat_key)
+        if choice is not None and choice.driver in drivers:
+            try:
+                return drivers[choice.driver](leds), choice.kch_info
+            except NoKCHException:
+                LOGGER.warning(f"The cached {choice.driver} is no longer available.")
 
-def get_driver(leds: Set[KCHLED]) -> LEDDriver:
-    """Get the driver to use."""
-    for driver_cls in (GPIODriver, MockDriver):
-        driver = driver_cls(leds)
+    for name, driver_cls in drivers.items():
         try:
-            driver.get_kch_info()
-            return driver
+            kch_info = driver_cls.probe()
+            driver = driver_cls(leds)
         except NoKCHException:
-            pass
+            continue
+        if cache_path is not None:
+            save_driver_choice(
+                cache_path,
+                DriverChoice(hat_key=hat_key, driver=name, kch_info=kch_info),
+            )
+        return driver, kch_info
     raise RuntimeError("No drivers were available.")
 
 
-__all__ = ["get_driver", "GPIODriver", "LEDDriver", "MockDriver"]
+__all__ = [
+    "get_driver",
+    "GPIODriver",
+    "LEDDriver",
+    "MMIODriver",
+    "MockDriver",
+    "SysfsDriver",
+    "ThreadedDriver",
+]
@@ -0,0 +1,52 @@
+"""Cache the choice of driver between starts of kchd."""
+import logging
+from pathlib import Path
+from typing import Optional
+
+from pydantic import ValidationError
+
+from kchd.hardware import DEVICE_TREE_SYS_PATH, read_hat_file
+from kchd.types import DriverChoice
+
+LOGGER = logging.getLogger(__name__)
+
+CACHE_FILE_NAME = "kchd-driver.json"
+
+
+def read_hat_key(sys_path: Path = DEVICE_TREE_SYS_PATH) -> str:
+    """
+    Get a key that identifies the fitted HAT.
+
+    The UUID of the HAT is unique to each EEPROM, and is a single read of
+    the device tree. If no HAT is fitted, the key is empty.
+    """
+    return read_hat_file(sys_path / "uuid") or ""
+
+
+def load_driver_choice(cache_path: Path, hat_key: str) -> Optional[DriverChoice]:
+    """
+    Load the cached choice of driver.
+
+    :returns: The cached choice, or None if there is none for the fitted HAT.
+    """
+    try:
+        choice = DriverChoice.parse_raw(cache_path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValidationError) as e:
+        LOGGER.warning(f"Ignoring unreadable driver cache: {e}")
+        return None
+
+    if choice.hat_key != hat_key:
+        LOGGER.info("The fitted HAT has changed since the driver was cached.")
+        return None
+    return choice
+
+
+def save_driver_choice(cache_path: Path, choice: DriverChoice) -> None:
+    """Cache the choice of driver."""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(choice.json())
+    except OSError as e:
+        LOGGER.warning(f"Unable to write driver cache: {e}")
@@ -1,6 +1,6 @@
 """Protocol for a class that can control the LEDs."""
 
-from typing import Dict, Protocol, Set
+from typing import Protocol, Set
 
 from kchd.hardware import KCHLED
 from kchd.types import KCHInfo
@@ -13,6 +13,15 @@ class LEDDriver(Protocol):
         """Initialise and set up the LEDs."""
         ...
 
+    @classmethod
+    def probe(cls) -> KCHInfo:
+        """
+        Check that this driver can be used, without setting up the LEDs.
+
+        :raises NoKCHException: There is no KCH available to this driver.
+        """
+        ...
+
     def get_kch_info(self) -> KCHInfo:
         """
         Get information about the KCH this driver operates.
@@ -21,6 +30,10 @@ class LEDDriver(Protocol):
         """
         ...
 
-    def set_state(self, state: Dict[KCHLED, bool]) -> None:
-        """Set the state of the LEDs."""
+    def set_state(self, state: int) -> None:
+        """
+        Set the state of the LEDs.
+
+        :param state: A bitmask of the LEDs to turn on, see kchd.hardware.led_mask.
+        """
         ...
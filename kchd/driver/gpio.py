@@ -1,41 +1,64 @@
 """Control the LEDs using the RPi GPIO."""
 import atexit
-from pathlib import Path
-from typing import Dict, Set
+from typing import Set
 
 try:
     import RPi.GPIO as GPIO
 except ModuleNotFoundError:
     GPIO = None  # type: ignore
 
-from kchd.hardware import KCHLED
+from kchd.hardware import DEVICE_TREE_SYS_PATH, KCHLED, led_mask
 from kchd.types import KCHInfo, NoKCHException
 
 from .driver import LEDDriver
+from .hat import read_kch_info
 
 
 class GPIODriver(LEDDriver):
     """Control the LEDs using the RPi GPIO."""
 
-    DEVICE_TREE_SYS_PATH = Path("/sys/firmware/devicetree/base/hat")
+    DEVICE_TREE_SYS_PATH = DEVICE_TREE_SYS_PATH
 
     def __init__(self, leds: Set[KCHLED]) -> None:
+        if GPIO is None:
+            raise NoKCHException("RPi.GPIO is not installed.")
         self._leds = leds
+        self._mask = led_mask(leds)
+        self._pins = sorted(led.value for led in leds)
 
-        if GPIO is not None:
-            atexit.register(GPIO.cleanup)
+        # The LEDs are all driven low during setup, so that is our starting point.
+        self._state = 0
+        self._writes_issued = 0
+        self._writes_skipped = 0
 
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setup([led.value for led in self._leds], GPIO.OUT, initial=GPIO.LOW)
+        self._closed = False
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(self._pins, GPIO.OUT, initial=GPIO.LOW)
+        atexit.register(self.close)
 
-    def _read_file(self, path: Path) -> str:
-        if not path.exists() or not path.is_file():
-            raise NoKCHException("SysFS is not readable.")
+    @classmethod
+    def probe(cls) -> KCHInfo:
+        """
+        Check that RPi.GPIO is available, and that a KCH is fitted.
+
+        :raises NoKCHException: There is no KCH fitted.
+        """
+        if GPIO is None:
+            raise NoKCHException("RPi.GPIO is not installed.")
+        return read_kch_info(cls.DEVICE_TREE_SYS_PATH)
+
+    def close(self) -> None:
+        """
+        Return the LED pins to their default state.
 
-        with path.open("r") as fh:
-            data = fh.read()
-            data = data.rstrip("\x00")  # Null Terminated
-            return data.strip()
+        Only the pins of this driver are cleaned up, so that any other users
+        of RPi.GPIO in the process are unaffected.
+        """
+        if self._closed or GPIO is None:
+            return
+        GPIO.cleanup(self._pins)
+        self._closed = True
+        atexit.unregister(self.close)
 
     def get_kch_info(self) -> KCHInfo:
         """
@@ -43,28 +66,37 @@ class GPIODriver(LEDDriver):
 
         :raises NoKCHException: There is no KCH fitted.
         """
-        sys_path = self.DEVICE_TREE_SYS_PATH
+        return read_kch_info(self.DEVICE_TREE_SYS_PATH)
 
-        if not sys_path.exists() or not sys_path.is_dir():
-            raise NoKCHException("There is no HAT directory in sysfs.")
+    @property
+    def writes_issued(self) -> int:
+        """The number of pin writes that have been sent to the GPIO."""
+        return self._writes_issued
 
-        vendor = self._read_file(sys_path / "vendor")
-        product = self._read_file(sys_path / "product")
+    @property
+    def writes_skipped(self) -> int:
+        """The number of pin writes skipped as the pin was already in that state."""
+        return self._writes_skipped
 
-        if vendor == "Student Robotics" and product == "KCH V1 Rev B":
-            return KCHInfo(
-                vendor=vendor,
-                product=product,
-                asset_code=self._read_file(sys_path / "custom_0"),
-            )
-        else:
-            raise NoKCHException("A HAT is fitted, but it is not a KCH.")
+    def set_state(self, state: int) -> None:
+        """
+        Set the LEDs state.
 
-    def set_state(self, state: Dict[KCHLED, bool]) -> None:
-        """Set the LEDs state."""
-        if not set(state.keys()).issubset(self._leds):
-            unknown_leds = state.keys() - self._leds
+        Only the pins that differ from the last written state are written,
+        and they are written together in a single call.
+        """
+        if state & ~self._mask:
+            unknown_leds = {led for led in KCHLED if state & ~self._mask & 1 << led}
             raise ValueError(f"Some LEDs are not controlled by kchd: {unknown_leds}")
 
-        for led, val in state.items():
-            GPIO.output(led.value, GPIO.HIGH if val else GPIO.LOW)
+        changed = state ^ self._state
+        changed_pins = [pin for pin in self._pins if changed >> pin & 1]
+        self._writes_skipped += len(self._pins) - len(changed_pins)
+
+        if changed_pins:
+            GPIO.output(
+                changed_pins,
+                [GPIO.HIGH if state >> pin & 1 else GPIO.LOW for pin in changed_pins],
+            )
+            self._writes_issued += len(changed_pins)
+            self._state = state
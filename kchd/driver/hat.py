@@ -0,0 +1,39 @@
+"""Read information about the fitted HAT from the device tree."""
+from pathlib import Path
+
+from kchd.hardware import (
+    DEVICE_TREE_SYS_PATH,
+    KCH_PRODUCT,
+    KCH_VENDOR,
+    read_hat_file,
+)
+from kchd.types import KCHInfo, NoKCHException
+
+
+def _read_file(path: Path) -> str:
+    data = read_hat_file(path)
+    if data is None:
+        raise NoKCHException("SysFS is not readable.")
+    return data
+
+
+def read_kch_info(sys_path: Path = DEVICE_TREE_SYS_PATH) -> KCHInfo:
+    """
+    Get information about the KCH on the Pi from the device tree.
+
+    :raises NoKCHException: There is no KCH fitted.
+    """
+    if not sys_path.exists() or not sys_path.is_dir():
+        raise NoKCHException("There is no HAT directory in sysfs.")
+
+    vendor = _read_file(sys_path / "vendor")
+    product = _read_file(sys_path / "product")
+
+    if vendor == KCH_VENDOR and product == KCH_PRODUCT:
+        return KCHInfo(
+            vendor=vendor,
+            product=product,
+            asset_code=_read_file(sys_path / "custom_0"),
+        )
+    else:
+        raise NoKCHException("A HAT is fitted, but it is not a KCH.")
@@ -0,0 +1,117 @@
+"""Control the LEDs by writing to the memory mapped GPIO registers."""
+import atexit
+import logging
+import mmap
+import os
+from pathlib import Path
+from typing import Optional, Set
+
+from kchd.hardware import (
+    DEVICE_TREE_SYS_PATH,
+    GPCLR0,
+    GPIO_BLOCK_SIZE,
+    GPIO_FSEL_INPUT,
+    GPIO_FSEL_OUTPUT,
+    GPIOMEM_PATH,
+    GPLEV0,
+    GPSET0,
+    KCHLED,
+    gpio_function,
+    led_mask,
+    set_gpio_function,
+)
+from kchd.types import KCHInfo, NoKCHException
+
+from .driver import LEDDriver
+from .hat import read_kch_info
+
+LOGGER = logging.getLogger(__name__)
+
+
+class MMIODriver(LEDDriver):
+    """
+    Control the LEDs by writing to the memory mapped GPIO registers.
+
+    Every update is a single write to the set register, and a single
+    write to the clear register, regardless of how many LEDs change.
+
+    LEDs that are already outputs keep their level, so that an LED lit by
+    the boot path does not flash off when the driver is set up.
+    """
+
+    DEVICE_TREE_SYS_PATH = DEVICE_TREE_SYS_PATH
+    GPIOMEM_PATH = GPIOMEM_PATH
+
+    def __init__(self, leds: Set[KCHLED], *, gpiomem_path: Optional[Path] = None) -> None:
+        self._leds = leds
+        self._mask = led_mask(leds)
+
+        path = gpiomem_path or self.GPIOMEM_PATH
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_SYNC)
+        except OSError as e:
+            raise NoKCHException(f"Unable to open GPIO registers at {path}") from e
+
+        try:
+            self._mmap = mmap.mmap(fd, GPIO_BLOCK_SIZE)
+        except (OSError, ValueError) as e:
+            raise NoKCHException(f"Unable to map GPIO registers at {path}") from e
+        finally:
+            os.close(fd)
+
+        self._registers = memoryview(self._mmap).cast("I")
+
+        outputs = led_mask(
+            led for led in leds
+            if gpio_function(self._registers, led.value) == GPIO_FSEL_OUTPUT
+        )
+        self._state = self._registers[GPLEV0] & outputs
+
+        # Drive the other LEDs low before making them outputs, to avoid a flash.
+        self._registers[GPCLR0] = self._mask & ~outputs
+        self._set_function(GPIO_FSEL_OUTPUT)
+        atexit.register(self.close)
+
+    @classmethod
+    def probe(cls) -> KCHInfo:
+        """
+        Check that the GPIO registers are accessible, and that a KCH is fitted.
+
+        :raises NoKCHException: There is no KCH fitted.
+        """
+        if not os.access(cls.GPIOMEM_PATH, os.R_OK | os.W_OK):
+            raise NoKCHException(f"Unable to access GPIO registers at {cls.GPIOMEM_PATH}")
+        return read_kch_info(cls.DEVICE_TREE_SYS_PATH)
+
+    def _set_function(self, function: int) -> None:
+        """Set the function of all of the LED pins."""
+        for led in self._leds:
+            set_gpio_function(self._registers, led.value, function)
+
+    def close(self) -> None:
+        """Return the LED pins to inputs and unmap the registers."""
+        if self._mmap.closed:
+            return
+        self._set_function(GPIO_FSEL_INPUT)
+        self._registers.release()
+        self._mmap.close()
+        atexit.unregister(self.close)
+
+    def get_kch_info(self) -> KCHInfo:
+        """
+        Get information about the KCH on the Pi.
+
+        :raises NoKCHException: There is no KCH fitted.
+        """
+        return read_kch_info(self.DEVICE_TREE_SYS_PATH)
+
+    def set_state(self, state: int) -> None:
+        """Set the LEDs state."""
+        if state & ~self._mask:
+            unknown_leds = {led for led in KCHLED if state & ~self._mask & 1 << led}
+            raise ValueError(f"Some LEDs are not controlled by kchd: {unknown_leds}")
+
+        if state != self._state:
+            self._registers[GPSET0] = state
+            self._registers[GPCLR0] = self._mask & ~state
+            self._state = state
@@ -1,6 +1,6 @@
 """Log the changes in LEDs."""
 import logging
-from typing import Dict, Set
+from typing import Set
 
 from kchd.hardware import KCHLED
 from kchd.types import KCHInfo
@@ -10,35 +10,45 @@ from .driver import LEDDriver
 LOGGER = logging.getLogger(__name__)
 
 
+MOCK_KCH_INFO = KCHInfo(
+    vendor="Student Robotics",
+    product="Mock KCH",
+    asset_code="FAKE",
+)
+
+
 class MockDriver(LEDDriver):
     """Log the changes in LEDs."""
 
     def __init__(self, leds: Set[KCHLED]) -> None:
-        self._state: Dict[KCHLED, bool] = {led: False for led in leds}
+        self._leds = leds
+        self._state = 0
         LOGGER.info(f"Initialised {len(leds)} LEDs with Mock Driver.")
 
+    @classmethod
+    def probe(cls) -> KCHInfo:
+        """The mock driver can always be used."""
+        return MOCK_KCH_INFO
+
     def get_kch_info(self) -> KCHInfo:
         """
         Get information about the KCH on the Pi.
 
         :raises NoKCHException: There is no KCH fitted.
         """
-        return KCHInfo(
-            vendor="Student Robotics",
-            product="Mock KCH",
-            asset_code="FAKE",
-        )
+        return MOCK_KCH_INFO
 
-    def set_state(self, state: Dict[KCHLED, bool]) -> None:
+    def set_state(self, state: int) -> None:
         """Set the LEDs state."""
         # Update the state
         old_state = self._state
         self._state = state
 
         # Log the changes
-        for led, current_state in old_state.items():
-            new_state = state[led]
-            if new_state is not current_state:
+        changed = old_state ^ state
+        for led in self._leds:
+            if changed & 1 << led:
                 LOGGER.info(
-                    f"{KCHLED(led).name} changed from {current_state} to {new_state}",
+                    f"{KCHLED(led).name} changed from {bool(old_state & 1 << led)} "
+                    f"to {bool(state & 1 << led)}",
                 )
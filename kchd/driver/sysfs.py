@@ -0,0 +1,110 @@
+"""Control the LEDs through the sysfs interface to the GPIO lines."""
+import atexit
+import os
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+from kchd.hardware import DEVICE_TREE_SYS_PATH, GPIO_SYS_PATH, KCHLED, led_mask
+from kchd.types import KCHInfo, NoKCHException
+
+from .driver import LEDDriver
+from .hat import read_kch_info
+
+VALUES = (b"0", b"1")
+
+
+class SysfsDriver(LEDDriver):
+    """
+    Control the LEDs through the sysfs interface to the GPIO lines.
+
+    Each line is exported once, and the file descriptor of its value is
+    kept open, so that each update is a positioned write to each changed
+    line, without opening any files. Only the standard library is used.
+
+    Lines that are already outputs keep their level, so that an LED lit by
+    boot_40.service or the boot path does not flash off when the driver is
+    set up.
+    """
+
+    DEVICE_TREE_SYS_PATH = DEVICE_TREE_SYS_PATH
+    GPIO_SYS_PATH = GPIO_SYS_PATH
+
+    def __init__(self, leds: Set[KCHLED], *, gpio_path: Optional[Path] = None) -> None:
+        self._leds = leds
+        self._mask = led_mask(leds)
+        self._gpio_path = gpio_path or self.GPIO_SYS_PATH
+        self._state = 0
+
+        # The bit and the file descriptor of the value of each line.
+        self._lines: List[Tuple[int, int]] = []
+        try:
+            for led in sorted(leds):
+                self._lines.append((1 << led.value, self._setup_line(led.value)))
+        except OSError as e:
+            self._close_lines()
+            raise NoKCHException(
+                f"Unable to set up GPIO lines at {self._gpio_path}",
+            ) from e
+        atexit.register(self.close)
+
+    @classmethod
+    def probe(cls) -> KCHInfo:
+        """
+        Check that GPIO lines can be exported, and that a KCH is fitted.
+
+        :raises NoKCHException: There is no KCH fitted.
+        """
+        if not os.access(cls.GPIO_SYS_PATH / "export", os.W_OK):
+            raise NoKCHException(f"Unable to export GPIO lines at {cls.GPIO_SYS_PATH}")
+        return read_kch_info(cls.DEVICE_TREE_SYS_PATH)
+
+    def _setup_line(self, pin: int) -> int:
+        """Export a line and make it an output, returning its value descriptor."""
+        path = self._gpio_path / f"gpio{pin}"
+        if not path.is_dir():
+            (self._gpio_path / "export").write_text(str(pin))
+
+        if (path / "direction").read_text().strip() == "out":
+            if (path / "value").read_text().strip() == "1":
+                self._state |= 1 << pin
+        else:
+            # Setting the direction to low drives the line low as it becomes an output.
+            (path / "direction").write_text("low")
+        return os.open(path / "value", os.O_WRONLY)
+
+    def _close_lines(self) -> None:
+        """Close the value descriptors of the lines."""
+        for _, fd in self._lines:
+            os.close(fd)
+        self._lines = []
+
+    def close(self) -> None:
+        """Return the LED lines to inputs and unexport them."""
+        if not self._lines:
+            return
+        self._close_lines()
+        for led in sorted(self._leds):
+            (self._gpio_path / f"gpio{led.value}" / "direction").write_text("in")
+            (self._gpio_path / "unexport").write_text(str(led.value))
+        atexit.unregister(self.close)
+
+    def get_kch_info(self) -> KCHInfo:
+        """
+        Get information about the KCH on the Pi.
+
+        :raises NoKCHException: There is no KCH fitted.
+        """
+        return read_kch_info(self.DEVICE_TREE_SYS_PATH)
+
+    def set_state(self, state: int) -> None:
+        """Set the LEDs state, writing only the lines that have changed."""
+        if state & ~self._mask:
+            unknown_leds = {led for led in KCHLED if state & ~self._mask & 1 << led}
+            raise ValueError(f"Some LEDs are not controlled by kchd: {unknown_leds}")
+
+        changed = state ^ self._state
+        if changed:
+            for bit, fd in self._lines:
+                if changed & bit:
+                    os.pwrite(fd, VALUES[state & bit != 0], 0)
+            self._state = state
@@ -0,0 +1,98 @@
+"""Write the LEDs from a dedicated thread."""
+import logging
+import threading
+from typing import Optional
+
+from kchd.metrics import Metrics
+from kchd.types import KCHInfo, NoKCHException
+
+from .driver import LEDDriver
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ThreadedDriver(LEDDriver):
+    """
+    Write the LEDs from a dedicated thread, so that a slow driver never blocks.
+
+    States are passed to the thread through a single slot mailbox. If the
+    driver is still busy when a new state arrives, the waiting state is
+    replaced and dropped, so the driver always writes the latest state.
+
+    :param driver: The driver to write the LEDs with.
+    :param metrics: The metrics to count applied and dropped states in.
+    """
+
+    def __init__(self, driver: LEDDriver, metrics: Metrics) -> None:
+        self._driver = driver
+        self._metrics = metrics
+
+        self._condition = threading.Condition()
+        self._pending: Optional[int] = None
+        self._closing = False
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name="kchd-driver",
+            daemon=True,
+        )
+        self._thread.start()
+
+    @classmethod
+    def probe(cls) -> KCHInfo:
+        """
+        A threaded driver wraps another driver, which is probed instead.
+
+        :raises NoKCHException: Always.
+        """
+        raise NoKCHException("A threaded driver wraps another driver.")
+
+    def get_kch_info(self) -> KCHInfo:
+        """
+        Get information about the KCH this driver operates.
+
+        :raises NoKCHException: There is no KCH available.
+        """
+        return self._driver.get_kch_info()
+
+    def set_state(self, state: int) -> None:
+        """
+        Pass a state to the thread to write, replacing any waiting state.
+
+        Once the driver is closed, states are no longer written.
+        """
+        with self._condition:
+            if self._closing:
+                LOGGER.debug("The driver has been closed, the state is not written.")
+                return
+            if self._pending is not None:
+                self._metrics.driver_states["dropped"] += 1
+            self._pending = state
+            self._condition.notify()
+
+    def _run(self) -> None:
+        """Write each state, until closed and there are none waiting."""
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._pending is not None or self._closing,
+                )
+                state = self._pending
+                self._pending = None
+            if state is None:
+                return
+
+            try:
+                self._driver.set_state(state)
+            except Exception:
+                LOGGER.exception("Unable to write the LEDs.")
+            else:
+                with self._condition:
+                    self._metrics.driver_states["applied"] += 1
+
+    def close(self) -> None:
+        """Wait for the last state to be written, and stop the thread."""
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        self._thread.join()
@@ -0,0 +1,203 @@
+"""
+LED Effects.
+
+An effect makes a group of LEDs follow a repeating on/off pattern, such
+as blinking. Effects gate the state composed from the controllers, so an
+LED that is off stays off, and an LED that is on follows the pattern.
+
+All effects are driven from a single timer wheel, which wakes up once
+per tick, and only does work for the effects that change on that tick.
+"""
+import asyncio
+import logging
+from time import perf_counter
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from .metrics import Histogram
+
+LOGGER = logging.getLogger(__name__)
+
+# The length of a tick of the timer wheel, in seconds.
+TICK = 0.05
+
+# The number of slots in the timer wheel, which is the longest run of a pattern.
+WHEEL_SIZE = 64
+
+
+class Pattern(NamedTuple):
+    """
+    A repeating on/off pattern.
+
+    The runs are the number of ticks to spend in each state, alternating
+    between on and off, starting with on.
+    """
+
+    name: str
+    runs: Tuple[int, ...]
+
+    def validate(self) -> None:
+        """Check that the pattern can be driven by the timer wheel."""
+        if len(self.runs) == 0 or len(self.runs) % 2:
+            raise ValueError(f"{self.name} must have an even number of runs.")
+        if not all(0 < run < WHEEL_SIZE for run in self.runs):
+            raise ValueError(
+                f"The runs of {self.name} must be between 1 and {WHEEL_SIZE - 1} ticks.",
+            )
+
+
+BLINK = Pattern("blink", (10, 10))
+FAST_BLINK = Pattern("fast_blink", (3, 3))
+PULSE = Pattern("pulse", (2, 18))
+HEARTBEAT = Pattern("heartbeat", (2, 3, 2, 13))
+
+# The effects of a controller, a mapping of LED bitmask to pattern.
+Effects = Mapping[int, Pattern]
+
+NO_EFFECTS: Effects = {}
+
+
+class _ActiveEffect:
+    """An effect that is scheduled in the timer wheel."""
+
+    __slots__ = ("mask", "runs", "index", "cancelled")
+
+    def __init__(self, mask: int, runs: Tuple[int, ...]) -> None:
+        self.mask = mask
+        self.runs = runs
+        self.index = 0
+        self.cancelled = False
+
+
+_UNOWNED: Tuple[Effects, Tuple[_ActiveEffect, ...]] = (NO_EFFECTS, ())
+
+
+class EffectsEngine:
+    """
+    Drive LED effects from a shared timer wheel.
+
+    :param on_change: Called when the output of the effects has changed, and
+        the LEDs should be written.
+    :param tick_duration: A histogram of the time spent processing each tick.
+    """
+
+    __slots__ = (
+        "_on_change", "_tick_duration", "_slots", "_tick", "_task",
+        "_owners", "_effect_mask", "_on_mask",
+    )
+
+    def __init__(
+        self,
+        on_change: Callable[[], None],
+        *,
+        tick_duration: Optional[Histogram] = None,
+    ) -> None:
+        self._on_change = on_change
+        self._tick_duration = tick_duration
+
+        # Only the slots with effects due have a list, as most of the wheel is empty.
+        self._slots: Dict[int, List[_ActiveEffect]] = {}
+        self._tick = 0
+        self._task: Optional[asyncio.Task[None]] = None
+
+        self._owners: Dict[str, Tuple[Effects, Tuple[_ActiveEffect, ...]]] = {}
+        self._effect_mask = 0
+        self._on_mask = 0
+
+    @property
+    def task(self) -> Optional['asyncio.Task[None]']:
+        """The task that is ticking the timer wheel, if there are any effects."""
+        return self._task
+
+    @property
+    def active(self) -> bool:
+        """Determine whether any effects are active."""
+        return self._effect_mask != 0
+
+    def apply(self, state: int) -> int:
+        """Apply the current output of the effects to a state."""
+        return state & (~self._effect_mask | self._on_mask)
+
+    def set_effects(self, owner: str, effects: Effects) -> None:
+        """
+        Set the effects of an owner, replacing any existing ones.
+
+        Effects that are unchanged keep running without being restarted.
+        """
+        current, active = self._owners.get(owner, _UNOWNED)
+        if effects is current or effects == current:
+            return
+
+        for effect in active:
+            effect.cancelled = True
+        self._owners[owner] = (
+            effects,
+            tuple(self._schedule(mask, pattern) for mask, pattern in effects.items()),
+        )
+
+        self._effect_mask = 0
+        self._on_mask = 0
+        for _, owned in self._owners.values():
+            for effect in owned:
+                self._effect_mask |= effect.mask
+                if effect.index % 2 == 0:
+                    self._on_mask |= effect.mask
+
+        if self._effect_mask and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def _schedule(self, mask: int, pattern: Pattern) -> _ActiveEffect:
+        """Add an effect to the timer wheel, starting in the on state."""
+        pattern.validate()
+        effect = _ActiveEffect(mask, pattern.runs)
+        self._slots.setdefault((self._tick + pattern.runs[0]) % WHEEL_SIZE, []).append(
+            effect,
+        )
+        return effect
+
+    def tick(self) -> None:
+        """Advance the timer wheel by a tick, and toggle any effects that are due."""
+        self._tick += 1
+        slot = self._tick % WHEEL_SIZE
+        due = self._slots.pop(slot, None)
+        if due is None:
+            return
+
+        on_mask = self._on_mask
+        for effect in due:
+            if effect.cancelled:
+                continue
+            effect.index = (effect.index + 1) % len(effect.runs)
+            if effect.index % 2 == 0:
+                on_mask |= effect.mask
+            else:
+                on_mask &= ~effect.mask
+            self._slots.setdefault(
+                (self._tick + effect.runs[effect.index]) % WHEEL_SIZE, [],
+            ).append(effect)
+
+        if on_mask != self._on_mask:
+            self._on_mask = on_mask
+            self._on_change()
+
+    async def _run(self) -> None:
+        """Tick the timer wheel until there are no effects left."""
+        loop = asyncio.get_event_loop()
+        deadline = loop.time()
+        try:
+            while self._effect_mask:
+                deadline += TICK
+                await asyncio.sleep(max(deadline - loop.time(), 0))
+                start = perf_counter()
+                self.tick()
+                if self._tick_duration is not None:
+                    self._tick_duration.observe(perf_counter() - start)
+                if loop.time() > deadline + TICK:
+                    LOGGER.debug("Effects are running behind, skipping ticks.")
+                    deadline = loop.time()
+        finally:
+            self._task = None
+
+    def stop(self) -> None:
+        """Stop driving the effects."""
+        if self._task is not None:
+            self._task.cancel()
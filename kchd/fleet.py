@@ -0,0 +1,449 @@
+"""
+Simulate a fleet of robots, each running kchd, in a single process.
+
+Each simulated robot is a KCHDaemon with a MockDriver, and its own topic
+prefix on a shared in-process broker. All of the robots share the event
+loop and the configuration, so that hundreds of them can be run together,
+for example to test the dashboards at a competition venue.
+
+Run ``python -m kchd.fleet --robots 300`` to report the memory used by
+each robot, and the rate at which the fleet handles messages.
+"""
+import asyncio
+import gc
+import logging
+import tracemalloc
+from collections import defaultdict
+from itertools import chain
+from signal import SIGHUP, SIGINT, SIGTERM
+from time import perf_counter
+from typing import (
+    Callable,
+    Coroutine,
+    DefaultDict,
+    Dict,
+    List,
+    Match,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Tuple,
+)
+
+import click
+from astoria.common.code_status import CodeStatus
+from astoria.common.config import AstoriaConfig
+from astoria.common.ipc import ManagerMessage, ProcessManagerMessage
+from astoria.common.mqtt.topic import Topic
+from pydantic import BaseModel
+
+from .app import KCHDaemon
+from .config import KCHDConfig
+from .driver import MockDriver
+from .trace import Tracer
+
+LOGGER = logging.getLogger(__name__)
+
+Handler = Callable[[Match[str], str], Coroutine[None, None, None]]
+Subscription = Tuple[Pattern[str], Handler]
+
+# The astprocd payloads sent to each robot in turn, when measuring throughput.
+BENCHMARK_PAYLOADS = tuple(
+    ProcessManagerMessage(
+        status=ManagerMessage.Status.RUNNING,
+        code_status=code_status,
+        disk_info=None,
+    ).json()
+    for code_status in (CodeStatus.RUNNING, CodeStatus.FINISHED)
+)
+
+
+def robot_prefix(index: int) -> str:
+    """Get the topic prefix of a simulated robot."""
+    return f"robot{index:04d}"
+
+
+class LocalBroker:
+    """
+    An in-process stand-in for an MQTT broker.
+
+    Subscriptions are indexed by the first level of their topic, which is
+    the topic prefix of a robot, so a message is only matched against the
+    subscriptions of the robot that it is for.
+    """
+
+    def __init__(self) -> None:
+        self._subscriptions: DefaultDict[str, List[Subscription]] = defaultdict(list)
+        self._wildcards: List[Subscription] = []
+        self._retained: Dict[str, str] = {}
+        self._pending = 0
+        self.delivered = 0
+
+    def retained(self, topic: str) -> Optional[str]:
+        """Get the retained payload of a topic, if there is one."""
+        return self._retained.get(topic)
+
+    def subscribe(self, topic: Topic, handler: Handler) -> None:
+        """Subscribe to a topic, and receive any matching retained payloads."""
+        subscription = (topic.regex, handler)
+        if topic.parts[0] in Topic.WILDCARDS:
+            self._wildcards.append(subscription)
+        else:
+            self._subscriptions[topic.parts[0]].append(subscription)
+
+        for retained_topic, payload in self._retained.items():
+            match = subscription[0].match(retained_topic)
+            if match:
+                self._dispatch(handler, match, payload)
+
+    def publish(self, topic: str, payload: str, *, retain: bool = False) -> int:
+        """
+        Publish a payload, scheduling the handlers of matching subscriptions.
+
+        :returns: The number of handlers that were scheduled.
+        """
+        if retain:
+            self._retained[topic] = payload
+
+        scheduled = 0
+        root = topic.split("/", 1)[0]
+        for regex, handler in chain(self._subscriptions.get(root, ()), self._wildcards):
+            match = regex.match(topic)
+            if match:
+                self._dispatch(handler, match, payload)
+                scheduled += 1
+        return scheduled
+
+    def _dispatch(self, handler: Handler, match: Match[str], payload: str) -> None:
+        self._pending += 1
+        self.delivered += 1
+        task = asyncio.ensure_future(handler(match, payload))
+        task.add_done_callback(self._handled)
+
+    def _handled(self, task: 'asyncio.Future[None]') -> None:
+        self._pending -= 1
+
+    async def drain(self) -> None:
+        """Wait until all of the scheduled handlers have completed."""
+        while self._pending:
+            await asyncio.sleep(0)
+
+
+class LocalMQTTWrapper:
+    """
+    An in-process stand-in for MQTTWrapper, connected to a LocalBroker.
+
+    Messages are delivered directly to the subscribed handlers, in the
+    same way as MQTTWrapper.on_message.
+    """
+
+    __slots__ = ("_broker", "_client_name", "_topic_prefix", "is_connected")
+
+    def __init__(self, broker: LocalBroker, client_name: str, topic_prefix: str) -> None:
+        self._broker = broker
+        self._client_name = client_name
+        self._topic_prefix = topic_prefix
+        self.is_connected = False
+
+    @property
+    def mqtt_prefix(self) -> str:
+        """The topic prefix for MQTT."""
+        return f"{self._topic_prefix}/{self._client_name}"
+
+    async def connect(self) -> None:
+        """Connect to the broker."""
+        self.is_connected = True
+
+    async def disconnect(self) -> None:
+        """Disconnect from the broker."""
+        self.is_connected = False
+
+    async def wait_dependencies(self) -> None:
+        """There are no dependencies to wait for."""
+
+    def subscribe(self, topic: str, callback: Handler) -> None:
+        """Subscribe to an MQTT Topic."""
+        if len(topic) == 0:
+            topic_complete = Topic.parse(self.mqtt_prefix)
+        else:
+            topic_complete = Topic.parse(f"{self._topic_prefix}/{topic}")
+        self._broker.subscribe(topic_complete, callback)
+
+    def _topic(
+        self,
+        topic: str,
+        *,
+        auto_prefix_topic: bool,
+        auto_prefix_client_name: bool,
+    ) -> str:
+        """Get the complete topic to publish to, as MQTTWrapper.publish does."""
+        prefix = self.mqtt_prefix if auto_prefix_client_name else self._topic_prefix
+        if len(topic) == 0:
+            return prefix
+        elif auto_prefix_topic:
+            return f"{prefix}/{topic}"
+        return topic
+
+    def publish(
+        self,
+        topic: str,
+        payload: BaseModel,
+        *,
+        retain: bool = False,
+        auto_prefix_topic: bool = True,
+        auto_prefix_client_name: bool = True,
+    ) -> None:
+        """Publish a payload to the broker."""
+        topic_complete = self._topic(
+            topic,
+            auto_prefix_topic=auto_prefix_topic,
+            auto_prefix_client_name=auto_prefix_client_name,
+        )
+        self._broker.publish(topic_complete, payload.json(), retain=retain)
+
+
+def simulated_config(kchd_config: KCHDConfig) -> KCHDConfig:
+    """
+    Get the kchd config of a simulated robot.
+
+    The robots share one event loop, so a lagging loop is not the fault of
+    any one robot, and the watchdog is disabled. The robots do not publish
+    metrics, so that they only handle the messages sent to them.
+    """
+    if kchd_config.lag_threshold <= 0 and kchd_config.metrics_interval <= 0:
+        return kchd_config
+    return kchd_config.copy(update={"lag_threshold": 0.0, "metrics_interval": 0.0})
+
+
+class SimulatedKCHDaemon(KCHDaemon):
+    """
+    A KCHDaemon of a simulated robot.
+
+    The robot does not own the process: it does not install signal handlers
+    or setup logging, and the configuration is shared with the rest of the
+    fleet, rather than loaded from disk by each robot. See simulated_config
+    for the settings that are disabled.
+    """
+
+    _mqtt: LocalMQTTWrapper  # type: ignore[assignment]
+
+    def __init__(
+        self,
+        broker: LocalBroker,
+        topic_prefix: str,
+        config: AstoriaConfig,
+        kchd_config: KCHDConfig,
+    ) -> None:
+        self._broker = broker
+        self._topic_prefix = topic_prefix
+        self.config = config
+        self.kchd_config = simulated_config(kchd_config)
+        self._profile_at_start = False
+
+        self._setup_event_loop()
+        self._setup_mqtt()
+        self._init()
+
+    def _setup_event_loop(self) -> None:
+        # The fleet owns the event loop, and halts the robots itself.
+        self._stop_event = asyncio.Event()
+
+    def _setup_mqtt(self) -> None:
+        self._mqtt = LocalMQTTWrapper(self._broker, self.name, self._topic_prefix)
+
+    def _setup_tracer(self) -> None:
+        # Many robots would share the trace file, so none of them trace.
+        self._tracer = Tracer(None)
+
+    def _setup_driver(self) -> None:
+        self._driver = MockDriver(self._leds)
+        self._kch_info = self._driver.get_kch_info()
+
+
+class Fleet:
+    """
+    A fleet of simulated robots, sharing a LocalBroker.
+
+    :param robots: The number of robots in the fleet.
+    :param config: The astoria config shared by the robots.
+    :param kchd_config: The kchd config shared by the robots.
+    """
+
+    def __init__(
+        self,
+        robots: int,
+        *,
+        config: AstoriaConfig,
+        kchd_config: KCHDConfig,
+    ) -> None:
+        self.broker = LocalBroker()
+        # Disable the settings once, so that the robots share the config.
+        kchd_config = simulated_config(kchd_config)
+        self.robots = [
+            SimulatedKCHDaemon(self.broker, robot_prefix(index), config, kchd_config)
+            for index in range(robots)
+        ]
+
+    @property
+    def running(self) -> bool:
+        """Determine whether all of the robots have published their status."""
+        return all(
+            self.broker.retained(robot._mqtt.mqtt_prefix) is not None
+            for robot in self.robots
+        )
+
+    async def run(self) -> None:
+        """Run all of the robots until they are halted."""
+        await asyncio.gather(*(robot.run() for robot in self.robots))
+
+    async def wait_running(self) -> None:
+        """Wait until all of the robots are running."""
+        while not self.running:
+            await asyncio.sleep(0.01)
+
+    def halt(self) -> None:
+        """Stop all of the robots."""
+        for robot in self.robots:
+            robot.halt(silent=True)
+
+    async def send_round(self, payload: str) -> int:
+        """
+        Send an astprocd status to each robot, and wait for it to be handled.
+
+        :returns: The number of handlers the status was delivered to.
+        """
+        delivered = 0
+        for index in range(len(self.robots)):
+            delivered += self.broker.publish(
+                f"{robot_prefix(index)}/astprocd",
+                payload,
+                retain=True,
+            )
+        await self.broker.drain()
+        return delivered
+
+
+class FleetReport(NamedTuple):
+    """The memory used by a fleet, and the rate at which it handles messages."""
+
+    robots: int
+    bytes_per_robot: float
+    messages: int
+    duration: float
+
+    @property
+    def robots_per_gb(self) -> float:
+        """The number of robots that fit in a GB of memory."""
+        return 1e9 / self.bytes_per_robot
+
+    @property
+    def rate(self) -> float:
+        """The number of messages handled per second."""
+        return self.messages / self.duration
+
+    def format(self) -> str:
+        """Format the report for display."""
+        return (
+            f"robots={self.robots:<5} memory={self.bytes_per_robot / 1024:6.1f}KiB/robot "
+            f"robots/GB={self.robots_per_gb:8.0f} rate={self.rate:8.0f} msg/s"
+        )
+
+
+async def benchmark(
+    robots: int,
+    rounds: int,
+    *,
+    config: AstoriaConfig,
+    kchd_config: KCHDConfig,
+) -> FleetReport:
+    """
+    Measure the memory used by each robot of a fleet, and its throughput.
+
+    The memory is that allocated by starting the fleet and handling the
+    first round of messages. Each round sends an astprocd status to each
+    robot, and the throughput is measured over the remaining rounds.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        fleet = Fleet(robots, config=config, kchd_config=kchd_config)
+        task = asyncio.ensure_future(fleet.run())
+        await fleet.wait_running()
+        await fleet.send_round(BENCHMARK_PAYLOADS[0])
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Only the messages sent by the benchmark are counted, not those the
+    # robots publish themselves.
+    messages = 0
+    start = perf_counter()
+    for index in range(1, rounds + 1):
+        messages += await fleet.send_round(
+            BENCHMARK_PAYLOADS[index % len(BENCHMARK_PAYLOADS)],
+        )
+    duration = perf_counter() - start
+
+    fleet.halt()
+    await task
+    return FleetReport(
+        robots=robots,
+        bytes_per_robot=(after - before) / robots,
+        messages=messages,
+        duration=duration,
+    )
+
+
+@click.command("kchd-fleet")
+@click.option("-v", "--verbose", is_flag=True)
+@click.option("-c", "--astoria-config-file", type=click.Path(exists=True))
+@click.option("-k", "--kchd-config-file", type=click.Path(exists=True))
+@click.option(
+    "-n", "--robots", type=click.IntRange(min=1), default=100, show_default=True,
+)
+@click.option("--rounds", type=click.IntRange(min=1), default=None)
+def main(
+    *,
+    verbose: bool,
+    astoria_config_file: Optional[str],
+    kchd_config_file: Optional[str],
+    robots: int,
+    rounds: Optional[int],
+) -> None:
+    """
+    Run a fleet of simulated robots.
+
+    With --rounds, the memory and throughput of the fleet are reported,
+    otherwise the fleet runs until it is interrupted.
+    """
+    logging.basicConfig(
+        level=logging.DEBUG if verbose else logging.INFO,
+        format="%(asctime)s %(name)s %(levelname)s %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    if not verbose:
+        # Every robot logs its startup and each LED change.
+        logging.getLogger("kchd").setLevel(logging.WARNING)
+
+    config = AstoriaConfig.load(astoria_config_file)
+    kchd_config = KCHDConfig.load(kchd_config_file)
+    loop = asyncio.get_event_loop()
+
+    if rounds is not None:
+        report = loop.run_until_complete(
+            benchmark(robots, rounds, config=config, kchd_config=kchd_config),
+        )
+        click.echo(report.format())
+        return
+
+    fleet = Fleet(robots, config=config, kchd_config=kchd_config)
+    for signal in (SIGHUP, SIGINT, SIGTERM):
+        loop.add_signal_handler(signal, fleet.halt)
+    LOGGER.info(f"Running {robots} simulated robots.")
+    loop.run_until_complete(fleet.run())
+
+
+if __name__ == "__main__":
+    main()
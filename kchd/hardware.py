@@ -1,5 +1,33 @@
-"""Hardware definitions."""
+"""
+Hardware definitions.
+
+This module only uses the standard library, so that it can be used by the
+boot path before the rest of kchd is imported.
+"""
 import enum
+from pathlib import Path
+from typing import Iterable, Optional
+
+# The description of the fitted HAT in the device tree.
+DEVICE_TREE_SYS_PATH = Path("/sys/firmware/devicetree/base/hat")
+KCH_VENDOR = "Student Robotics"
+KCH_PRODUCT = "KCH V1 Rev B"
+
+# The memory mapped BCM283x GPIO registers, and their size.
+GPIOMEM_PATH = Path("/dev/gpiomem")
+GPIO_BLOCK_SIZE = 4096
+
+# The sysfs interface to the GPIO lines.
+GPIO_SYS_PATH = Path("/sys/class/gpio")
+
+# Offsets of the 32-bit GPIO registers, in words.
+GPFSEL0 = 0x00 // 4
+GPSET0 = 0x1C // 4
+GPCLR0 = 0x28 // 4
+GPLEV0 = 0x34 // 4
+
+GPIO_FSEL_INPUT = 0b000
+GPIO_FSEL_OUTPUT = 0b001
 
 
 @enum.unique
@@ -11,7 +39,6 @@ class KCHLED(enum.IntEnum):
     """
 
     # BOOT_20 = 7  # Controlled by hat EEPROM GPIO map
-    # BOOT_40 = 5  # Controlled by systemd
     BOOT_60 = 12
     BOOT_80 = 6
     BOOT_100 = 13
@@ -38,3 +65,87 @@ class KCHLED(enum.IntEnum):
     USER_C_BLUE = 17
 
     WIFI = 8
+
+    # Controlled by systemd, unless the boot controller is enabled. It is last,
+    # so that the bits of the other LEDs in a compact state are unchanged.
+    BOOT_40 = 5
+
+
+# The order of the LEDs in a compact state, in which bit n is the nth LED.
+LED_ORDER = tuple(KCHLED)
+
+# The bit of each LED in a state and in a compact state, as plain integers.
+_COMPACT_BITS = tuple((1 << led.value, 1 << index) for index, led in enumerate(LED_ORDER))
+
+
+def led_mask(leds: Iterable[KCHLED]) -> int:
+    """
+    Get the bitmask of a group of LEDs.
+
+    The state of the LEDs is stored as an integer, with the bit
+    of each LED set at the position of its BCM pin number.
+    """
+    mask = 0
+    for led in leds:
+        mask |= 1 << led.value
+    return mask
+
+
+def compact_state(state: int) -> int:
+    """
+    Convert a state of the LEDs to a compact state.
+
+    The bits of a state are at the BCM pin numbers of the LEDs, whereas the
+    bits of a compact state are in the order of LED_ORDER, so that it does
+    not depend on the wiring of the KCH.
+    """
+    compact = 0
+    for bit, compact_bit in _COMPACT_BITS:
+        if state & bit:
+            compact |= compact_bit
+    return compact
+
+
+def expand_state(compact: int) -> int:
+    """Convert a compact state of the LEDs back to a state."""
+    state = 0
+    for bit, compact_bit in _COMPACT_BITS:
+        if compact & compact_bit:
+            state |= bit
+    return state
+
+
+def read_hat_file(path: Path) -> Optional[str]:
+    """
+    Read a string from the device tree description of the HAT.
+
+    :returns: The string, or None if the file is not readable.
+    """
+    try:
+        data = path.read_text()
+    except (OSError, UnicodeDecodeError):
+        return None
+    return data.rstrip("\x00").strip()  # Null Terminated
+
+
+def is_kch_fitted(sys_path: Path = DEVICE_TREE_SYS_PATH) -> bool:
+    """Determine whether the fitted HAT is a KCH."""
+    vendor = read_hat_file(sys_path / "vendor")
+    product = read_hat_file(sys_path / "product")
+    return vendor == KCH_VENDOR and product == KCH_PRODUCT
+
+
+def gpio_function(registers: memoryview, pin: int) -> int:
+    """Get the function of a GPIO pin."""
+    register, index = divmod(pin, 10)
+    return registers[GPFSEL0 + register] >> (index * 3) & 0b111
+
+
+def set_gpio_function(registers: memoryview, pin: int, function: int) -> None:
+    """Set the function of a GPIO pin."""
+    register, index = divmod(pin, 10)
+    shift = index * 3
+    value = registers[GPFSEL0 + register]
+    value &= ~(0b111 << shift)
+    value |= function << shift
+    registers[GPFSEL0 + register] = value
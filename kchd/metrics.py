@@ -0,0 +1,105 @@
+"""Instrumentation of the internals of kchd."""
+from bisect import bisect_left
+from collections import defaultdict
+from typing import DefaultDict, Dict, Sequence
+
+from .types import HistogramData, KCHMetrics
+
+# Upper bounds of the duration histogram buckets, in seconds.
+DURATION_BUCKETS = (
+    1e-5, 2.5e-5, 5e-5,
+    1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3,
+    1e-2, 2.5e-2, 5e-2,
+    1e-1, 2.5e-1, 5e-1,
+    1.0,
+)
+
+
+class Histogram:
+    """
+    A histogram with fixed bucket bounds.
+
+    A value is counted in the first bucket with an upper bound that is
+    greater than or equal to it. Larger values are counted in a final
+    overflow bucket.
+    """
+
+    __slots__ = ("_bounds", "_counts", "_total")
+
+    def __init__(self, bounds: Sequence[float] = DURATION_BUCKETS) -> None:
+        self._bounds = tuple(bounds)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._total = 0.0
+
+    @property
+    def count(self) -> int:
+        """The number of values observed."""
+        return sum(self._counts)
+
+    def observe(self, value: float) -> None:
+        """Record a value in the histogram."""
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self._total += value
+
+    def snapshot(self) -> HistogramData:
+        """Get the current contents of the histogram."""
+        return HistogramData(
+            bounds=list(self._bounds),
+            counts=list(self._counts),
+            total=self._total,
+        )
+
+
+class Metrics:
+    """Metrics about the handling of messages and the updating of LEDs."""
+
+    __slots__ = (
+        "_handler_durations", "lock_wait", "driver_write", "effect_tick", "pwm_jitter",
+        "loop_lag", "parse_failures", "messages_received", "messages_ignored",
+        "messages_duplicate", "messages_pending", "messages_superseded", "driver_states",
+    )
+
+    def __init__(self) -> None:
+        self._handler_durations: Dict[str, Histogram] = {}
+        self.lock_wait = Histogram()
+        self.driver_write = Histogram()
+        self.effect_tick = Histogram()
+        self.pwm_jitter = Histogram()
+        self.loop_lag = Histogram()
+        self.parse_failures: DefaultDict[str, int] = defaultdict(int)
+        self.messages_received: DefaultDict[str, int] = defaultdict(int)
+        self.messages_ignored: DefaultDict[str, int] = defaultdict(int)
+        self.messages_duplicate: DefaultDict[str, int] = defaultdict(int)
+        self.messages_pending: DefaultDict[str, int] = defaultdict(int)
+        self.messages_superseded: DefaultDict[str, int] = defaultdict(int)
+        self.driver_states: DefaultDict[str, int] = defaultdict(int)
+
+    def handler_duration(self, controller: str) -> Histogram:
+        """Get the histogram of message handler durations for a controller."""
+        try:
+            return self._handler_durations[controller]
+        except KeyError:
+            histogram = self._handler_durations[controller] = Histogram()
+            return histogram
+
+    def snapshot(self) -> KCHMetrics:
+        """Get the current value of all metrics."""
+        return KCHMetrics(
+            handler_duration={
+                name: histogram.snapshot()
+                for name, histogram in self._handler_durations.items()
+            },
+            lock_wait=self.lock_wait.snapshot(),
+            driver_write=self.driver_write.snapshot(),
+            effect_tick=self.effect_tick.snapshot(),
+            pwm_jitter=self.pwm_jitter.snapshot(),
+            loop_lag=self.loop_lag.snapshot(),
+            parse_failures=dict(self.parse_failures),
+            messages_received=dict(self.messages_received),
+            messages_ignored=dict(self.messages_ignored),
+            messages_duplicate=dict(self.messages_duplicate),
+            messages_pending=dict(self.messages_pending),
+            messages_superseded=dict(self.messages_superseded),
+            driver_states=dict(self.driver_states),
+        )
@@ -0,0 +1,98 @@
+"""
+Ownership of the LEDs.
+
+Each LED is owned by the controllers that include it in their mask, in
+order of priority. Only the highest priority owner of an LED sets it, so
+a temporary owner with a higher priority, an override, can take over LEDs
+without the other controllers knowing.
+
+The table is rebuilt when an owner is added or removed, which is rare,
+so that composing the state on each update is a mask per owner.
+"""
+from typing import Dict, List, Mapping, NamedTuple, Set, Tuple, TypeVar
+
+from .effects import Effects
+from .hardware import KCHLED
+
+T = TypeVar("T")
+
+# The priority of the controllers, and of overrides that take over from them.
+CONTROLLER_PRIORITY = 0
+OVERRIDE_PRIORITY = 100
+
+# The priority of overrides that signal a fault, which other overrides take over from.
+FAULT_PRIORITY = 50
+
+
+class Override(NamedTuple):
+    """The state and effects of LEDs that are temporarily taken over."""
+
+    mask: int
+    state: int
+    effects: Effects
+
+
+class OwnershipTable:
+    """A table of the owners of each LED, in order of priority."""
+
+    __slots__ = ("_owners", "_table", "_effective_masks")
+
+    def __init__(self) -> None:
+        self._owners: Dict[str, Tuple[int, int]] = {}
+        self._table: Dict[KCHLED, Tuple[str, ...]] = {}
+        self._effective_masks: Dict[str, int] = {}
+
+    @property
+    def leds(self) -> Set[KCHLED]:
+        """The LEDs that have an owner."""
+        return set(self._table)
+
+    def add(self, name: str, mask: int, priority: int = CONTROLLER_PRIORITY) -> None:
+        """Add an owner of the LEDs in a mask, replacing any owner of the same name."""
+        self._owners[name] = (mask, priority)
+        self._rebuild()
+
+    def remove(self, name: str) -> None:
+        """Remove an owner, returning its LEDs to the next owner."""
+        if self._owners.pop(name, None) is not None:
+            self._rebuild()
+
+    def owners(self, led: KCHLED) -> Tuple[str, ...]:
+        """Get the owners of an LED, from the highest priority to the lowest."""
+        return self._table.get(led, ())
+
+    def effective_mask(self, name: str) -> int:
+        """Get the mask of the LEDs for which an owner has the highest priority."""
+        return self._effective_masks.get(name, 0)
+
+    def conflicts(self) -> List[Tuple[KCHLED, Tuple[str, ...]]]:
+        """Get the LEDs with more than one owner at the highest priority."""
+        conflicts = []
+        for led, owners in self._table.items():
+            priorities = [self._owners[owner][1] for owner in owners]
+            if priorities.count(priorities[0]) > 1:
+                conflicts.append((led, owners))
+        return conflicts
+
+    def _rebuild(self) -> None:
+        """Rebuild the table, breaking ties between priorities by order of addition."""
+        ordered = sorted(self._owners, key=lambda name: -self._owners[name][1])
+        self._table = {}
+        self._effective_masks = dict.fromkeys(self._owners, 0)
+        for led in KCHLED:
+            bit = 1 << led.value
+            owners = tuple(name for name in ordered if self._owners[name][0] & bit)
+            if owners:
+                self._table[led] = owners
+                self._effective_masks[owners[0]] |= bit
+
+
+def restrict(owned: Mapping[int, T], mask: int) -> Mapping[int, T]:
+    """
+    Restrict a mapping of LED bitmasks, such as effects, to the LEDs in a mask.
+
+    The mapping is returned unchanged if it is already within the mask.
+    """
+    if all(key & ~mask == 0 for key in owned):
+        return owned
+    return {key & mask: value for key, value in owned.items() if key & mask}
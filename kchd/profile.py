@@ -0,0 +1,151 @@
+"""
+Sampling profiler of the running daemon.
+
+A profile is captured by a CPU timer, ITIMER_PROF, which interrupts the
+event loop with SIGPROF after each interval of CPU time used by kchd. The
+handler records the stack of the event loop under the task that was
+running, so the time spent in each message handler, in pydantic
+validation, in update_leds and in the driver is attributed to what caused
+it. Time spent waiting for messages uses no CPU, and is not sampled. The
+other threads, such as the threaded driver, are sampled at the same time,
+under their own names.
+
+A timer is used rather than a thread that samples the stacks, as such a
+thread only gets the GIL when the event loop releases it, which is while
+it is waiting for messages, so every sample would be of the loop waiting.
+
+The profile is written in the folded stack format, one line per distinct
+stack, of the frames from the root to the leaf separated by semicolons,
+and the number of samples. It can be read by flamegraph.pl, inferno and
+speedscope.
+"""
+import asyncio
+import logging
+import signal
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+from typing import List, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+PROFILE_FILE_PREFIX = "kchd-profile"
+
+
+def frame_name(frame: FrameType) -> str:
+    """Get the name of a frame, as the module and the function."""
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+def folded_stack(root: List[str], leaf: FrameType) -> str:
+    """Get a stack in the folded format, from its root frames and its leaf frame."""
+    frames: List[str] = []
+    frame: Optional[FrameType] = leaf
+    while frame is not None:
+        frames.append(frame_name(frame))
+        frame = frame.f_back
+    frames.extend(reversed(root))
+    # Spaces and semicolons separate the fields of the folded format.
+    return ";".join(reversed(frames)).replace(" ", "_")
+
+
+def task_name(task: "asyncio.Task[object]") -> str:
+    """Get the name of a task, from the coroutine it runs."""
+    coroutine = task.get_coro()
+    return f"task:{getattr(coroutine, '__qualname__', type(coroutine).__name__)}"
+
+
+class SamplingProfiler:
+    """
+    Profile the event loop, and the other threads, by sampling their stacks.
+
+    The profiler must be started and stopped from the thread running the
+    event loop, which must be the main thread.
+
+    :param directory: The directory to write each profile to.
+    :param interval: The CPU time between samples, in seconds.
+    :param loop: The event loop, whose samples are grouped by task.
+    """
+
+    __slots__ = ("_directory", "_interval", "_loop", "_stacks", "_timer", "path")
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        interval: float,
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        self._directory = directory
+        self._interval = interval
+        self._loop = loop
+        self._stacks: Optional[Counter[str]] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The file that the last profile was written to.
+        self.path: Optional[Path] = None
+
+    @property
+    def running(self) -> bool:
+        """Determine whether a profile is being captured."""
+        return self._stacks is not None
+
+    def start(self, duration: float) -> bool:
+        """
+        Start capturing a profile, which is written when the window ends.
+
+        :returns: False if a profile is already being captured.
+        """
+        if self._stacks is not None:
+            return False
+        self._stacks = Counter()
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self._interval, self._interval)
+        self._timer = self._loop.call_later(duration, self.stop)
+        LOGGER.info(f"Profiling kchd for {duration} seconds.")
+        return True
+
+    def stop(self) -> None:
+        """End the window of the profile, and write it."""
+        if self._stacks is None:
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        stacks, self._stacks = self._stacks, None
+
+        path = self._directory / (
+            f"{PROFILE_FILE_PREFIX}-{datetime.now():%Y%m%d-%H%M%S}.folded"
+        )
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("w") as fh:
+                for stack, count in stacks.most_common():
+                    fh.write(f"{stack} {count}\n")
+        except OSError as e:
+            LOGGER.warning(f"Unable to write profile: {e}")
+            return
+        self.path = path
+        LOGGER.info(f"Wrote a profile of {sum(stacks.values())} samples to {path}")
+
+    def _sample(self, signum: int, frame: Optional[FrameType]) -> None:
+        """Record the stack of the event loop, and of each other thread."""
+        stacks = self._stacks
+        if stacks is None or frame is None:
+            return
+
+        root = [threading.current_thread().name]
+        task = asyncio.current_task(self._loop)
+        if task is not None:
+            root.append(task_name(task))
+        stacks[folded_stack(root, frame)] += 1
+
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, leaf in sys._current_frames().items():
+            if ident != threading.get_ident():
+                stacks[folded_stack([names.get(ident, str(ident))], leaf)] += 1
@@ -0,0 +1,183 @@
+"""
+Software PWM.
+
+The brightness of an LED is set by switching it on for part of each PWM
+period. A period is split into RESOLUTION slots, and all of the dimmed
+LEDs are written together by a single worker thread, rather than with a
+timer per LED. The worker only wakes up on the slots in which the output
+changes, so a steady colour costs a few writes per period.
+
+Like the effects, the brightness gates the state composed from the
+controllers, so an LED that is off stays off.
+"""
+import logging
+import threading
+from time import perf_counter
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from .driver import LEDDriver
+from .metrics import Histogram
+
+LOGGER = logging.getLogger(__name__)
+
+# The number of slots in a PWM period, which is the number of brightness levels.
+RESOLUTION = 16
+
+# The brightness of an LED that is fully on.
+MAX_BRIGHTNESS = 255
+
+# The brightness of the LEDs of a controller, a mapping of LED bitmask to brightness.
+Brightness = Mapping[int, int]
+
+NO_BRIGHTNESS: Brightness = {}
+
+
+def duty_slots(brightness: int) -> int:
+    """Get the number of slots of each period that an LED is on for."""
+    if not 0 <= brightness <= MAX_BRIGHTNESS:
+        raise ValueError(f"Brightness must be between 0 and {MAX_BRIGHTNESS}.")
+    return (brightness * RESOLUTION + MAX_BRIGHTNESS // 2) // MAX_BRIGHTNESS
+
+
+class PWMWorker:
+    """
+    Drive the brightness of LEDs with software PWM.
+
+    All writes to the driver are made through the worker. While the worker
+    thread is running, it is the only writer, and it writes each new state
+    on its next slot change, so that the writes of the event loop and the
+    worker thread are never interleaved.
+
+    :param driver: The driver to write the LEDs with.
+    :param frequency: The number of PWM periods per second. Zero or less
+        disables PWM, and any LED with a brightness is fully on.
+    :param jitter: A histogram of how late the worker wakes up for each slot.
+    :param writer: The driver to write the states set from the event loop
+        with, such as a threaded driver, if not the driver. The worker
+        thread does not block the event loop, so always uses the driver.
+    """
+
+    def __init__(
+        self,
+        driver: LEDDriver,
+        frequency: float,
+        *,
+        jitter: Optional[Histogram] = None,
+        writer: Optional[LEDDriver] = None,
+    ) -> None:
+        self._driver = driver
+        self._writer = writer or driver
+        self._frequency = frequency
+        self._jitter = jitter
+
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._owners: Dict[str, Brightness] = {}
+        self._state = 0
+        self._slot = 0
+        # The LEDs that are off in each slot, and the slots in which that changes.
+        self._off_masks = [0] * RESOLUTION
+        self._transitions: Tuple[int, ...] = ()
+
+    @property
+    def active(self) -> bool:
+        """Determine whether any LEDs are being dimmed."""
+        return bool(self._transitions)
+
+    @property
+    def thread(self) -> Optional[threading.Thread]:
+        """The worker thread, if any LEDs are being dimmed."""
+        return self._thread
+
+    def output(self, slot: int) -> int:
+        """Get the state written to the LEDs in a slot."""
+        return self._state & ~self._off_masks[slot]
+
+    def set_state(self, state: int) -> None:
+        """Set the state of the LEDs, and write it unless the worker thread will."""
+        with self._lock:
+            self._state = state
+            if self._thread is None:
+                self._writer.set_state(self.output(self._slot))
+
+    def set_brightness(self, owner: str, brightness: Brightness) -> None:
+        """Set the brightness of the LEDs of an owner, replacing any existing ones."""
+        if self._frequency <= 0:
+            return
+        if self._owners.get(owner, NO_BRIGHTNESS) == brightness:
+            return
+
+        off_masks: List[int] = [0] * RESOLUTION
+        self._owners[owner] = brightness
+        for owned in self._owners.values():
+            for mask, value in owned.items():
+                for slot in range(duty_slots(value), RESOLUTION):
+                    off_masks[slot] |= mask
+
+        with self._lock:
+            self._off_masks = off_masks
+            self._transitions = tuple(
+                slot for slot in range(RESOLUTION)
+                if off_masks[slot] != off_masks[slot - 1]
+            )
+            if self._transitions and self._thread is None:
+                self._stopping.clear()
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="kchd-pwm",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _next_transition(self, slot: int) -> int:
+        """Get the number of slots until the output next changes."""
+        for transition in self._transitions:
+            if transition > slot:
+                return transition - slot
+        return self._transitions[0] + RESOLUTION - slot
+
+    def _run(self) -> None:
+        """Write the LEDs on each slot that changes, until no LEDs are dimmed."""
+        slot_duration = 1 / (self._frequency * RESOLUTION)
+        period = slot_duration * RESOLUTION
+        deadline = perf_counter()
+        slot = self._slot
+        try:
+            while not self._stopping.is_set():
+                with self._lock:
+                    if not self._transitions:
+                        # Under the lock, so that set_brightness starts a new worker,
+                        # and set_state writes from here on.
+                        self._thread = None
+                        self._driver.set_state(self.output(slot))
+                        return
+                    self._slot = slot
+                    self._driver.set_state(self.output(slot))
+                    slots = self._next_transition(slot)
+                slot = (slot + slots) % RESOLUTION
+
+                deadline += slots * slot_duration
+                delay = deadline - perf_counter()
+                if delay > 0:
+                    self._stopping.wait(delay)
+                late = perf_counter() - deadline
+                if self._jitter is not None:
+                    self._jitter.observe(late)
+                if late > period:
+                    LOGGER.debug("PWM is running behind, skipping slots.")
+                    deadline = perf_counter()
+        except Exception:
+            LOGGER.exception("Unable to update the LEDs from the PWM worker.")
+        finally:
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    def stop(self) -> None:
+        """Stop the worker thread, if it is running."""
+        thread = self._thread
+        if thread is not None:
+            self._stopping.set()
+            thread.join()
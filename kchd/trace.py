@@ -0,0 +1,206 @@
+"""
+Trace of what kchd saw and did, for post-mortem analysis.
+
+Each inbound message, each composed LED state and each driver write is
+recorded as a fixed-size record in a ring of records in a memory mapped
+file. Records are written straight into the page cache, so the trace
+survives kchd crashing, and costs about a microsecond per record.
+
+The trace of the previous run is kept alongside, and either can be read
+with ``kchd-trace <file>``. The command is defined in kchd.cli, so that
+importing the tracer does not import click.
+
+File layout, all little endian:
+
+- A header of HEADER_SIZE bytes, see HEADER.
+- A table of TOPIC_SLOTS topic names, each TOPIC_SIZE bytes, null padded.
+  A topic id is an index into this table, plus one. Zero is no topic.
+- The ring of records, see RECORD. The record with sequence number n is
+  at index n % capacity. Unused records have a sequence number of zero.
+"""
+import enum
+import mmap
+import struct
+import zlib
+from datetime import datetime
+from pathlib import Path
+from time import monotonic_ns, time_ns
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+MAGIC = b"KCHT"
+VERSION = 1
+
+# magic, version, record size, capacity, wall clock ns, monotonic ns at the same time
+HEADER = struct.Struct("<4sHHIqq")
+HEADER_SIZE = 64
+
+TOPIC_SLOTS = 64
+TOPIC_SIZE = 64
+
+# sequence, monotonic ns, kind, topic id, value, extra
+RECORD = struct.Struct("<QqBxHII")
+
+RECORDS_OFFSET = HEADER_SIZE + TOPIC_SLOTS * TOPIC_SIZE
+
+UINT32_MAX = (1 << 32) - 1
+
+
+class TraceKind(enum.IntEnum):
+    """
+    The kind of a trace record.
+
+    MESSAGE: value is the CRC32 of the payload, extra is its length.
+    STATE: value is the LED state composed from the controllers.
+    WRITE: value is the LED state written, extra is the write time in ns.
+    """
+
+    MESSAGE = 1
+    STATE = 2
+    WRITE = 3
+
+
+class TraceRecord(NamedTuple):
+    """A decoded trace record."""
+
+    sequence: int
+    timestamp: float
+    kind: TraceKind
+    topic: str
+    value: int
+    extra: int
+
+    def format(self) -> str:
+        """Format the record for display."""
+        time = datetime.fromtimestamp(self.timestamp).isoformat(timespec="microseconds")
+        if self.kind is TraceKind.MESSAGE:
+            detail = f"{self.topic} crc32={self.value:08x} length={self.extra}"
+        elif self.kind is TraceKind.STATE:
+            detail = f"state={self.value:#010x}"
+        else:
+            detail = f"state={self.value:#010x} duration={self.extra}ns"
+        return f"{self.sequence:>10} {time} {self.kind.name:<7} {detail}"
+
+
+class Tracer:
+    """
+    Record a trace into a memory mapped ring file.
+
+    :param path: The trace file, or None to disable tracing. An existing
+        trace at the path is moved to PREVIOUS_SUFFIX.
+    :param capacity: The number of records in the ring. Zero disables tracing.
+    """
+
+    PREVIOUS_SUFFIX = ".prev"
+
+    def __init__(self, path: Optional[Path], capacity: int = 65536) -> None:
+        self._mmap: Optional[mmap.mmap] = None
+        self._capacity = capacity
+        self._sequence = 0
+        self._topics: Dict[str, int] = {}
+
+        if path is None or capacity <= 0:
+            return
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            path.replace(path.with_name(path.name + self.PREVIOUS_SUFFIX))
+        size = RECORDS_OFFSET + capacity * RECORD.size
+        with path.open("w+b") as fh:
+            fh.truncate(size)
+            self._mmap = mmap.mmap(fh.fileno(), size)
+        HEADER.pack_into(
+            self._mmap, 0,
+            MAGIC, VERSION, RECORD.size, capacity, time_ns(), monotonic_ns(),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Determine whether records are being written."""
+        return self._mmap is not None
+
+    def _topic_id(self, topic: str) -> int:
+        """Get the id of a topic, adding it to the topic table if it is new."""
+        try:
+            return self._topics[topic]
+        except KeyError:
+            pass
+        if self._mmap is None or len(self._topics) >= TOPIC_SLOTS:
+            return 0
+        topic_id = self._topics[topic] = len(self._topics) + 1
+        offset = HEADER_SIZE + (topic_id - 1) * TOPIC_SIZE
+        self._mmap[offset:offset + TOPIC_SIZE] = (
+            topic.encode()[:TOPIC_SIZE - 1].ljust(TOPIC_SIZE, b"\x00")
+        )
+        return topic_id
+
+    def _record(self, kind: TraceKind, topic_id: int, value: int, extra: int) -> None:
+        if self._mmap is None:
+            return
+        self._sequence += 1
+        RECORD.pack_into(
+            self._mmap,
+            RECORDS_OFFSET + self._sequence % self._capacity * RECORD.size,
+            self._sequence, monotonic_ns(), kind, topic_id, value, extra,
+        )
+
+    def message(self, topic: str, payload: str) -> None:
+        """Record a summary of an inbound message."""
+        if self._mmap is None:
+            return
+        data = payload.encode()
+        self._record(
+            TraceKind.MESSAGE,
+            self._topic_id(topic),
+            zlib.crc32(data),
+            min(len(data), UINT32_MAX),
+        )
+
+    def state(self, state: int) -> None:
+        """Record the LED state composed from the controllers."""
+        self._record(TraceKind.STATE, 0, state, 0)
+
+    def write(self, state: int, duration: float) -> None:
+        """Record a write of the LED state, and how long it took in seconds."""
+        self._record(TraceKind.WRITE, 0, state, min(int(duration * 1e9), UINT32_MAX))
+
+    def close(self) -> None:
+        """Flush the trace to disk, and stop tracing."""
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap.close()
+            self._mmap = None
+
+
+def read_trace(path: Path) -> List[TraceRecord]:
+    """
+    Read the records of a trace file, from oldest to newest.
+
+    :raises ValueError: The file is not a kchd trace.
+    """
+    data = path.read_bytes()
+    if len(data) < RECORDS_OFFSET:
+        raise ValueError(f"{path} is too short to be a kchd trace.")
+    magic, version, record_size, capacity, wall_ns, mono_ns = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a version {VERSION} kchd trace.")
+
+    topics = [""] + [
+        data[offset:offset + TOPIC_SIZE].rstrip(b"\x00").decode(errors="replace")
+        for offset in range(HEADER_SIZE, RECORDS_OFFSET, TOPIC_SIZE)
+    ]
+
+    def records() -> Iterator[TraceRecord]:
+        for fields in RECORD.iter_unpack(data[RECORDS_OFFSET:]):
+            sequence, timestamp, kind, topic_id, value, extra = fields
+            if sequence == 0:
+                continue
+            yield TraceRecord(
+                sequence=sequence,
+                timestamp=(wall_ns + timestamp - mono_ns) / 1e9,
+                kind=TraceKind(kind),
+                topic=topics[topic_id] if topic_id < len(topics) else "",
+                value=value,
+                extra=extra,
+            )
+
+    return sorted(records())
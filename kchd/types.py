@@ -1,16 +1,8 @@
 """Type definitions."""
-from typing import TYPE_CHECKING, Optional, Tuple, TypedDict
+from typing import Dict, List, Optional, Tuple
 
 from astoria.common.ipc import ManagerMessage, ManagerRequest
-from pydantic import BaseModel
-
-if TYPE_CHECKING:
-    from .controllers import (
-        AstmetadController,
-        AstprocdController,
-        AstwifidController,
-        SystemStatusController,
-    )
+from pydantic import BaseModel, validator
 
 
 class NoKCHException(Exception):
@@ -34,6 +26,66 @@ class KCHManagerMessage(ManagerMessage):
 
     kch: Optional[KCHInfo] = None
 
+    # Whether the event loop of kchd has been running late, see kchd.watchdog.
+    loop_lagging: bool = False
+
+
+class DriverChoice(BaseModel):
+    """The driver chosen for a HAT, which is cached between starts."""
+
+    hat_key: str
+    driver: str
+    kch_info: KCHInfo
+
+
+class HistogramData(BaseModel):
+    """
+    The contents of a histogram.
+
+    There is one more count than there are bounds, the last count
+    being for values greater than all of the bounds.
+    """
+
+    bounds: List[float]
+    counts: List[int]
+    total: float
+
+
+class KCHMetrics(BaseModel):
+    """
+    Metrics about the internals of kchd.
+
+    Published to astoria/kchd/metrics
+    """
+
+    handler_duration: Dict[str, HistogramData]
+    lock_wait: HistogramData
+    driver_write: HistogramData
+    effect_tick: HistogramData
+    pwm_jitter: HistogramData
+    loop_lag: HistogramData
+    parse_failures: Dict[str, int]
+    messages_received: Dict[str, int]
+    messages_ignored: Dict[str, int]
+    # The number of messages dropped as identical to the last one, by topic.
+    messages_duplicate: Dict[str, int]
+    # The number of messages waiting to be handled, and the number dropped
+    # as a newer message on the topic arrived first, by topic.
+    messages_pending: Dict[str, int]
+    messages_superseded: Dict[str, int]
+    driver_states: Dict[str, int]
+
+
+class KCHLEDState(BaseModel):
+    """
+    The state of the LEDs, composed from the controllers.
+
+    Published to astoria/kchd/state
+    """
+
+    # A bitmask of the LEDs that are on, in which bit n is hardware.LED_ORDER[n].
+    state: int
+
 
 class KCHLEDUpdateManagerRequest(ManagerRequest):
     """A request to change the controllable LEDs."""
@@ -43,16 +95,48 @@ class KCHLEDUpdateManagerRequest(ManagerRequest):
     b: Tuple[bool, bool, bool] = (False, False, False)
     c: Tuple[bool, bool, bool] = (False, False, False)
 
+    # The colour of an RGB LED, as the brightness of red, green and blue from
+    # 0 to 255. If given, the colour replaces the on/off values of the LED.
+    a_colour: Optional[Tuple[int, int, int]] = None
+    b_colour: Optional[Tuple[int, int, int]] = None
+    c_colour: Optional[Tuple[int, int, int]] = None
 
-class ControllerDictionary(TypedDict):
+    @validator("a_colour", "b_colour", "c_colour")
+    def _check_colour(
+        cls,
+        colour: Optional[Tuple[int, int, int]],
+    ) -> Optional[Tuple[int, int, int]]:
+        if colour is not None and not all(0 <= value <= 255 for value in colour):
+            raise ValueError("The brightness of a colour must be between 0 and 255.")
+        return colour
+
+
+class KCHIdentifyManagerRequest(ManagerRequest):
+    """A request to flash all of the LEDs, to identify the robot."""
+
+    # How long to flash the LEDs for, in seconds.
+    duration: float = 5.0
+
+    @validator("duration")
+    def _check_duration(cls, duration: float) -> float:
+        if not 0 < duration <= 60:
+            raise ValueError("The duration must be between 0 and 60 seconds.")
+        return duration
+
+
+class KCHProfileManagerRequest(ManagerRequest):
     """
-    The dictionary of LED Controllers.
+    A request to start capturing a profile of kchd.
 
-    Mypy is not currently clever enough to tell that
-    all of these are a subclass of LEDController.
+    If a profile is already being captured, it is ended early instead.
     """
 
-    astmetad: 'AstmetadController'
-    astprocd: 'AstprocdController'
-    astwifid: 'AstwifidController'
-    status: 'SystemStatusController'
+    # How long to capture the profile for, in seconds. If not given, the
+    # profile_duration from the config is used.
+    duration: Optional[float] = None
+
+    @validator("duration")
+    def _check_duration(cls, duration: Optional[float]) -> Optional[float]:
+        if duration is not None and not 0 < duration <= 600:
+            raise ValueError("The duration must be between 0 and 600 seconds.")
+        return duration
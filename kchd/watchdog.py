@@ -0,0 +1,90 @@
+"""
+Watchdog of the event loop.
+
+kchd runs on a single event loop, so a handler that blocks it delays
+everything else. The watchdog sleeps for a fixed interval, and measures
+how much later than that the loop wakes it up. This is the scheduling lag
+of the loop, which is recorded in a histogram.
+
+A single slow sample is not a stall, so the loop is only considered to be
+lagging once SUSTAINED_SAMPLES samples in a row are above the threshold,
+and only recovers once as many are below it.
+"""
+import asyncio
+from typing import Callable, Optional
+
+from .metrics import Histogram
+
+# The number of samples in a row needed to change whether the loop is lagging.
+SUSTAINED_SAMPLES = 4
+
+
+class LoopWatchdog:
+    """
+    Measure the scheduling lag of the event loop.
+
+    :param on_change: Called with whether the loop is lagging, when that changes.
+    :param interval: The time between samples, in seconds.
+    :param threshold: The lag above which the loop is lagging, in seconds.
+        Zero or less disables the watchdog.
+    :param lag: A histogram of the lag of each sample.
+    """
+
+    __slots__ = (
+        "_on_change", "_interval", "_threshold", "_lag", "_task", "_lagging", "_streak",
+    )
+
+    def __init__(
+        self,
+        on_change: Callable[[bool], None],
+        *,
+        interval: float,
+        threshold: float,
+        lag: Optional[Histogram] = None,
+    ) -> None:
+        self._on_change = on_change
+        self._interval = interval
+        self._threshold = threshold
+        self._lag = lag
+
+        self._task: Optional[asyncio.Task[None]] = None
+        self._lagging = False
+        # The number of samples in a row on the other side of the threshold.
+        self._streak = 0
+
+    @property
+    def lagging(self) -> bool:
+        """Determine whether the lag of the loop is above the threshold."""
+        return self._lagging
+
+    def sample(self, lag: float) -> None:
+        """Record a sample of the lag of the loop."""
+        if self._lag is not None:
+            self._lag.observe(lag)
+        if (lag > self._threshold) is self._lagging:
+            self._streak = 0
+            return
+        self._streak += 1
+        if self._streak >= SUSTAINED_SAMPLES:
+            self._streak = 0
+            self._lagging = not self._lagging
+            self._on_change(self._lagging)
+
+    async def _run(self) -> None:
+        """Sample the lag of the loop, until stopped."""
+        loop = asyncio.get_event_loop()
+        while True:
+            expected = loop.time() + self._interval
+            await asyncio.sleep(self._interval)
+            self.sample(loop.time() - expected)
+
+    def start(self) -> None:
+        """Start sampling the lag of the loop, unless the watchdog is disabled."""
+        if self._threshold > 0 and self._interval > 0 and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        """Stop sampling the lag of the loop."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
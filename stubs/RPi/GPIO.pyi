@@ -1,4 +1,4 @@
-from typing import Optional, List, Union
+from typing import List, Optional, Tuple, Union
 
 BCM: int = 11
 BOARD: int = 10
@@ -19,12 +19,15 @@ SPI: int = 41
 UNKNOWN: int = -1
 VERSION: str
 
-def cleanup() -> None: ...
+def cleanup(channel: Union[int, List[int], Tuple[int, ...], None] = None) -> None: ...
 def setmode(mode: int) -> None: ...
 def getmode() -> Optional[int]: ...
 def gpio_function() -> None: ...
 def input() -> None: ...
-def output(pin: int, state: int) -> None: ...
+def output(
+    pin: Union[int, List[int], Tuple[int, ...]],
+    state: Union[int, List[int], Tuple[int, ...]],
+) -> None: ...
 def setup(
     pin: Union[int, List[int]],
     direction: int,
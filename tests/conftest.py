@@ -0,0 +1,44 @@
+"""Shared fixtures for the tests."""
+from typing import AsyncIterator, List
+
+import pytest
+import pytest_asyncio
+from fakes import FakeKCHDaemon
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add the option to check the timing budgets of the benchmarks."""
+    parser.addoption(
+        "--benchmark",
+        action="store_true",
+        help="Run the benchmarks that assert a timing budget.",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Register the marker of the benchmarks that assert a timing budget."""
+    config.addinivalue_line(
+        "markers",
+        "benchmark: asserts a timing budget, so is only run with --benchmark",
+    )
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config,
+    items: List[pytest.Item],
+) -> None:
+    """Skip the benchmarks with a timing budget, unless asked for."""
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="timing budgets are only checked with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest_asyncio.fixture
+async def daemon() -> AsyncIterator[FakeKCHDaemon]:
+    """A daemon connected to the in-process stand-ins."""
+    daemon = FakeKCHDaemon()
+    yield daemon
+    daemon._pwm.stop()
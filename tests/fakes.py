@@ -0,0 +1,120 @@
+"""In-process stand-ins for the broker and the LEDs."""
+import asyncio
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+from kchd.app import KCHDaemon
+from kchd.controllers import LEDController
+from kchd.driver import MockDriver
+from kchd.fleet import LocalBroker, LocalMQTTWrapper
+from kchd.trace import Tracer
+
+C = TypeVar("C", bound=LEDController)
+
+ASTORIA_CONFIG = Path(__file__).parent.parent / "astoria.toml"
+
+
+class FakeMQTTWrapper(LocalMQTTWrapper):
+    """
+    An in-process stand-in for MQTTWrapper, with a broker of its own.
+
+    Published payloads are recorded rather than sent to the broker, and
+    messages are delivered to the subscribed handlers with deliver.
+    """
+
+    def __init__(self, client_name: str, topic_prefix: str = "astoria") -> None:
+        super().__init__(LocalBroker(), client_name, topic_prefix)
+        self.published: List[Tuple[str, str, bool]] = []
+
+    def publish(
+        self,
+        topic: str,
+        payload: BaseModel,
+        *,
+        retain: bool = False,
+        auto_prefix_topic: bool = True,
+        auto_prefix_client_name: bool = True,
+    ) -> None:
+        """Record a published payload."""
+        topic_complete = self._topic(
+            topic,
+            auto_prefix_topic=auto_prefix_topic,
+            auto_prefix_client_name=auto_prefix_client_name,
+        )
+        self.published.append((topic_complete, payload.json(), retain))
+
+    def deliver(self, topic: str, payload: str) -> int:
+        """
+        Deliver a message to the subscribed handlers.
+
+        :returns: The number of handlers that were scheduled.
+        """
+        return self._broker.publish(f"{self._topic_prefix}/{topic}", payload)
+
+
+class RecordingDriver(MockDriver):
+    """A MockDriver that records the time and value of each write."""
+
+    def __init__(self, *args: object, **kwargs: object) -> None:
+        super().__init__(*args, **kwargs)  # type: ignore[arg-type]
+        self.writes: List[Tuple[float, int]] = []
+
+    def set_state(self, state: int) -> None:
+        """Record the write, and then set the LEDs state."""
+        self.writes.append((time.perf_counter(), state))
+        super().set_state(state)
+
+
+class FakeKCHDaemon(KCHDaemon):
+    """A KCHDaemon connected to the in-process stand-ins."""
+
+    _mqtt: FakeMQTTWrapper  # type: ignore[assignment]
+    _driver: RecordingDriver
+
+    def __init__(
+        self,
+        *,
+        kchd_config_file: Optional[str] = None,
+        trace_path: Optional[Path] = None,
+    ) -> None:
+        self._trace_path = trace_path
+        super().__init__(False, str(ASTORIA_CONFIG), kchd_config_file=kchd_config_file)
+
+    def controller(self, name: str, controller_class: Type[C]) -> C:
+        """Get a controller, checking that it is of the expected class."""
+        controller = self._controllers[name]
+        assert isinstance(controller, controller_class)
+        return controller
+
+    def _setup_event_loop(self) -> None:
+        # Don't install signal handlers, the test owns the event loop.
+        self._stop_event = asyncio.Event()
+
+    def _setup_mqtt(self) -> None:
+        self._mqtt = FakeMQTTWrapper(self.name, self.config.mqtt.topic_prefix)
+
+    def _setup_tracer(self) -> None:
+        # Only trace if asked to, rather than into the astoria cache directory.
+        self._tracer = Tracer(self._trace_path, self.kchd_config.trace_records)
+
+    def _setup_driver(self) -> None:
+        self._driver = RecordingDriver(self._leds)
+        self._kch_info = self._driver.get_kch_info()
+
+
+async def settle(daemon: Optional[FakeKCHDaemon] = None) -> None:
+    """
+    Run the event loop until all other tasks are complete.
+
+    The long running effects task of the daemon, if given, is not waited for.
+    """
+    ignored = {asyncio.current_task()}
+    while True:
+        if daemon is not None:
+            ignored.add(daemon._effects.task)
+        if all(task in ignored for task in asyncio.all_tasks()):
+            return
+        await asyncio.sleep(0)
@@ -0,0 +1,43 @@
+"""Test the KCH Daemon."""
+import logging
+
+import pytest
+from fakes import FakeKCHDaemon, settle
+
+
+@pytest.mark.asyncio
+async def test_flush_logs_driver_errors(
+    daemon: FakeKCHDaemon,
+    caplog: pytest.LogCaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that an error writing the LEDs is logged by the flush task."""
+
+    def set_state(state: int) -> None:
+        raise ValueError("Bad state")
+
+    monkeypatch.setattr(daemon._driver, "set_state", set_state)
+
+    with caplog.at_level(logging.ERROR):
+        daemon.request_update()
+        await settle(daemon)
+
+    assert "Unable to update the LEDs." in caplog.text
+    assert daemon._flush_task is None
+
+
+@pytest.mark.asyncio
+async def test_update_masks_controller_state(
+    daemon: FakeKCHDaemon,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that a controller cannot set LEDs outside of its mask."""
+    controller = daemon._controllers["astwifid"]
+    for name, other in daemon._controllers.items():
+        if name != "astwifid":
+            monkeypatch.setattr(type(other), "get_state", lambda self: 0)
+    monkeypatch.setattr(type(controller), "get_state", lambda self: 0xFFFFFFFF)
+
+    await daemon.update_leds()
+
+    assert daemon._state & ~controller.mask == 0
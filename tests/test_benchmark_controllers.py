@@ -0,0 +1,51 @@
+"""
+Benchmark the cost of loading each controller.
+
+Each controller is loaded in a new interpreter that has already imported
+the daemon, so that only the cost of the controller itself is measured.
+Run with ``pytest -s`` to see the report.
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+from kchd.controllers.registry import BUILTIN_CONTROLLERS
+
+MEASURE = """
+import json, os, time
+import kchd.app
+from kchd.controllers import available_controllers, load_controller
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024
+controllers = available_controllers()
+before = rss()
+start = time.perf_counter()
+load_controller({name!r}, controllers)
+print(json.dumps({{"duration": time.perf_counter() - start, "rss": rss() - before}}))
+"""
+
+
+def measure_load(name: str) -> Dict[str, float]:
+    """Load a controller in a new interpreter, returning the time and memory."""
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE.format(name=name)],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).parent.parent,
+    )
+    data: Dict[str, float] = json.loads(result.stdout)
+    return data
+
+
+def test_controller_load_cost() -> None:
+    """Measure the time and memory taken to load each built in controller."""
+    for name in BUILTIN_CONTROLLERS:
+        cost = measure_load(name)
+        print(
+            f"{name:<10} load={cost['duration'] * 1e3:6.2f}ms "
+            f"rss=+{cost['rss']:5.0f}KiB",
+        )
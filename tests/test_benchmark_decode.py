@@ -0,0 +1,117 @@
+"""
+Benchmarks of the decoding of manager messages.
+
+The cost of decoding each message for all of its subscribers is compared
+between the shared decoder and validating the whole message with pydantic
+in each subscriber, run with ``pytest -s`` to see the report.
+"""
+import time
+from json import loads
+from typing import List, Tuple, Type
+
+import pytest
+from astoria.common.code_status import CodeStatus
+from astoria.common.config import AstoriaConfig
+from astoria.common.ipc import (
+    ManagerMessage,
+    MetadataManagerMessage,
+    ProcessManagerMessage,
+    WiFiManagerMessage,
+)
+from astoria.common.metadata import Metadata, RobotMode
+from fakes import ASTORIA_CONFIG
+from pydantic import BaseModel, parse_obj_as
+
+from kchd.controllers import (
+    AstmetadController,
+    AstprocdController,
+    AstwifidController,
+    SystemStatusController,
+    decode,
+)
+from kchd.controllers.decode import MessageDecoder, MessageSchema
+
+RUNNING = ManagerMessage.Status.RUNNING
+METADATA = Metadata.init(AstoriaConfig.load(str(ASTORIA_CONFIG)))
+STATUS = SystemStatusController.status_schema
+
+# The payloads of a topic, alternating so that each message is new to the decoder.
+Case = Tuple[str, List[str], List[MessageSchema]]
+
+CASES: List[Case] = [
+    (
+        "astwifid",
+        [
+            WiFiManagerMessage(status=RUNNING, hotspot_running=running).json()
+            for running in (True, False)
+        ],
+        [AstwifidController.schema],
+    ),
+    (
+        "astmetad",
+        [
+            MetadataManagerMessage(
+                status=RUNNING,
+                metadata=METADATA.copy(update={"mode": mode}),
+            ).json()
+            for mode in (RobotMode.COMP, RobotMode.DEV)
+        ],
+        [AstmetadController.schema, STATUS],
+    ),
+    (
+        "astprocd",
+        [
+            ProcessManagerMessage(
+                status=RUNNING,
+                code_status=code_status,
+                disk_info=None,
+            ).json()
+            for code_status in (CodeStatus.RUNNING, CodeStatus.FINISHED)
+        ],
+        [AstprocdController.schema, STATUS],
+    ),
+]
+
+MESSAGES = 5000
+
+
+def validate_each(payload: str, models: List[Type[BaseModel]]) -> None:
+    """Decode a payload by validating the whole message in each subscriber."""
+    for model in models:
+        parse_obj_as(model, loads(payload))
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case[0] for case in CASES])
+def test_decode_cost(case: Case, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Measure the cost of decoding each message for all of its subscribers."""
+    name, payloads, schemas = case
+    topic = f"astoria/{name}"
+    models = [schema.model for schema in schemas]
+
+    start = time.process_time()
+    for i in range(MESSAGES):
+        validate_each(payloads[i % 2], models)
+    validated = (time.process_time() - start) / MESSAGES
+
+    decoder = MessageDecoder()
+    start = time.process_time()
+    for i in range(MESSAGES):
+        for schema in schemas:
+            decoder.decode(topic, payloads[i % 2], schema)
+    decoded = (time.process_time() - start) / MESSAGES
+
+    print(
+        f"decode {name:<9} subscribers={len(schemas)} "
+        f"pydantic={validated * 1e6:7.2f}us shared={decoded * 1e6:7.2f}us "
+        f"speedup={validated / decoded:5.1f}x",
+    )
+
+    # The speedup comes from the fast path, which does not use pydantic.
+    def fail(*args: object) -> None:
+        raise AssertionError("The message was validated with pydantic.")
+
+    monkeypatch.setattr(decode, "parse_obj_as", fail)
+    decoder = MessageDecoder()
+    for payload in payloads:
+        for schema in schemas:
+            decoder.decode(topic, payload, schema)
@@ -0,0 +1,51 @@
+"""
+Benchmarks of the LED effects engine.
+
+Many patterns are run at once, and the CPU time spent on each tick of the
+timer wheel is reported, run with ``pytest -s --benchmark`` to see the report.
+"""
+import time
+
+import pytest
+
+from kchd.effects import (
+    BLINK,
+    FAST_BLINK,
+    HEARTBEAT,
+    PULSE,
+    TICK,
+    EffectsEngine,
+)
+from kchd.hardware import KCHLED
+
+PATTERNS = [BLINK, FAST_BLINK, PULSE, HEARTBEAT]
+
+# The share of each tick that the effects engine may spend on the CPU.
+CPU_BUDGET = 0.01
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+@pytest.mark.parametrize("patterns", [1, 22, 100, 1000])
+async def test_tick_cost(patterns: int) -> None:
+    """Measure the CPU time of each tick with many active patterns."""
+    leds = list(KCHLED)
+    engine = EffectsEngine(lambda: None)
+    for i in range(patterns):
+        engine.set_effects(
+            f"owner{i}",
+            {1 << leds[i % len(leds)].value: PATTERNS[i % len(PATTERNS)]},
+        )
+    engine.stop()
+
+    ticks = 10000
+    start = time.process_time()
+    for _ in range(ticks):
+        engine.tick()
+    per_tick = (time.process_time() - start) / ticks
+
+    print(
+        f"effects patterns={patterns:<5} cost={per_tick * 1e6:8.2f}us/tick "
+        f"cpu={per_tick / TICK:.4%}",
+    )
+    assert per_tick < CPU_BUDGET * TICK
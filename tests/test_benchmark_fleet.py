@@ -0,0 +1,77 @@
+"""
+Benchmarks of a fleet of simulated robots.
+
+The memory used by each robot, and the rate at which the fleet handles
+messages, are reported as the number of robots grows. Run with
+``pytest -s`` to see the report.
+"""
+import asyncio
+import logging
+
+import pytest
+from astoria.common.config import AstoriaConfig
+from astoria.common.ipc import ManagerMessage, WiFiManagerMessage
+from fakes import ASTORIA_CONFIG
+
+from kchd.config import KCHDConfig
+from kchd.fleet import Fleet, benchmark, robot_prefix
+from kchd.hardware import KCHLED, led_mask
+
+CONFIG = AstoriaConfig.load(str(ASTORIA_CONFIG))
+
+# Regression bound of the memory used by each robot.
+ROBOT_BUDGET = 64 * 1024
+
+
+@pytest.fixture(autouse=True)
+def quiet_logging(caplog: pytest.LogCaptureFixture) -> None:
+    """Only log warnings, so that logging is not benchmarked."""
+    caplog.set_level(logging.WARNING, logger="kchd")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("robots", [10, 100, 300])
+async def test_fleet(robots: int) -> None:
+    """Each robot handles the messages sent to it, within its memory budget."""
+    report = await benchmark(robots, 10, config=CONFIG, kchd_config=KCHDConfig())
+    print(report.format())
+    # Each astprocd message is handled by its controller and by the system status.
+    assert report.messages == robots * 10 * 2
+    assert report.bytes_per_robot < ROBOT_BUDGET
+
+
+@pytest.mark.asyncio
+async def test_fleet_robots_are_isolated() -> None:
+    """A message to one robot only changes the LEDs of that robot."""
+    fleet = Fleet(3, config=CONFIG, kchd_config=KCHDConfig())
+    task = asyncio.ensure_future(fleet.run())
+    await fleet.wait_running()
+
+    message = WiFiManagerMessage(
+        status=ManagerMessage.Status.RUNNING,
+        hotspot_running=True,
+    )
+    fleet.broker.publish(f"{robot_prefix(1)}/astwifid", message.json())
+    await fleet.broker.drain()
+
+    states = [robot._controllers["astwifid"].get_state() for robot in fleet.robots]
+    assert states == [0, led_mask([KCHLED.WIFI]), 0]
+
+    fleet.halt()
+    await task
+
+
+@pytest.mark.asyncio
+async def test_fleet_disables_watchdog_and_metrics() -> None:
+    """The robots share a loop, so none of them watch its lag or publish metrics."""
+    fleet = Fleet(3, config=CONFIG, kchd_config=KCHDConfig(lag_threshold=1e-9))
+    task = asyncio.ensure_future(fleet.run())
+    await fleet.wait_running()
+
+    assert all(robot.kchd_config is fleet.robots[0].kchd_config for robot in fleet.robots)
+    assert all(not robot._watchdog.lagging for robot in fleet.robots)
+    assert all(robot._watchdog._task is None for robot in fleet.robots)
+    assert fleet.robots[0].kchd_config.metrics_interval == 0
+
+    fleet.halt()
+    await task
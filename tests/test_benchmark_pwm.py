@@ -0,0 +1,58 @@
+"""
+Benchmarks of the software PWM.
+
+All nine colour channels of the user LEDs are dimmed to a different
+brightness, which is the most work for the worker. The CPU time used and
+how late the worker wakes up are reported for a range of PWM frequencies,
+run with ``pytest -s`` to see the report.
+"""
+import time
+from typing import List
+
+import pytest
+from fakes import RecordingDriver
+
+from kchd.controllers import MQTTRequestController
+from kchd.hardware import led_mask
+from kchd.metrics import Histogram
+from kchd.pwm import RESOLUTION, PWMWorker
+
+DURATION = 0.5
+
+
+def quantile(histogram: Histogram, fraction: float) -> float:
+    """Get the upper bound of the bucket containing a quantile of a histogram."""
+    data = histogram.snapshot()
+    target = fraction * sum(data.counts)
+    seen = 0
+    for bound, count in zip(data.bounds + [float("inf")], data.counts):
+        seen += count
+        if seen >= target:
+            return bound
+    return float("inf")
+
+
+@pytest.mark.parametrize("frequency", [50, 100, 200, 500])
+def test_pwm_cost(frequency: int) -> None:
+    """Measure the CPU usage and jitter of the worker at a PWM frequency."""
+    leds = MQTTRequestController.leds[:9]
+    driver = RecordingDriver(set(leds))
+    jitter = Histogram()
+    worker = PWMWorker(driver, frequency, jitter=jitter)
+    worker.set_state(led_mask(leds))
+
+    brightness = {1 << led.value: 25 * (i + 1) for i, led in enumerate(leds)}
+    cpu_start = time.process_time()
+    worker.set_brightness("bench", brightness)
+    time.sleep(DURATION)
+    worker.stop()
+    cpu = (time.process_time() - cpu_start) / DURATION
+
+    writes: List[float] = [write_time for write_time, _ in driver.writes]
+    print(
+        f"pwm frequency={frequency:<4}Hz slots/s={frequency * RESOLUTION:<5} "
+        f"writes/s={len(writes) / DURATION:7.0f} cpu={cpu:7.2%} "
+        f"jitter p50<={quantile(jitter, 0.5) * 1e6:7.0f}us "
+        f"p99<={quantile(jitter, 0.99) * 1e6:7.0f}us",
+    )
+    assert len(writes) > 1
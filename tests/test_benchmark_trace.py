@@ -0,0 +1,69 @@
+"""
+Benchmarks of the post-mortem trace.
+
+The cost of each record, and of tracing each LED update, is reported, run
+with ``pytest -s --benchmark`` to see the report.
+"""
+import logging
+import time
+from pathlib import Path
+
+import pytest
+from fakes import FakeKCHDaemon
+
+from kchd.trace import Tracer
+
+RECORDS = 100000
+
+# The maximum cost of a record, in seconds.
+RECORD_BUDGET = 5e-6
+
+PAYLOAD = '{"status": "RUNNING", "code_status": "running", "disk_info": null}'
+
+
+@pytest.mark.benchmark
+def test_record_cost(tmp_path: Path) -> None:
+    """Measure the time taken to write each kind of record."""
+    tracer = Tracer(tmp_path / "trace.bin", 65536)
+
+    start = time.perf_counter()
+    for _ in range(RECORDS):
+        tracer.message("astoria/astprocd", PAYLOAD)
+    message = (time.perf_counter() - start) / RECORDS
+
+    start = time.perf_counter()
+    for state in range(RECORDS):
+        tracer.write(state, 1e-6)
+    write = (time.perf_counter() - start) / RECORDS
+    tracer.close()
+
+    print(
+        f"trace message={message * 1e6:5.2f}us/record "
+        f"write={write * 1e6:5.2f}us/record",
+    )
+    assert message < RECORD_BUDGET
+    assert write < RECORD_BUDGET
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_update_overhead(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """Measure the cost of tracing an LED update."""
+    caplog.set_level(logging.WARNING, logger="kchd")
+    updates = 5000
+
+    durations = []
+    for trace_path in (None, tmp_path / "trace.bin"):
+        daemon = FakeKCHDaemon(trace_path=trace_path)
+        start = time.perf_counter()
+        for _ in range(updates):
+            await daemon.update_leds()
+        durations.append((time.perf_counter() - start) / updates)
+        daemon._tracer.close()
+
+    untraced, traced = durations
+    print(
+        f"trace update untraced={untraced * 1e6:5.2f}us traced={traced * 1e6:5.2f}us "
+        f"overhead={(traced - untraced) * 1e6:5.2f}us/update",
+    )
+    assert traced - untraced < 2 * RECORD_BUDGET
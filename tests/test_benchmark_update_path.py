@@ -0,0 +1,286 @@
+"""
+Benchmarks of the LED update path.
+
+Synthetic message storms are replayed against a KCHDaemon that is connected
+to an in-process broker stand-in and a recording driver. The latency from
+payload delivery to the driver write is reported, run with ``pytest -s``
+to see the report.
+"""
+import gc
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Iterator, List, NamedTuple, Tuple
+
+import pytest
+from astoria.common.code_status import CodeStatus
+from astoria.common.config import AstoriaConfig
+from astoria.common.ipc import (
+    ManagerMessage,
+    MetadataManagerMessage,
+    ProcessManagerMessage,
+    WiFiManagerMessage,
+)
+from astoria.common.metadata import Metadata, RobotMode
+from fakes import ASTORIA_CONFIG, FakeKCHDaemon, settle
+
+from kchd.controllers import SystemStatusController
+
+Message = Tuple[str, str]
+Batch = List[Message]
+
+RUNNING = ManagerMessage.Status.RUNNING
+CONFIG = AstoriaConfig.load(str(ASTORIA_CONFIG))
+METADATA = Metadata.init(CONFIG)
+
+# Regression bounds of test_update_memory, per update.
+PEAK_BUDGET = 4096
+RETAINED_BUDGET = 0.1
+
+
+class BenchmarkResult(NamedTuple):
+    """The results of replaying a message storm."""
+
+    name: str
+    latencies: List[float]
+    messages: int
+    writes: int
+    duration: float
+
+    def report(self) -> str:
+        """Format the results for display."""
+        p50, p99 = percentiles(self.latencies)
+        return (
+            f"{self.name:<16} messages={self.messages:<6} writes={self.writes:<5} "
+            f"p50={p50 * 1e6:8.1f}us p99={p99 * 1e6:8.1f}us "
+            f"rate={self.messages / self.duration:10.0f} msg/s"
+        )
+
+
+def percentiles(latencies: List[float]) -> Tuple[float, float]:
+    """Calculate the p50 and p99 of some latencies."""
+    if len(latencies) < 2:
+        return (latencies or [0.0])[0], (latencies or [0.0])[0]
+    quantiles = statistics.quantiles(latencies, n=100)
+    return quantiles[49], quantiles[98]
+
+
+def astprocd(code_status: CodeStatus) -> Message:
+    """An astprocd status message."""
+    message = ProcessManagerMessage(
+        status=RUNNING,
+        code_status=code_status,
+        disk_info=None,
+    )
+    return "astprocd", message.json()
+
+
+def astmetad(mode: RobotMode) -> Message:
+    """An astmetad status message."""
+    metadata = METADATA.copy(update={"mode": mode})
+    return "astmetad", MetadataManagerMessage(status=RUNNING, metadata=metadata).json()
+
+
+def astwifid(hotspot_running: bool) -> Message:
+    """An astwifid status message."""
+    message = WiFiManagerMessage(status=RUNNING, hotspot_running=hotspot_running)
+    return "astwifid", message.json()
+
+
+def other_manager(index: int, counter: int) -> Message:
+    """A status message from a manager that kchd does not use."""
+    return f"manager{index}", f'{{"status": "RUNNING", "counter": {counter}}}'
+
+
+def steady_state(steps: int) -> Iterator[Batch]:
+    """A single manager message at a time."""
+    for i in range(steps):
+        yield [astwifid(i % 2 == 0)]
+
+
+def reconnect_bursts(steps: int) -> Iterator[Batch]:
+    """All retained manager messages arriving at once."""
+    for i in range(steps):
+        odd = i % 2 == 1
+        yield [
+            ("astdiskd", '{"status": "RUNNING", "disks": {}}'),
+            astmetad(RobotMode.COMP if odd else RobotMode.DEV),
+            astprocd(CodeStatus.RUNNING if odd else CodeStatus.FINISHED),
+            astwifid(odd),
+        ] + [other_manager(index, i) for index in range(20)]
+
+
+def flapping_astprocd(steps: int, flaps: int = 50) -> Iterator[Batch]:
+    """A misbehaving astprocd changing state repeatedly."""
+    statuses = [CodeStatus.RUNNING, CodeStatus.CRASHED, CodeStatus.STARTING]
+    for i in range(steps):
+        yield [astprocd(statuses[(i + j) % len(statuses)]) for j in range(flaps)]
+
+
+def wildcard_flood(steps: int, flood: int = 200) -> Iterator[Batch]:
+    """Traffic from many unused managers, followed by a single relevant change."""
+    for i in range(steps):
+        yield [other_manager(index, i) for index in range(flood)] + [
+            astwifid(i % 2 == 0),
+        ]
+
+
+def user_led_stream(steps: int, frames: int = 5) -> Iterator[Batch]:
+    """Usercode animating the user LEDs, faster than the event loop runs."""
+    sequence = 0
+    for i in range(steps):
+        batch = []
+        for _ in range(frames):
+            sequence += 1
+            batch.append(("kchd/stream/leds", f"{sequence},{sequence % 1024}"))
+        yield batch
+
+
+async def replay(
+    daemon: FakeKCHDaemon,
+    name: str,
+    batches: Iterator[Batch],
+) -> BenchmarkResult:
+    """Replay batches of messages, measuring the latency until the next write."""
+    driver = daemon._driver
+    latencies: List[float] = []
+    messages = 0
+    writes_before = len(driver.writes)
+    start = time.perf_counter()
+
+    for batch in batches:
+        batch_writes = len(driver.writes)
+        delivered = time.perf_counter()
+        for topic, payload in batch:
+            daemon._mqtt.deliver(topic, payload)
+        await settle(daemon)
+        messages += len(batch)
+        if len(driver.writes) > batch_writes:
+            write_time, _ = driver.writes[batch_writes]
+            latencies.append(write_time - delivered)
+
+    return BenchmarkResult(
+        name=name,
+        latencies=latencies,
+        messages=messages,
+        writes=len(driver.writes) - writes_before,
+        duration=time.perf_counter() - start,
+    )
+
+
+@pytest.fixture(autouse=True)
+def quiet_logging(caplog: pytest.LogCaptureFixture) -> None:
+    """Only log warnings, so that logging is not benchmarked."""
+    caplog.set_level(logging.WARNING, logger="kchd")
+
+
+@pytest.mark.asyncio
+async def test_steady_state(daemon: FakeKCHDaemon) -> None:
+    """Each message results in a single write."""
+    result = await replay(daemon, "steady state", steady_state(500))
+    print(result.report())
+    assert result.writes == 500
+
+
+@pytest.mark.asyncio
+async def test_reconnect_bursts(daemon: FakeKCHDaemon) -> None:
+    """A burst of retained messages is coalesced into a single write."""
+    result = await replay(daemon, "reconnect burst", reconnect_bursts(200))
+    print(result.report())
+    assert result.writes == 200
+
+
+@pytest.mark.asyncio
+async def test_flapping_astprocd(daemon: FakeKCHDaemon) -> None:
+    """A flapping astprocd is coalesced into a single write."""
+    result = await replay(daemon, "flapping astprocd", flapping_astprocd(100))
+    print(result.report())
+    assert result.writes == 100
+
+
+@pytest.mark.asyncio
+async def test_wildcard_flood(daemon: FakeKCHDaemon) -> None:
+    """Traffic from unused managers does not result in a write."""
+    result = await replay(daemon, "wildcard flood", wildcard_flood(50))
+    print(result.report())
+    assert result.writes == 50
+
+
+@pytest.mark.asyncio
+async def test_user_led_stream(daemon: FakeKCHDaemon) -> None:
+    """Frames of the user LED stream are coalesced into a single write."""
+    result = await replay(daemon, "user LED stream", user_led_stream(200))
+    print(result.report())
+    assert result.writes == 200
+
+
+async def toggle_updates(daemon: FakeKCHDaemon, updates: int) -> float:
+    """Update the LEDs with a state that changes each time, returning the mean time."""
+    status = daemon.controller("status", SystemStatusController)
+    start = time.perf_counter()
+    for i in range(updates):
+        status.kchd_running = i % 2 == 0
+        await daemon.update_leds()
+    return (time.perf_counter() - start) / updates
+
+
+@pytest.mark.asyncio
+async def test_state_publication(daemon: FakeKCHDaemon) -> None:
+    """Measure the cost of publishing each change of state, against the update."""
+    updates = 1000
+    daemon.kchd_config = daemon.kchd_config.copy(update={"state_interval": 0})
+
+    # The state is not published until connected to the broker.
+    unpublished = await toggle_updates(daemon, updates)
+    await daemon._mqtt.connect()
+    published = await toggle_updates(daemon, updates)
+
+    print(
+        f"state publication update={unpublished * 1e6:.1f}us "
+        f"published={published * 1e6:.1f}us "
+        f"overhead={(published - unpublished) / unpublished:.0%}",
+    )
+    topics = [topic for topic, _, _ in daemon._mqtt.published]
+    assert topics.count("astoria/kchd/state") == updates
+
+
+@pytest.mark.asyncio
+async def test_update_memory(daemon: FakeKCHDaemon) -> None:
+    """
+    Measure the memory used by each update of the LEDs.
+
+    The peak is the most memory held at once during an update, and the
+    retained blocks are those still allocated after the updates, which
+    should be none, as the state of the LEDs has not changed.
+    """
+    updates = 1000
+    peaks: List[int] = []
+
+    tracemalloc.start()
+    try:
+        for _ in range(updates):
+            tracemalloc.clear_traces()
+            await daemon.update_leds()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak)
+    finally:
+        tracemalloc.stop()
+
+    # The recording driver keeps every write, which is not part of the update path.
+    daemon._driver.writes.clear()
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    for _ in range(updates):
+        await daemon.update_leds()
+    daemon._driver.writes.clear()
+    gc.collect()
+    retained = sys.getallocatedblocks() - blocks_before
+
+    print(
+        f"update_leds      peak={statistics.mean(peaks):.0f} bytes/update "
+        f"retained={retained / updates:.3f} blocks/update",
+    )
+    assert statistics.mean(peaks) < PEAK_BUDGET
+    assert retained < updates * RETAINED_BUDGET
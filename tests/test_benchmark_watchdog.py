@@ -0,0 +1,39 @@
+"""
+Benchmarks of the watchdog of the event loop.
+
+The CPU time of each sample, including waking up the event loop, is
+reported as a share of the default sample interval, run with
+``pytest -s --benchmark`` to see the report.
+"""
+import asyncio
+import time
+
+import pytest
+
+from kchd.config import KCHDConfig
+from kchd.metrics import Histogram
+from kchd.watchdog import LoopWatchdog
+
+# The share of the default sample interval that the watchdog may spend on the CPU.
+CPU_BUDGET = 0.005
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_sample_cost() -> None:
+    """Measure the CPU time of each sample of the lag of the loop."""
+    lag = Histogram()
+    watchdog = LoopWatchdog(lambda lagging: None, interval=0.001, threshold=1.0, lag=lag)
+
+    start = time.process_time()
+    watchdog.start()
+    await asyncio.sleep(0.5)
+    watchdog.stop()
+    per_sample = (time.process_time() - start) / lag.count
+
+    interval = KCHDConfig().lag_interval
+    print(
+        f"watchdog samples={lag.count:<5} cost={per_sample * 1e6:8.2f}us/sample "
+        f"cpu={per_sample / interval:.4%}",
+    )
+    assert per_sample < CPU_BUDGET * interval
@@ -0,0 +1,109 @@
+"""
+Test the boot path, and benchmark the time until the boot LED is lit.
+
+The boot path is run in a new interpreter, so that the modules it imports
+can be measured. Run with ``pytest -s`` to see the report.
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from kchd.boot import light_boot_led
+from kchd.hardware import (
+    GPFSEL0,
+    GPIO_BLOCK_SIZE,
+    GPSET0,
+    KCH_PRODUCT,
+    KCH_VENDOR,
+    KCHLED,
+)
+
+# Modules that must not be imported before the boot LED is lit.
+HEAVY_MODULES = ["asyncio", "astoria", "click", "pydantic", "kchd.app"]
+
+MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{
+    "duration": time.perf_counter() - start,
+    "modules": sorted(sys.modules),
+}}))
+"""
+
+
+def measure_import(module: str) -> Dict[str, object]:
+    """Import a module in a new interpreter, returning the time and modules."""
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE.format(module=module)],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).parent.parent,
+    )
+    data: Dict[str, object] = json.loads(result.stdout)
+    return data
+
+
+@pytest.fixture
+def sys_path(tmp_path: Path) -> Path:
+    """A fake device tree description of a KCH."""
+    path = tmp_path / "hat"
+    path.mkdir()
+    (path / "vendor").write_text(KCH_VENDOR + "\x00")
+    (path / "product").write_text(KCH_PRODUCT + "\x00")
+    return path
+
+
+@pytest.fixture
+def gpiomem(tmp_path: Path) -> Path:
+    """A fake register map."""
+    path = tmp_path / "gpiomem"
+    path.write_bytes(bytes(GPIO_BLOCK_SIZE))
+    return path
+
+
+def read_register(path: Path, offset: int) -> int:
+    """Read a 32-bit register from the fake register map."""
+    data = path.read_bytes()
+    return int.from_bytes(data[offset * 4:offset * 4 + 4], "little")
+
+
+def test_light_boot_led(sys_path: Path, gpiomem: Path) -> None:
+    """Test that the boot LED is made an output and set high."""
+    assert light_boot_led(sys_path=sys_path, gpiomem_path=gpiomem)
+
+    register, pin = divmod(KCHLED.BOOT_60.value, 10)
+    assert read_register(gpiomem, GPFSEL0 + register) >> (pin * 3) & 0b111 == 0b001
+    assert read_register(gpiomem, GPSET0) == 1 << KCHLED.BOOT_60.value
+
+
+def test_light_boot_led_no_kch(tmp_path: Path, gpiomem: Path) -> None:
+    """Test that the GPIO is not touched if there is no KCH."""
+    assert not light_boot_led(sys_path=tmp_path / "missing", gpiomem_path=gpiomem)
+    assert gpiomem.read_bytes() == bytes(GPIO_BLOCK_SIZE)
+
+
+def test_boot_imports() -> None:
+    """Test that the boot path does not import the daemon, reporting the time saved."""
+    boot = measure_import("kchd.boot")
+    daemon = measure_import("kchd.cli")
+
+    modules = boot["modules"]
+    assert isinstance(modules, list)
+    imported: List[str] = [
+        heavy for heavy in HEAVY_MODULES
+        if any(name == heavy or name.startswith(heavy + ".") for name in modules)
+    ]
+    boot_duration, daemon_duration = boot["duration"], daemon["duration"]
+    assert isinstance(boot_duration, float) and isinstance(daemon_duration, float)
+
+    print(
+        f"boot import={boot_duration * 1e3:6.1f}ms "
+        f"daemon import={daemon_duration * 1e3:6.1f}ms",
+    )
+    assert imported == []
@@ -0,0 +1,101 @@
+"""Test the configurable colours that show the state of astoria."""
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from astoria.common.code_status import CodeStatus
+from astoria.common.disks import DiskInfo, DiskType, DiskUUID
+from astoria.common.ipc import MetadataManagerMessage, ProcessManagerMessage
+from astoria.common.metadata import Metadata, RobotMode
+from fakes import FakeKCHDaemon, settle
+from pydantic import ValidationError
+
+from kchd.config import Colour, ColoursConfig, KCHDConfig
+from kchd.controllers.astprocd import (
+    CODE_MASK,
+    STATUS_LEDS,
+    colour_mask,
+    compile_status_table,
+)
+from kchd.effects import BLINK, NO_EFFECTS
+from kchd.hardware import KCHLED, led_mask
+
+RUNNING = ProcessManagerMessage.Status.RUNNING
+
+COLOURS = b"""
+[colours]
+code_status = { code_crashed = "blue", code_finished = "white" }
+blink = []
+comp_modes = ["DEV"]
+"""
+
+
+def load_config(data: bytes) -> KCHDConfig:
+    """Load a kchd config."""
+    return KCHDConfig.load_from_file(BytesIO(data))
+
+
+def test_colour_mask() -> None:
+    """Test that a colour lights the matching channels of the STATUS LED."""
+    assert colour_mask(Colour.OFF) == 0
+    assert colour_mask(Colour.CYAN) == led_mask(
+        [KCHLED.STATUS_GREEN, KCHLED.STATUS_BLUE],
+    )
+    assert colour_mask(Colour.WHITE) == led_mask(STATUS_LEDS)
+
+
+def test_default_table() -> None:
+    """Test that the default colours are compiled into the table."""
+    table = compile_status_table(ColoursConfig())
+
+    assert len(table) == 2 * (len(CodeStatus) + 1)
+    assert table[None, False] == (0, NO_EFFECTS)
+    assert table[CodeStatus.RUNNING, True] == (colour_mask(Colour.YELLOW) | CODE_MASK, {})
+    assert table[CodeStatus.CRASHED, False] == (
+        colour_mask(Colour.RED),
+        {led_mask(STATUS_LEDS): BLINK},
+    )
+
+
+def test_colours_keep_defaults() -> None:
+    """Test that the statuses without a colour in the config keep the default."""
+    colours = load_config(COLOURS).colours
+
+    assert colours.code_status[CodeStatus.CRASHED] is Colour.BLUE
+    assert colours.code_status[CodeStatus.RUNNING] is Colour.YELLOW
+
+
+def test_unknown_colour() -> None:
+    """Test that a colour that is not one of the RGB colours is rejected."""
+    with pytest.raises(ValidationError):
+        load_config(b'[colours]\ncode_status = { code_crashed = "orange" }\n')
+
+
+@pytest.mark.asyncio
+async def test_configured_colours(tmp_path: Path) -> None:
+    """Test that the controllers use the configured colours."""
+    config = tmp_path / "kchd.toml"
+    config.write_bytes(b"trace_records = 0\n" + COLOURS)
+    daemon = FakeKCHDaemon(kchd_config_file=str(config))
+
+    daemon._mqtt.deliver("astprocd", ProcessManagerMessage(
+        status=RUNNING,
+        code_status=CodeStatus.CRASHED,
+        disk_info=DiskInfo(
+            uuid=DiskUUID("usb"),
+            mount_path=Path("/media/usb"),
+            disk_type=DiskType.USERCODE,
+        ),
+    ).json())
+    metadata = Metadata.init(daemon.config)
+    metadata.mode = RobotMode.DEV
+    daemon._mqtt.deliver(
+        "astmetad",
+        MetadataManagerMessage(status=RUNNING, metadata=metadata).json(),
+    )
+    await settle(daemon)
+
+    assert daemon._state & led_mask(STATUS_LEDS + (KCHLED.CODE, KCHLED.COMP)) == (
+        colour_mask(Colour.BLUE) | CODE_MASK | led_mask([KCHLED.COMP])
+    )
+    assert daemon._controllers["astprocd"].get_effects() == NO_EFFECTS
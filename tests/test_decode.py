@@ -0,0 +1,98 @@
+"""Test the decoding of manager messages."""
+import json
+from typing import List
+
+import pytest
+from astoria.common.ipc import ManagerMessage, WiFiManagerMessage
+from fakes import FakeKCHDaemon, settle
+
+from kchd.controllers import AstwifidController, SystemStatusController, decode
+from kchd.controllers.decode import DecodeError, MessageDecoder
+
+SCHEMA = AstwifidController.schema
+
+
+@pytest.fixture
+def loads_calls(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    """Record the payloads parsed as JSON by the decoder."""
+    calls: List[str] = []
+
+    def loads(payload: str) -> object:
+        calls.append(payload)
+        return json.loads(payload)
+
+    monkeypatch.setattr(decode, "loads", loads)
+    return calls
+
+
+def test_fast_path(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a valid message is decoded without pydantic."""
+    def fail(*args: object) -> None:
+        raise AssertionError("The message was validated with pydantic.")
+
+    monkeypatch.setattr(decode, "parse_obj_as", fail)
+    fields = MessageDecoder().decode(
+        "astoria/astwifid",
+        '{"status": "RUNNING", "hotspot_running": true}',
+        SCHEMA,
+    )
+    assert fields == {"hotspot_running": True}
+
+
+def test_pydantic_fallback() -> None:
+    """Test that a message the fast path rejects is validated with pydantic."""
+    fields = MessageDecoder().decode(
+        "astoria/astwifid",
+        '{"status": "RUNNING", "hotspot_running": "true"}',
+        SCHEMA,
+    )
+    assert fields == {"hotspot_running": True}
+
+
+@pytest.mark.parametrize(
+    "payload,reason",
+    [
+        ("", "empty"),
+        ("{", "json"),
+        ('{"status": "RUNNING"}', "validation"),
+        ('{"status": "RUNNING", "hotspot_running": "maybe"}', "validation"),
+    ],
+)
+def test_decode_error(payload: str, reason: str) -> None:
+    """Test that the reason a message could not be decoded is reported."""
+    with pytest.raises(DecodeError) as e:
+        MessageDecoder().decode("astoria/astwifid", payload, SCHEMA)
+    assert e.value.reason == reason
+
+
+def test_json_is_shared(loads_calls: List[str]) -> None:
+    """Test that a payload is only parsed once for each topic."""
+    decoder = MessageDecoder()
+    payload = WiFiManagerMessage(
+        status=ManagerMessage.Status.RUNNING,
+        hotspot_running=True,
+    ).json()
+
+    decoder.decode("astoria/astwifid", payload, SCHEMA)
+    decoder.decode("astoria/astwifid", payload, SCHEMA)
+    decoder.decode("robot/astwifid", payload, SCHEMA)
+
+    assert len(loads_calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_subscribers_share_json(
+    daemon: FakeKCHDaemon,
+    loads_calls: List[str],
+) -> None:
+    """Test that an astprocd message is parsed once for all of its subscribers."""
+    daemon._mqtt.deliver(
+        "astprocd",
+        '{"status": "RUNNING", "code_status": "code_running", "disk_info": null}',
+    )
+    await settle(daemon)
+
+    assert len(loads_calls) == 1
+    assert daemon._controllers["astprocd"].get_state() != 0
+    status = daemon.controller("status", SystemStatusController)
+    assert "astprocd" in status._seen_services
@@ -0,0 +1,134 @@
+"""Test the selection and caching of a driver."""
+from pathlib import Path
+from typing import List, Set
+
+import pytest
+
+import kchd.driver
+from kchd.driver import MockDriver, get_driver
+from kchd.hardware import KCHLED
+from kchd.types import KCHInfo, NoKCHException
+
+LEDS = {KCHLED.BOOT_60, KCHLED.WIFI}
+KCH_INFO = KCHInfo(vendor="Student Robotics", product="KCH V1 Rev B", asset_code="A")
+
+# The names of the drivers that have been probed and constructed.
+probed: List[str] = []
+constructed: List[str] = []
+
+
+class FakeMMIODriver(MockDriver):
+    """A hardware driver that records when it is probed and constructed."""
+
+    available = True
+
+    @classmethod
+    def probe(cls) -> KCHInfo:
+        """Probe for a KCH."""
+        probed.append(cls.__name__)
+        if not cls.available:
+            raise NoKCHException("There is no HAT directory in sysfs.")
+        return KCH_INFO
+
+    def __init__(self, leds: Set[KCHLED]) -> None:
+        constructed.append(type(self).__name__)
+        if not self.available:
+            raise NoKCHException("The GPIO lines are not available.")
+        super().__init__(leds)
+
+
+class FakeSysfsDriver(FakeMMIODriver):
+    """Another hardware driver."""
+
+
+class FakeGPIODriver(FakeMMIODriver):
+    """Another hardware driver."""
+
+
+@pytest.fixture(autouse=True)
+def hardware_drivers(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Replace the hardware drivers with fakes, on a KCH with a HAT UUID."""
+    probed.clear()
+    constructed.clear()
+    monkeypatch.setattr(FakeMMIODriver, "available", True)
+    monkeypatch.setattr(kchd.driver, "MMIODriver", FakeMMIODriver)
+    monkeypatch.setattr(kchd.driver, "SysfsDriver", FakeSysfsDriver)
+    monkeypatch.setattr(kchd.driver, "GPIODriver", FakeGPIODriver)
+    monkeypatch.setattr(kchd.driver, "read_hat_key", lambda: "uuid-1")
+
+
+def test_no_kch_does_not_construct_hardware() -> None:
+    """Test that the hardware drivers are not constructed without a KCH."""
+    FakeMMIODriver.available = False
+
+    driver, kch_info = get_driver(LEDS)
+
+    assert type(driver) is MockDriver
+    assert kch_info.product == "Mock KCH"
+    assert probed == ["FakeMMIODriver", "FakeSysfsDriver", "FakeGPIODriver"]
+    assert constructed == []
+
+
+def test_kch_uses_first_hardware_driver() -> None:
+    """Test that the first hardware driver is used when a KCH is fitted."""
+    driver, kch_info = get_driver(LEDS)
+
+    assert type(driver) is FakeMMIODriver
+    assert kch_info == KCH_INFO
+    assert constructed == ["FakeMMIODriver"]
+
+
+def test_cached_driver_is_not_probed(tmp_path: Path) -> None:
+    """Test that a warm start constructs the cached driver without probing."""
+    cache_path = tmp_path / "cache" / "kchd-driver.json"
+    get_driver(LEDS, cache_path=cache_path)
+    assert cache_path.exists()
+    probed.clear()
+    constructed.clear()
+
+    driver, kch_info = get_driver(LEDS, cache_path=cache_path)
+
+    assert type(driver) is FakeMMIODriver
+    assert kch_info == KCH_INFO
+    assert probed == []
+    assert constructed == ["FakeMMIODriver"]
+
+
+def test_unavailable_cached_driver_is_probed(tmp_path: Path) -> None:
+    """Test that a cached driver that can no longer be constructed is replaced."""
+    cache_path = tmp_path / "cache" / "kchd-driver.json"
+    get_driver(LEDS, cache_path=cache_path)
+    probed.clear()
+    constructed.clear()
+
+    FakeMMIODriver.available = False
+    driver, _ = get_driver(LEDS, cache_path=cache_path)
+
+    assert type(driver) is MockDriver
+    assert constructed == ["FakeMMIODriver"]
+    assert probed == ["FakeMMIODriver", "FakeSysfsDriver", "FakeGPIODriver"]
+    assert '"MockDriver"' in cache_path.read_text()
+
+
+def test_cache_is_keyed_on_hat(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a different HAT is probed again."""
+    cache_path = tmp_path / "kchd-driver.json"
+    get_driver(LEDS, cache_path=cache_path)
+    probed.clear()
+
+    monkeypatch.setattr(kchd.driver, "read_hat_key", lambda: "uuid-2")
+    get_driver(LEDS, cache_path=cache_path)
+
+    assert probed == ["FakeMMIODriver"]
+
+
+def test_bad_cache_is_ignored(tmp_path: Path) -> None:
+    """Test that an unreadable cache is ignored, and replaced."""
+    cache_path = tmp_path / "kchd-driver.json"
+    cache_path.write_text("{")
+
+    driver, _ = get_driver(LEDS, cache_path=cache_path)
+
+    assert type(driver) is FakeMMIODriver
+    assert probed == ["FakeMMIODriver"]
+    assert "FakeMMIODriver" in cache_path.read_text()
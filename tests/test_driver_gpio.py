@@ -0,0 +1,97 @@
+"""Test the RPi GPIO driver against a fake GPIO module."""
+from typing import List, Tuple
+
+import pytest
+
+from kchd.driver import gpio
+from kchd.driver.gpio import GPIODriver
+from kchd.hardware import KCHLED, led_mask
+from kchd.types import NoKCHException
+
+LEDS = {KCHLED.BOOT_60, KCHLED.WIFI, KCHLED.USER_C_RED}
+
+
+class FakeGPIO:
+    """A stand-in for RPi.GPIO that records output calls."""
+
+    BCM = 11
+    OUT = 0
+    HIGH = 1
+    LOW = 0
+
+    def __init__(self) -> None:
+        self.outputs: List[Tuple[List[int], List[int]]] = []
+        self.cleaned_up: List[List[int]] = []
+
+    def setmode(self, mode: int) -> None:
+        """Set the pin numbering mode."""
+
+    def setup(self, pins: List[int], direction: int, *, initial: int) -> None:
+        """Set up the pins."""
+
+    def cleanup(self, pins: List[int]) -> None:
+        """Record the clean up of the pins."""
+        self.cleaned_up.append(pins)
+
+    def output(self, pins: List[int], values: List[int]) -> None:
+        """Record a write to the pins."""
+        self.outputs.append((pins, values))
+
+
+@pytest.fixture
+def fake_gpio(monkeypatch: pytest.MonkeyPatch) -> FakeGPIO:
+    """Replace RPi.GPIO with a fake."""
+    fake = FakeGPIO()
+    monkeypatch.setattr(gpio, "GPIO", fake)
+    return fake
+
+
+def test_set_state_writes_changed_pins(fake_gpio: FakeGPIO) -> None:
+    """Test that only changed pins are written, in a single call."""
+    driver = GPIODriver(LEDS)
+
+    driver.set_state(led_mask([KCHLED.WIFI]))
+    assert fake_gpio.outputs == [([KCHLED.WIFI.value], [1])]
+
+    driver.set_state(led_mask([KCHLED.BOOT_60]))
+    # WIFI is pin 8, and BOOT_60 is pin 12
+    assert fake_gpio.outputs[1] == ([8, 12], [0, 1])
+
+    assert driver.writes_issued == 3
+    assert driver.writes_skipped == 3
+
+
+def test_set_state_unchanged(fake_gpio: FakeGPIO) -> None:
+    """Test that writing the same state again does not call the GPIO."""
+    driver = GPIODriver(LEDS)
+    driver.set_state(led_mask([KCHLED.WIFI]))
+    driver.set_state(led_mask([KCHLED.WIFI]))
+
+    assert len(fake_gpio.outputs) == 1
+    assert driver.writes_issued == 1
+    assert driver.writes_skipped == 2 + 3
+
+
+def test_set_state_unknown_led(fake_gpio: FakeGPIO) -> None:
+    """Test that LEDs not controlled by the driver are rejected."""
+    driver = GPIODriver(LEDS)
+    with pytest.raises(ValueError):
+        driver.set_state(led_mask([KCHLED.COMP]))
+    assert fake_gpio.outputs == []
+
+
+def test_close_cleans_up_own_pins(fake_gpio: FakeGPIO) -> None:
+    """Test that only the pins of the driver are cleaned up, and only once."""
+    driver = GPIODriver(LEDS)
+
+    driver.close()
+    driver.close()
+
+    assert fake_gpio.cleaned_up == [sorted(led.value for led in LEDS)]
+
+
+def test_no_gpio(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the driver cannot be constructed without RPi.GPIO."""
+    monkeypatch.setattr(gpio, "GPIO", None)
+    with pytest.raises(NoKCHException):
+        GPIODriver(LEDS)
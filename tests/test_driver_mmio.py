@@ -0,0 +1,94 @@
+"""Test the memory mapped GPIO driver against a fake register map."""
+from pathlib import Path
+
+import pytest
+
+from kchd.driver.mmio import MMIODriver
+from kchd.hardware import (
+    GPCLR0,
+    GPFSEL0,
+    GPIO_BLOCK_SIZE,
+    GPLEV0,
+    GPSET0,
+    KCHLED,
+    led_mask,
+)
+from kchd.types import NoKCHException
+
+LEDS = {KCHLED.BOOT_60, KCHLED.WIFI, KCHLED.USER_C_RED}
+
+
+def read_register(path: Path, offset: int) -> int:
+    """Read a 32-bit register from the fake register map."""
+    data = path.read_bytes()
+    return int.from_bytes(data[offset * 4:offset * 4 + 4], "little")
+
+
+@pytest.fixture
+def gpiomem(tmp_path: Path) -> Path:
+    """A fake register map."""
+    path = tmp_path / "gpiomem"
+    path.write_bytes(bytes(GPIO_BLOCK_SIZE))
+    return path
+
+
+def test_setup_configures_outputs(gpiomem: Path) -> None:
+    """Test that the LED pins are made outputs, and are driven low."""
+    driver = MMIODriver(LEDS, gpiomem_path=gpiomem)
+
+    for led in LEDS:
+        register, pin = divmod(led.value, 10)
+        fsel = read_register(gpiomem, GPFSEL0 + register)
+        assert fsel >> (pin * 3) & 0b111 == 0b001
+    assert read_register(gpiomem, GPCLR0) == led_mask(LEDS)
+
+    driver.close()
+
+    for led in LEDS:
+        register, pin = divmod(led.value, 10)
+        fsel = read_register(gpiomem, GPFSEL0 + register)
+        assert fsel >> (pin * 3) & 0b111 == 0b000
+
+
+def test_set_state(gpiomem: Path) -> None:
+    """Test that the state is written to the set and clear registers."""
+    driver = MMIODriver(LEDS, gpiomem_path=gpiomem)
+
+    state = led_mask([KCHLED.BOOT_60, KCHLED.WIFI])
+    driver.set_state(state)
+
+    assert read_register(gpiomem, GPSET0) == state
+    assert read_register(gpiomem, GPCLR0) == led_mask([KCHLED.USER_C_RED])
+    driver.close()
+
+
+def test_set_state_unknown_led(gpiomem: Path) -> None:
+    """Test that LEDs not controlled by the driver are rejected."""
+    driver = MMIODriver(LEDS, gpiomem_path=gpiomem)
+
+    with pytest.raises(ValueError):
+        driver.set_state(led_mask([KCHLED.COMP]))
+    driver.close()
+
+
+def test_missing_registers(tmp_path: Path) -> None:
+    """Test that a missing register map means there is no KCH."""
+    with pytest.raises(NoKCHException):
+        MMIODriver(LEDS, gpiomem_path=tmp_path / "missing")
+
+
+def test_setup_keeps_lit_outputs(gpiomem: Path) -> None:
+    """Test that an LED lit by the boot path is not turned off during setup."""
+    registers = bytearray(gpiomem.read_bytes())
+    register, pin = divmod(KCHLED.BOOT_60.value, 10)
+    registers[GPFSEL0 * 4 + register * 4:GPFSEL0 * 4 + register * 4 + 4] = (
+        0b001 << (pin * 3)
+    ).to_bytes(4, "little")
+    level = led_mask([KCHLED.BOOT_60])
+    registers[GPLEV0 * 4:GPLEV0 * 4 + 4] = level.to_bytes(4, "little")
+    gpiomem.write_bytes(registers)
+
+    driver = MMIODriver(LEDS, gpiomem_path=gpiomem)
+
+    assert read_register(gpiomem, GPCLR0) == led_mask(LEDS - {KCHLED.BOOT_60})
+    driver.close()
@@ -0,0 +1,111 @@
+"""Test the sysfs GPIO driver against a fake sysfs tree."""
+import os
+from pathlib import Path
+from typing import NoReturn
+
+import pytest
+from fakes import FakeKCHDaemon
+
+from kchd.driver.sysfs import SysfsDriver
+from kchd.hardware import KCHLED, led_mask
+from kchd.types import NoKCHException
+
+LEDS = {KCHLED.BOOT_40, KCHLED.WIFI, KCHLED.USER_C_RED}
+
+
+def line(gpio: Path, led: KCHLED, name: str) -> str:
+    """Read an attribute of a line from the fake sysfs tree."""
+    return (gpio / f"gpio{led.value}" / name).read_text().strip()
+
+
+@pytest.fixture
+def gpio(tmp_path: Path) -> Path:
+    """A fake sysfs tree, in which the lines of the LEDs are exported inputs."""
+    path = tmp_path / "gpio"
+    path.mkdir()
+    (path / "export").write_text("")
+    (path / "unexport").write_text("")
+    for led in LEDS:
+        (path / f"gpio{led.value}").mkdir()
+        (path / f"gpio{led.value}" / "direction").write_text("in\n")
+        (path / f"gpio{led.value}" / "value").write_text("0\n")
+    return path
+
+
+def test_setup_configures_outputs(gpio: Path) -> None:
+    """Test that the LED lines are made outputs, driven low, and returned to inputs."""
+    driver = SysfsDriver(LEDS, gpio_path=gpio)
+
+    assert {line(gpio, led, "direction") for led in LEDS} == {"low"}
+
+    driver.close()
+
+    assert {line(gpio, led, "direction") for led in LEDS} == {"in"}
+    assert (gpio / "unexport").read_text() == str(max(led.value for led in LEDS))
+
+
+def test_setup_keeps_lit_outputs(gpio: Path) -> None:
+    """Test that a line that is already a lit output, such as BOOT_40, stays lit."""
+    (gpio / "gpio5" / "direction").write_text("out\n")
+    (gpio / "gpio5" / "value").write_text("1\n")
+
+    driver = SysfsDriver(LEDS, gpio_path=gpio)
+    driver.set_state(led_mask([KCHLED.BOOT_40, KCHLED.WIFI]))
+
+    assert line(gpio, KCHLED.BOOT_40, "direction") == "out"
+    assert line(gpio, KCHLED.BOOT_40, "value") == "1"
+    assert line(gpio, KCHLED.WIFI, "value") == "1"
+    driver.close()
+
+
+def test_set_state_does_not_reopen(gpio: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the state is written to the open value of each changed line."""
+    driver = SysfsDriver(LEDS, gpio_path=gpio)
+
+    def no_open(*args: object) -> NoReturn:
+        raise AssertionError("A file was opened.")
+
+    monkeypatch.setattr(os, "open", no_open)
+    driver.set_state(led_mask([KCHLED.WIFI, KCHLED.USER_C_RED]))
+    driver.set_state(led_mask([KCHLED.WIFI]))
+    monkeypatch.undo()
+
+    assert line(gpio, KCHLED.BOOT_40, "value") == "0"
+    assert line(gpio, KCHLED.WIFI, "value") == "1"
+    assert line(gpio, KCHLED.USER_C_RED, "value") == "0"
+    driver.close()
+
+
+def test_set_state_unknown_leds(gpio: Path) -> None:
+    """Test that LEDs not controlled by kchd are rejected."""
+    driver = SysfsDriver(LEDS, gpio_path=gpio)
+    with pytest.raises(ValueError):
+        driver.set_state(led_mask([KCHLED.START]))
+    driver.close()
+
+
+def test_export_failure(gpio: Path) -> None:
+    """Test that a line that does not appear when exported means there is no KCH."""
+    with pytest.raises(NoKCHException):
+        SysfsDriver(LEDS | {KCHLED.START}, gpio_path=gpio)
+    assert (gpio / "export").read_text() == str(KCHLED.START.value)
+
+
+def test_probe_without_sysfs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the driver is not used if lines cannot be exported."""
+    monkeypatch.setattr(SysfsDriver, "GPIO_SYS_PATH", tmp_path / "missing")
+    with pytest.raises(NoKCHException):
+        SysfsDriver.probe()
+
+
+@pytest.mark.asyncio
+async def test_boot_controller(tmp_path: Path) -> None:
+    """Test that BOOT_40 is lit while kchd runs, if the boot controller is enabled."""
+    config = tmp_path / "kchd.toml"
+    config.write_text('controllers = ["boot", "status"]\ntrace_records = 0\n')
+    daemon = FakeKCHDaemon(kchd_config_file=str(config))
+
+    await daemon.update_leds()
+
+    assert KCHLED.BOOT_40 in daemon._leds
+    assert daemon._state == led_mask([KCHLED.BOOT_40])
@@ -0,0 +1,120 @@
+"""Test writing the LEDs from a dedicated thread."""
+import threading
+import time
+from pathlib import Path
+from typing import List, Set
+
+import pytest
+from fakes import FakeKCHDaemon, RecordingDriver
+
+from kchd.driver import LEDDriver, MockDriver, ThreadedDriver
+from kchd.hardware import KCHLED
+from kchd.metrics import Metrics
+
+
+class SlowDriver(MockDriver):
+    """A driver that takes a while to write, and records each state."""
+
+    def __init__(self, leds: Set[KCHLED], delay: float = 0.005) -> None:
+        super().__init__(leds)
+        self.delay = delay
+        self.states: List[int] = []
+        self.threads: Set[str] = set()
+
+    def set_state(self, state: int) -> None:
+        """Record the state, slowly."""
+        time.sleep(self.delay)
+        self.threads.add(threading.current_thread().name)
+        self.states.append(state)
+
+
+def test_latest_wins() -> None:
+    """Test that states are dropped while busy, and the last is always written."""
+    metrics = Metrics()
+    driver = SlowDriver(set())
+    threaded = ThreadedDriver(driver, metrics)
+
+    start = time.perf_counter()
+    for state in range(1, 101):
+        threaded.set_state(state)
+    submit = time.perf_counter() - start
+    threaded.close()
+
+    assert submit < 100 * driver.delay / 2
+    assert driver.states[-1] == 100
+    assert driver.states == sorted(driver.states)
+    assert driver.threads == {"kchd-driver"}
+    assert metrics.driver_states["applied"] == len(driver.states)
+    assert metrics.driver_states["applied"] + metrics.driver_states["dropped"] == 100
+    assert metrics.driver_states["dropped"] > 0
+
+
+def test_errors_are_logged(
+    caplog: pytest.LogCaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that an error writing the LEDs does not stop the thread."""
+    metrics = Metrics()
+    driver = SlowDriver(set(), delay=0)
+    threaded = ThreadedDriver(driver, metrics)
+    driver_set_state = driver.set_state
+
+    def set_state(state: int) -> None:
+        if state == 1:
+            raise ValueError("Bad state")
+        driver_set_state(state)
+
+    monkeypatch.setattr(driver, "set_state", set_state)
+    threaded.set_state(1)
+    time.sleep(0.01)
+    threaded.set_state(2)
+    threaded.close()
+
+    assert "Unable to write the LEDs." in caplog.text
+    assert driver.states == [2]
+
+
+def test_closed() -> None:
+    """Test that states are ignored once closed."""
+    driver = SlowDriver(set())
+    threaded = ThreadedDriver(driver, Metrics())
+    threaded.close()
+    threaded.set_state(1)
+    assert driver.states == []
+
+
+@pytest.mark.asyncio
+async def test_daemon_threaded_driver(tmp_path: Path) -> None:
+    """Test that the daemon writes through a thread when configured to."""
+    config = tmp_path / "kchd.toml"
+    config.write_text("threaded_driver = true\ntrace_records = 0\n")
+    daemon = FakeKCHDaemon(kchd_config_file=str(config))
+    threaded: LEDDriver = daemon._driver
+    assert isinstance(threaded, ThreadedDriver)
+
+    daemon._controllers["status"].on_kchd_running()
+    await daemon.update_leds()
+    threaded.close()
+
+    assert daemon._metrics.driver_states["applied"] == 1
+
+
+@pytest.mark.asyncio
+async def test_daemon_pwm_bypasses_thread(tmp_path: Path) -> None:
+    """Test that the PWM worker writes the LEDs directly, not through the thread."""
+    config = tmp_path / "kchd.toml"
+    config.write_text("threaded_driver = true\ntrace_records = 0\n")
+    daemon = FakeKCHDaemon(kchd_config_file=str(config))
+    threaded = daemon._driver
+    assert isinstance(threaded, ThreadedDriver)
+
+    daemon._pwm.set_state(1 << KCHLED.USER_A_RED.value)
+    daemon._pwm.set_brightness("test", {1 << KCHLED.USER_A_RED.value: 128})
+    time.sleep(0.05)
+    daemon._pwm.stop()
+    threaded.close()
+
+    recording = daemon._pwm._driver
+    assert isinstance(recording, RecordingDriver)
+    assert len(recording.writes) > 2
+    assert daemon._metrics.driver_states["applied"] == 1
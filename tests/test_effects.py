@@ -0,0 +1,87 @@
+"""Test the LED effects engine."""
+from typing import List
+
+import pytest
+
+from kchd.effects import BLINK, NO_EFFECTS, EffectsEngine, Pattern
+
+RED = 1 << 26
+GREEN = 1 << 20
+
+
+class Recorder:
+    """Record the output of an effects engine whenever it changes."""
+
+    def __init__(self) -> None:
+        self.engine = EffectsEngine(self.on_change)
+        self.outputs: List[int] = []
+
+    def on_change(self) -> None:
+        """Record the output of the engine for a fully lit state."""
+        self.outputs.append(self.engine.apply(RED | GREEN))
+
+
+def test_pattern_validate() -> None:
+    """Test that patterns the timer wheel cannot drive are rejected."""
+    BLINK.validate()
+    for runs in ((), (1,), (1, 2, 3), (0, 1), (1, 64)):
+        with pytest.raises(ValueError):
+            Pattern("bad", runs).validate()
+
+
+@pytest.mark.asyncio
+async def test_apply_without_effects() -> None:
+    """Test that the state is unchanged when there are no effects."""
+    engine = EffectsEngine(lambda: None)
+    assert engine.apply(RED | GREEN) == RED | GREEN
+    assert engine.task is None
+
+
+@pytest.mark.asyncio
+async def test_tick_toggles_effect() -> None:
+    """Test that an effect follows its pattern as the wheel is ticked."""
+    recorder = Recorder()
+    recorder.engine.set_effects("owner", {RED: Pattern("test", (2, 3))})
+    recorder.engine.stop()
+
+    # The effect starts in the on state
+    assert recorder.engine.apply(RED | GREEN) == RED | GREEN
+
+    for _ in range(10):
+        recorder.engine.tick()
+
+    # On for 2 ticks, off for 3 ticks, repeating
+    assert recorder.outputs == [GREEN, RED | GREEN, GREEN, RED | GREEN]
+
+
+@pytest.mark.asyncio
+async def test_unchanged_effects_are_not_restarted() -> None:
+    """Test that setting the same effects again does not restart them."""
+    recorder = Recorder()
+    effects = {RED: Pattern("test", (2, 2))}
+    recorder.engine.set_effects("owner", effects)
+    recorder.engine.stop()
+
+    recorder.engine.tick()
+    recorder.engine.set_effects("owner", dict(effects))
+    recorder.engine.tick()
+
+    assert recorder.outputs == [GREEN]
+
+
+@pytest.mark.asyncio
+async def test_replaced_effects_are_cancelled() -> None:
+    """Test that replaced effects no longer change the output."""
+    recorder = Recorder()
+    recorder.engine.set_effects("owner", {RED: Pattern("test", (2, 2))})
+    recorder.engine.stop()
+
+    recorder.engine.set_effects("owner", {GREEN: Pattern("test", (3, 3))})
+    for _ in range(6):
+        recorder.engine.tick()
+
+    assert recorder.outputs == [RED, RED | GREEN]
+
+    recorder.engine.set_effects("owner", NO_EFFECTS)
+    assert not recorder.engine.active
+    assert recorder.engine.apply(RED | GREEN) == RED | GREEN
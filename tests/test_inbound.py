@@ -0,0 +1,145 @@
+"""Test the latest-wins queue of inbound messages."""
+import asyncio
+import re
+from collections import defaultdict
+from typing import DefaultDict, List, Match, Tuple
+
+import pytest
+from fakes import FakeKCHDaemon, settle
+
+from kchd.controllers.inbound import LatestQueue
+
+TOPIC = re.compile("astoria/(.+)")
+
+
+class Recorder:
+    """A handler that records the messages it handles."""
+
+    def __init__(self) -> None:
+        self.handled: List[Tuple[str, str]] = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, match: Match[str], payload: str) -> None:
+        """Record a message, and wait until released."""
+        self.handled.append((match.group(0), payload))
+        await self.release.wait()
+
+
+Counter = DefaultDict[str, int]
+
+
+def make_queue(handler: Recorder) -> Tuple[LatestQueue, Counter, Counter]:
+    """Make a queue, returning it with its pending and superseded counters."""
+    pending: Counter = defaultdict(int)
+    superseded: Counter = defaultdict(int)
+    return LatestQueue(handler, pending, superseded), pending, superseded
+
+
+def deliver(queue: LatestQueue, topic: str, payload: str) -> "asyncio.Future[None]":
+    """Deliver a message to a queue in a task of its own, as the MQTT wrapper does."""
+    match = TOPIC.match(topic)
+    assert match is not None
+    return asyncio.ensure_future(queue.put(match, payload))
+
+
+async def run_ready() -> None:
+    """Run the tasks that are ready, until they block."""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_burst_handles_newest() -> None:
+    """Test that only the newest of a burst of messages on a topic is handled."""
+    handler = Recorder()
+    queue, pending, superseded = make_queue(handler)
+
+    await asyncio.gather(*(deliver(queue, "astoria/a", str(i)) for i in range(100)))
+
+    assert handler.handled == [("astoria/a", "99")]
+    assert superseded == {"astoria/a": 99}
+    assert pending == {"astoria/a": 0}
+
+
+@pytest.mark.asyncio
+async def test_messages_during_handling() -> None:
+    """Test that the newest message to arrive during handling is handled next."""
+    handler = Recorder()
+    handler.release.clear()
+    queue, pending, superseded = make_queue(handler)
+
+    first = deliver(queue, "astoria/a", "1")
+    await run_ready()
+    tasks = [deliver(queue, "astoria/a", str(i)) for i in range(2, 6)]
+    await run_ready()
+
+    assert handler.handled == [("astoria/a", "1")]
+    assert pending["astoria/a"] == 1
+
+    handler.release.set()
+    await asyncio.gather(first, *tasks)
+
+    assert handler.handled == [("astoria/a", "1"), ("astoria/a", "5")]
+    assert superseded["astoria/a"] == 3
+    assert pending["astoria/a"] == 0
+
+
+@pytest.mark.asyncio
+async def test_topics_are_independent() -> None:
+    """Test that a message only supersedes messages on the same topic."""
+    handler = Recorder()
+    queue, _, superseded = make_queue(handler)
+
+    await asyncio.gather(
+        deliver(queue, "astoria/a", "1"),
+        deliver(queue, "astoria/b", "2"),
+        deliver(queue, "astoria/a", "3"),
+    )
+
+    assert sorted(handler.handled) == [("astoria/a", "3"), ("astoria/b", "2")]
+    assert superseded == {"astoria/a": 1}
+
+
+@pytest.mark.asyncio
+async def test_error_keeps_draining(caplog: pytest.LogCaptureFixture) -> None:
+    """Test that a newer message is still handled if the handler raises."""
+    handler = Recorder()
+    pending: Counter = defaultdict(int)
+
+    async def fail_first(match: Match[str], payload: str) -> None:
+        await handler(match, payload)
+        if payload == "0":
+            raise ValueError("Bad message")
+
+    queue = LatestQueue(fail_first, pending, defaultdict(int))
+    handler.release.clear()
+    first = deliver(queue, "astoria/a", "0")
+    await run_ready()
+    second = deliver(queue, "astoria/a", "1")
+    await run_ready()
+    handler.release.set()
+    await asyncio.gather(first, second)
+
+    assert handler.handled == [("astoria/a", "0"), ("astoria/a", "1")]
+    assert pending["astoria/a"] == 0
+    assert "Unable to handle a message on astoria/a." in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_flapping_manager(daemon: FakeKCHDaemon) -> None:
+    """Test that a flapping manager is only decoded once per burst."""
+    for i in range(50):
+        status = "code_running" if i % 2 else "code_crashed"
+        daemon._mqtt.deliver(
+            "astprocd",
+            f'{{"status": "RUNNING", "code_status": "{status}", "disk_info": null}}',
+        )
+    await settle(daemon)
+
+    metrics = daemon._metrics.snapshot()
+    assert metrics.messages_received["astoria/astprocd"] == 2 * 50
+    # The message is superseded for both the astprocd and system status controllers.
+    assert metrics.messages_superseded["astoria/astprocd"] == 2 * 49
+    assert metrics.messages_pending["astoria/astprocd"] == 0
+    assert sum(metrics.handler_duration["AstprocdController"].counts) == 1
@@ -0,0 +1,74 @@
+"""Test the publication of the state of the LEDs."""
+import asyncio
+import json
+from typing import List
+
+import pytest
+from fakes import FakeKCHDaemon
+
+from kchd.hardware import (
+    KCHLED,
+    LED_ORDER,
+    compact_state,
+    expand_state,
+    led_mask,
+)
+
+BOOT_60 = led_mask([KCHLED.BOOT_60])
+
+
+def published_states(daemon: FakeKCHDaemon) -> List[int]:
+    """Get the compact states that have been published."""
+    return [
+        json.loads(payload)["state"]
+        for topic, payload, retain in daemon._mqtt.published
+        if topic == "astoria/kchd/state" and retain
+    ]
+
+
+def test_compact_state() -> None:
+    """Test that a compact state has a bit for each LED, in order."""
+    assert compact_state(BOOT_60) == 1 << LED_ORDER.index(KCHLED.BOOT_60)
+    assert compact_state(led_mask(KCHLED)) == (1 << len(KCHLED)) - 1
+
+    state = led_mask([KCHLED.WIFI, KCHLED.USER_C_RED, KCHLED.STATUS_RED])
+    assert expand_state(compact_state(state)) == state
+
+
+@pytest.mark.asyncio
+async def test_publish_state_on_change(daemon: FakeKCHDaemon) -> None:
+    """Test that the state is only published when it changes."""
+    await daemon._mqtt.connect()
+    daemon.kchd_config = daemon.kchd_config.copy(update={"state_interval": 0})
+
+    await daemon.update_leds()
+    await daemon.update_leds()
+    daemon._controllers["status"].on_kchd_running()
+    await daemon.update_leds()
+
+    assert published_states(daemon) == [0, compact_state(BOOT_60)]
+
+
+@pytest.mark.asyncio
+async def test_publish_state_interval(daemon: FakeKCHDaemon) -> None:
+    """Test that only the latest state is published within the interval."""
+    await daemon._mqtt.connect()
+    daemon.kchd_config = daemon.kchd_config.copy(update={"state_interval": 0.05})
+
+    await daemon.update_leds()
+    daemon._controllers["status"].on_kchd_running()
+    await daemon.update_leds()
+    daemon._controllers["status"].on_mqtt_connected()
+    await daemon.update_leds()
+    assert published_states(daemon) == [0]
+
+    await asyncio.sleep(0.1)
+    assert published_states(daemon) == [0, compact_state(daemon._state)]
+    assert daemon._state_timer is None
+
+
+@pytest.mark.asyncio
+async def test_no_state_while_disconnected(daemon: FakeKCHDaemon) -> None:
+    """Test that the state is not published before connecting to the broker."""
+    await daemon.update_leds()
+    assert published_states(daemon) == []
@@ -0,0 +1,54 @@
+"""Test the instrumentation of kchd."""
+import asyncio
+from pathlib import Path
+
+import pytest
+from fakes import FakeKCHDaemon
+
+from kchd.metrics import Histogram, Metrics
+
+
+def test_histogram_buckets() -> None:
+    """Test that values are counted in the first bucket that fits them."""
+    histogram = Histogram([1.0, 2.0])
+    for value in (0.5, 1.0, 1.5, 3.0):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot.counts == [2, 1, 1]
+    assert snapshot.total == 6.0
+    assert histogram.count == 4
+
+
+def test_metrics_snapshot() -> None:
+    """Test that the metrics can be serialised for publishing."""
+    metrics = Metrics()
+    metrics.handler_duration("AstprocdController").observe(1e-4)
+    metrics.parse_failures["json"] += 1
+    metrics.messages_ignored["astoria/astdiskd"] += 1
+
+    snapshot = metrics.snapshot()
+    assert snapshot.handler_duration["AstprocdController"].counts[3] == 1
+    assert snapshot.parse_failures == {"json": 1}
+    assert "astoria/astdiskd" in snapshot.json()
+
+
+@pytest.mark.asyncio
+async def test_metrics_published_periodically(tmp_path: Path) -> None:
+    """Test that the metrics are published each interval, only while connected."""
+    config = tmp_path / "kchd.toml"
+    config.write_text("metrics_interval = 0.01\ntrace_records = 0\n")
+    daemon = FakeKCHDaemon(kchd_config_file=str(config))
+    topic = f"{daemon._mqtt.mqtt_prefix}/metrics"
+
+    task = asyncio.ensure_future(daemon._publish_metrics())
+    await asyncio.sleep(0.035)
+    assert not any(published[0] == topic for published in daemon._mqtt.published)
+
+    await daemon._mqtt.connect()
+    await asyncio.sleep(0.035)
+    task.cancel()
+
+    metrics = [published for published in daemon._mqtt.published if published[0] == topic]
+    assert len(metrics) >= 2
+    assert "handler_duration" in metrics[-1][1]
@@ -0,0 +1,94 @@
+"""Test the ownership of the LEDs."""
+import asyncio
+from uuid import uuid4
+
+import pytest
+from fakes import FakeKCHDaemon, settle
+
+from kchd.effects import BLINK, FAST_BLINK, NO_EFFECTS
+from kchd.hardware import KCHLED, led_mask
+from kchd.ownership import Override, OwnershipTable, restrict
+from kchd.types import KCHIdentifyManagerRequest
+
+WIFI = led_mask([KCHLED.WIFI])
+COMP = led_mask([KCHLED.COMP])
+
+
+def test_priority() -> None:
+    """Test that the highest priority owner of an LED is used."""
+    table = OwnershipTable()
+    table.add("low", WIFI | COMP)
+    table.add("high", WIFI, priority=10)
+
+    assert table.owners(KCHLED.WIFI) == ("high", "low")
+    assert table.owners(KCHLED.COMP) == ("low",)
+    assert table.owners(KCHLED.START) == ()
+    assert table.effective_mask("high") == WIFI
+    assert table.effective_mask("low") == COMP
+    assert table.leds == {KCHLED.WIFI, KCHLED.COMP}
+    assert table.conflicts() == []
+
+    table.remove("high")
+    assert table.effective_mask("low") == WIFI | COMP
+
+
+def test_conflicts() -> None:
+    """Test that owners at the same priority conflict, and the first is used."""
+    table = OwnershipTable()
+    table.add("first", WIFI)
+    table.add("second", WIFI | COMP)
+
+    assert table.conflicts() == [(KCHLED.WIFI, ("first", "second"))]
+    assert table.effective_mask("first") == WIFI
+    assert table.effective_mask("second") == COMP
+
+
+def test_restrict() -> None:
+    """Test that a mapping is restricted to a mask, and is unchanged if within it."""
+    effects = {WIFI: BLINK}
+    assert restrict(effects, WIFI | COMP) is effects
+    assert restrict({WIFI | COMP: BLINK}, COMP) == {COMP: BLINK}
+    assert restrict(effects, COMP) == NO_EFFECTS
+
+
+@pytest.mark.asyncio
+async def test_override(daemon: FakeKCHDaemon) -> None:
+    """Test that an override takes over LEDs from the controllers, until cleared."""
+    daemon._controllers["status"].on_kchd_running()
+    boot_60 = led_mask([KCHLED.BOOT_60])
+
+    daemon.set_override("test", Override(boot_60 | WIFI, WIFI, NO_EFFECTS))
+    await settle(daemon)
+    _, state = daemon._driver.writes[-1]
+    assert state == WIFI
+
+    daemon.clear_override("test")
+    await settle(daemon)
+    _, state = daemon._driver.writes[-1]
+    assert state == boot_60
+
+
+@pytest.mark.asyncio
+async def test_identify(daemon: FakeKCHDaemon) -> None:
+    """Test that identify flashes all of the LEDs, and then stops."""
+    request = KCHIdentifyManagerRequest(sender_name="test", uuid=uuid4(), duration=0.01)
+
+    response = await daemon.handle_identify(request)
+    await settle(daemon)
+
+    assert response.success
+    assert daemon._driver.writes[-1][1] == led_mask(daemon._leds)
+    assert daemon._effects.active
+    assert daemon._overrides["identify"].effects == {led_mask(daemon._leds): FAST_BLINK}
+
+    await asyncio.sleep(0.02)
+    await settle(daemon)
+    assert "identify" not in daemon._overrides
+    assert not daemon._effects.active
+    assert daemon._driver.writes[-1][1] == 0
+
+
+def test_identify_duration() -> None:
+    """Test that an identify duration out of range is rejected."""
+    with pytest.raises(ValueError):
+        KCHIdentifyManagerRequest(sender_name="test", uuid=uuid4(), duration=0)
@@ -0,0 +1,45 @@
+"""Test the dropping of duplicate payloads."""
+import pytest
+from astoria.common.ipc import ManagerMessage, WiFiManagerMessage
+from fakes import FakeKCHDaemon, settle
+
+from kchd.controllers.cache import PayloadCache
+from kchd.hardware import KCHLED, led_mask
+
+RUNNING = ManagerMessage.Status.RUNNING
+
+
+def test_payload_cache() -> None:
+    """Test that only a byte-identical payload on the same topic is a duplicate."""
+    cache = PayloadCache()
+
+    assert not cache.is_duplicate("a", "1")
+    assert cache.is_duplicate("a", "1")
+    assert not cache.is_duplicate("b", "1")
+    assert not cache.is_duplicate("a", "1 ")
+    assert cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_duplicate_payload_is_dropped(daemon: FakeKCHDaemon) -> None:
+    """Test that a re-published payload does not write the LEDs."""
+    controller = daemon._controllers["astwifid"]
+    payload = WiFiManagerMessage(status=RUNNING, hotspot_running=True).json()
+
+    daemon._mqtt.deliver("astwifid", payload)
+    await settle(daemon)
+    assert len(daemon._driver.writes) == 1
+
+    daemon._mqtt.deliver("astwifid", payload)
+    await settle(daemon)
+    assert len(daemon._driver.writes) == 1
+    assert controller.duplicate_payloads == 1
+    assert daemon._metrics.messages_duplicate["astoria/astwifid"] == 1
+
+    changed = WiFiManagerMessage(status=RUNNING, hotspot_running=False).json()
+    daemon._mqtt.deliver("astwifid", changed)
+    await settle(daemon)
+    assert len(daemon._driver.writes) == 2
+    assert controller.duplicate_payloads == 1
+    _, state = daemon._driver.writes[-1]
+    assert state & led_mask([KCHLED.WIFI]) == 0
@@ -0,0 +1,103 @@
+"""Test the sampling profiler of the running daemon."""
+import asyncio
+from pathlib import Path
+from time import perf_counter
+from typing import Dict
+from uuid import uuid4
+
+import pytest
+from click.testing import CliRunner
+from fakes import FakeKCHDaemon
+
+from kchd.cli import cli
+from kchd.profile import SamplingProfiler
+from kchd.types import KCHProfileManagerRequest
+
+
+def read_profile(path: Path) -> Dict[str, int]:
+    """Read a profile in the folded stack format."""
+    stacks = {}
+    for line in path.read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert " " not in stack
+        stacks[stack] = int(count)
+    return stacks
+
+
+async def busy(duration: float) -> None:
+    """Keep the event loop busy for a while."""
+    end = perf_counter() + duration
+    while perf_counter() < end:
+        sum(range(1000))
+        await asyncio.sleep(0)
+
+
+def make_profiler(directory: Path) -> SamplingProfiler:
+    """Make a profiler of the running event loop, that samples quickly."""
+    return SamplingProfiler(directory, interval=0.001, loop=asyncio.get_running_loop())
+
+
+@pytest.mark.asyncio
+async def test_profile_groups_by_task(tmp_path: Path) -> None:
+    """Test that the samples of the event loop are grouped by the running task."""
+    profiler = make_profiler(tmp_path)
+    assert profiler.start(60)
+    await asyncio.ensure_future(busy(0.2))
+    profiler.stop()
+
+    assert not profiler.running
+    assert profiler.path is not None
+    stacks = read_profile(profiler.path)
+    assert any(
+        stack.startswith("MainThread;task:busy;") and stack.endswith("test_profile:busy")
+        for stack in stacks
+    )
+
+
+@pytest.mark.asyncio
+async def test_profile_window(tmp_path: Path) -> None:
+    """Test that a profile is written when its window ends, and only one runs."""
+    profiler = make_profiler(tmp_path)
+    assert profiler.start(0.05)
+    assert not profiler.start(0.05)
+    await busy(0.2)
+
+    assert not profiler.running
+    assert profiler.path is not None and profiler.path.exists()
+    profiler.stop()
+
+
+@pytest.mark.asyncio
+async def test_profile_update_path(daemon: FakeKCHDaemon, tmp_path: Path) -> None:
+    """Test that the update of the LEDs, including the driver, is captured."""
+    daemon._profiler = make_profiler(tmp_path)
+    assert daemon.toggle_profile(60)
+    end = perf_counter() + 0.2
+    while perf_counter() < end:
+        await daemon.update_leds()
+    assert not daemon.toggle_profile()
+
+    assert daemon._profiler.path is not None
+    stacks = read_profile(daemon._profiler.path)
+    assert any("kchd.app:update_leds" in stack for stack in stacks)
+
+
+@pytest.mark.asyncio
+async def test_profile_request(daemon: FakeKCHDaemon, tmp_path: Path) -> None:
+    """Test that a profile request starts a profile, and a second ends it."""
+    daemon._profiler = make_profiler(tmp_path)
+    request = KCHProfileManagerRequest(uuid=uuid4(), sender_name="test", duration=60)
+
+    response = await daemon.handle_profile(request)
+    assert response.success
+    assert daemon._profiler.running
+
+    await daemon.handle_profile(request)
+    assert not daemon._profiler.running
+    assert daemon._profiler.path is not None
+
+
+def test_profile_option() -> None:
+    """Test that the daemon can be started with a profile."""
+    result = CliRunner().invoke(cli, ["--help"])
+    assert "--profile" in result.output
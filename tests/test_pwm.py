@@ -0,0 +1,126 @@
+"""Test the software PWM."""
+import time
+from typing import List, Set
+from uuid import uuid4
+
+import pytest
+from fakes import FakeKCHDaemon, settle
+
+from kchd.controllers import MQTTRequestController
+from kchd.driver import MockDriver
+from kchd.hardware import KCHLED
+from kchd.pwm import RESOLUTION, PWMWorker, duty_slots
+from kchd.types import KCHLEDUpdateManagerRequest
+
+RED = 1 << KCHLED.USER_A_RED.value
+GREEN = 1 << KCHLED.USER_A_GREEN.value
+BLUE = 1 << KCHLED.USER_A_BLUE.value
+
+
+class Recorder(MockDriver):
+    """A driver that records each state written."""
+
+    def __init__(self, leds: Set[KCHLED]) -> None:
+        super().__init__(leds)
+        self.states: List[int] = []
+
+    def set_state(self, state: int) -> None:
+        """Record the state."""
+        self.states.append(state)
+
+
+def test_duty_slots() -> None:
+    """Test the conversion of a brightness to a number of slots."""
+    assert duty_slots(0) == 0
+    assert duty_slots(255) == RESOLUTION
+    assert duty_slots(128) == RESOLUTION // 2
+    with pytest.raises(ValueError):
+        duty_slots(256)
+
+
+def test_output() -> None:
+    """Test that dimmed LEDs are on for part of each period."""
+    worker = PWMWorker(Recorder(set()), 0.001)
+    worker.set_state(RED | GREEN)
+    worker.set_brightness("owner", {GREEN: 64, BLUE: 128})
+
+    assert worker.active
+    outputs = [worker.output(slot) for slot in range(RESOLUTION)]
+    assert outputs.count(RED | GREEN) == duty_slots(64)
+    assert all(output & RED for output in outputs)
+    # An LED that is off stays off.
+    assert not any(output & BLUE for output in outputs)
+
+    worker.set_brightness("owner", {})
+    worker.stop()
+    assert not worker.active
+    assert worker.output(RESOLUTION - 1) == RED | GREEN
+
+
+def test_disabled() -> None:
+    """Test that a dimmed LED is fully on when PWM is disabled."""
+    worker = PWMWorker(Recorder(set()), 0)
+    worker.set_state(RED)
+    worker.set_brightness("owner", {RED: 64})
+
+    assert not worker.active
+    assert worker.thread is None
+    assert all(worker.output(slot) == RED for slot in range(RESOLUTION))
+
+
+def test_worker_thread() -> None:
+    """Test that the worker thread writes each change, and exits when idle."""
+    driver = Recorder(set())
+    worker = PWMWorker(driver, 200)
+    worker.set_state(RED | GREEN)
+    worker.set_brightness("owner", {RED: 128})
+    time.sleep(0.05)
+    worker.set_brightness("owner", {})
+
+    thread = worker.thread
+    if thread is not None:
+        thread.join(timeout=1)
+    assert worker.thread is None
+    assert {RED | GREEN, GREEN} <= set(driver.states)
+
+
+def test_writer() -> None:
+    """Test that the worker thread is the only writer while it is running."""
+    driver = Recorder(set())
+    writer = Recorder(set())
+    worker = PWMWorker(driver, 200, writer=writer)
+    worker.set_state(RED)
+    worker.set_brightness("owner", {RED: 128})
+    worker.set_state(RED | GREEN)
+    time.sleep(0.05)
+    worker.stop()
+
+    assert writer.states == [RED]
+    assert {RED | GREEN, GREEN} <= set(driver.states)
+
+
+@pytest.mark.asyncio
+async def test_colour_request(daemon: FakeKCHDaemon) -> None:
+    """Test that a colour request sets the state and brightness of the LEDs."""
+    controller = daemon.controller("request", MQTTRequestController)
+    request = KCHLEDUpdateManagerRequest(
+        sender_name="test",
+        uuid=uuid4(),
+        a=(True, True, True),
+        b=(True, False, False),
+        a_colour=(255, 64, 0),
+    )
+
+    response = await controller.handle_led_update(request)
+    await settle(daemon)
+
+    assert response.success
+    assert controller.get_state() == RED | GREEN | 1 << KCHLED.USER_B_RED.value
+    assert controller.get_brightness() == {GREEN: 64}
+    assert daemon._pwm.active
+
+
+def test_colour_request_validation() -> None:
+    """Test that a colour out of range is rejected."""
+    with pytest.raises(ValueError):
+        KCHLEDUpdateManagerRequest(sender_name="test", uuid=uuid4(), a_colour=(256, 0, 0))
@@ -0,0 +1,106 @@
+"""Test the registry of LED controllers."""
+import subprocess
+import sys
+from importlib.metadata import EntryPoint
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+from fakes import FakeKCHDaemon, settle
+
+from kchd.controllers import LEDController, registry
+from kchd.controllers.registry import ENTRY_POINT_GROUP, available_controllers
+from kchd.hardware import KCHLED, led_mask
+
+
+class BeaconController(LEDController):
+    """A site specific controller, which lights USER_A_RED."""
+
+    __slots__ = ()
+
+    leds = [KCHLED.USER_A_RED]
+    mask = led_mask(leds)
+
+    def get_state(self) -> int:
+        """Get the state of controlled LEDs."""
+        return self.mask
+
+
+@pytest.fixture
+def installed(monkeypatch: pytest.MonkeyPatch) -> Iterator[List[EntryPoint]]:
+    """The installed controllers, in place of those of the installed packages."""
+    entry_points: List[EntryPoint] = []
+
+    def fake_entry_points(**kwargs: object) -> object:
+        if sys.version_info >= (3, 10):
+            return entry_points
+        return {ENTRY_POINT_GROUP: entry_points}
+
+    monkeypatch.setattr(registry, "entry_points", fake_entry_points)
+    available_controllers.cache_clear()
+    yield entry_points
+    available_controllers.cache_clear()
+
+
+def kchd_config(tmp_path: Path, *controllers: str) -> str:
+    """Write a kchd config that enables some controllers."""
+    path = tmp_path / "kchd.toml"
+    path.write_text(f"controllers = {list(controllers)!r}\ntrace_records = 0\n")
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_only_enabled_controllers(tmp_path: Path) -> None:
+    """Test that only the enabled controllers are created."""
+    daemon = FakeKCHDaemon(kchd_config_file=kchd_config(tmp_path, "astwifid"))
+
+    daemon._mqtt.deliver("astprocd", '{"status": "RUNNING"}')
+    await settle(daemon)
+
+    assert list(daemon._controllers) == ["astwifid"]
+    assert daemon._leds == {KCHLED.WIFI}
+    assert daemon._metrics.messages_received == {}
+
+
+def test_unknown_controller(tmp_path: Path) -> None:
+    """Test that an unknown controller in the config is an error."""
+    with pytest.raises(ValueError, match="Unknown controller 'scoreboard'"):
+        FakeKCHDaemon(kchd_config_file=kchd_config(tmp_path, "status", "scoreboard"))
+
+
+@pytest.mark.asyncio
+async def test_installed_controller(tmp_path: Path, installed: List[EntryPoint]) -> None:
+    """Test that a controller can be installed with an entry point."""
+    value = f"{__name__}:BeaconController"
+    installed.append(EntryPoint("beacon", value, ENTRY_POINT_GROUP))
+    daemon = FakeKCHDaemon(kchd_config_file=kchd_config(tmp_path, "status", "beacon"))
+
+    await daemon.update_leds()
+
+    assert isinstance(daemon._controllers["beacon"], BeaconController)
+    assert daemon._state == BeaconController.mask
+
+
+def test_installed_controller_is_checked(installed: List[EntryPoint]) -> None:
+    """Test that an entry point that is not a controller is rejected."""
+    installed.append(EntryPoint("beacon", f"{__name__}:kchd_config", ENTRY_POINT_GROUP))
+    with pytest.raises(TypeError):
+        registry.load_controller("beacon", available_controllers())
+
+
+def test_controllers_are_not_imported() -> None:
+    """Test that importing the daemon does not import the built in controllers."""
+    code = (
+        "import sys, kchd.app; "
+        "print(sorted(m for m in sys.modules if m.startswith('kchd.controllers.')))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).parent.parent,
+    )
+    modules = result.stdout.strip()
+    for value in registry.BUILTIN_CONTROLLERS.values():
+        assert value.partition(":")[0] not in modules
@@ -0,0 +1,68 @@
+"""Test the system status controller."""
+from typing import List
+
+import pytest
+from fakes import FakeKCHDaemon, settle
+
+from kchd.controllers.decode import Fields, MessageDecoder, MessageSchema
+
+
+@pytest.mark.asyncio
+async def test_unknown_manager_is_not_decoded(
+    daemon: FakeKCHDaemon,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that messages from unused managers are dropped before decoding."""
+    decoded: List[str] = []
+    decode = MessageDecoder.decode
+
+    def record(
+        self: MessageDecoder,
+        topic: str,
+        payload: str,
+        schema: MessageSchema,
+    ) -> Fields:
+        decoded.append(payload)
+        return decode(self, topic, payload, schema)
+
+    monkeypatch.setattr(MessageDecoder, "decode", record)
+
+    daemon._mqtt.deliver("manager1", '{"status": "RUNNING"}')
+    daemon._mqtt.deliver("astdiskd", '{"status": "RUNNING", "disks": {}}')
+    await settle(daemon)
+
+    assert decoded == ['{"status": "RUNNING", "disks": {}}']
+    assert daemon._metrics.messages_ignored["astoria/manager1"] == 1
+    assert daemon._metrics.messages_ignored["astoria/astdiskd"] == 0
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        '{"disks": {}}',
+        '{"status": "EXPLODED"}',
+        '["RUNNING"]',
+    ],
+)
+@pytest.mark.asyncio
+async def test_bad_status_is_validation_failure(
+    daemon: FakeKCHDaemon,
+    payload: str,
+) -> None:
+    """Test that a missing or invalid status is counted as a validation failure."""
+    daemon._mqtt.deliver("astdiskd", payload)
+    await settle(daemon)
+
+    assert daemon._metrics.parse_failures["validation"] == 1
+    assert daemon._metrics.parse_failures["json"] == 0
+    assert daemon._driver.writes == []
+
+
+@pytest.mark.asyncio
+async def test_bad_json_is_json_failure(daemon: FakeKCHDaemon) -> None:
+    """Test that a payload that is not JSON is counted as a JSON failure."""
+    daemon._mqtt.deliver("astdiskd", "{")
+    await settle(daemon)
+
+    assert daemon._metrics.parse_failures["json"] == 1
+    assert daemon._metrics.parse_failures["validation"] == 0
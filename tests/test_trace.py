@@ -0,0 +1,103 @@
+"""Test the post-mortem trace."""
+import zlib
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+from fakes import FakeKCHDaemon, settle
+
+from kchd.cli import trace_cli
+from kchd.trace import TOPIC_SLOTS, TraceKind, Tracer, read_trace
+
+
+def test_round_trip(tmp_path: Path) -> None:
+    """Test that records are read back as they were written."""
+    path = tmp_path / "trace.bin"
+    tracer = Tracer(path, 16)
+    tracer.message("astoria/astprocd", '{"status": "RUNNING"}')
+    tracer.state(0x1000)
+    tracer.write(0x1000, 2e-6)
+    tracer.close()
+
+    message, state, write = read_trace(path)
+    assert message.kind is TraceKind.MESSAGE
+    assert message.topic == "astoria/astprocd"
+    assert message.value == zlib.crc32(b'{"status": "RUNNING"}')
+    assert message.extra == len('{"status": "RUNNING"}')
+    assert (state.kind, state.value) == (TraceKind.STATE, 0x1000)
+    assert (write.kind, write.value, write.extra) == (TraceKind.WRITE, 0x1000, 2000)
+    assert message.timestamp <= state.timestamp <= write.timestamp
+
+
+def test_ring_wraps(tmp_path: Path) -> None:
+    """Test that the oldest records are overwritten, and read in order."""
+    path = tmp_path / "trace.bin"
+    tracer = Tracer(path, 8)
+    for state in range(20):
+        tracer.state(state)
+    tracer.close()
+
+    records = read_trace(path)
+    assert [record.value for record in records] == list(range(12, 20))
+
+
+def test_topic_table_full(tmp_path: Path) -> None:
+    """Test that topics past the end of the table are recorded without a name."""
+    path = tmp_path / "trace.bin"
+    tracer = Tracer(path, TOPIC_SLOTS + 1)
+    for index in range(TOPIC_SLOTS + 1):
+        tracer.message(f"astoria/manager{index}", "")
+    tracer.close()
+
+    topics = [record.topic for record in read_trace(path)]
+    assert topics[-2:] == [f"astoria/manager{TOPIC_SLOTS - 1}", ""]
+
+
+def test_previous_trace_is_kept(tmp_path: Path) -> None:
+    """Test that the trace of the previous run is kept."""
+    path = tmp_path / "trace.bin"
+    Tracer(path, 4).state(1)
+    Tracer(path, 4).close()
+
+    assert read_trace(path) == []
+    assert read_trace(tmp_path / ("trace.bin" + Tracer.PREVIOUS_SUFFIX))[0].value == 1
+
+
+def test_disabled(tmp_path: Path) -> None:
+    """Test that nothing is written when tracing is disabled."""
+    tracer = Tracer(tmp_path / "trace.bin", 0)
+    tracer.message("astoria/astprocd", "{}")
+    tracer.state(1)
+    assert not tracer.enabled
+    assert not (tmp_path / "trace.bin").exists()
+
+
+def test_not_a_trace(tmp_path: Path) -> None:
+    """Test that a file that is not a trace is rejected."""
+    path = tmp_path / "trace.bin"
+    path.write_bytes(bytes(8192))
+    with pytest.raises(ValueError):
+        read_trace(path)
+
+
+@pytest.mark.asyncio
+async def test_daemon_trace(tmp_path: Path) -> None:
+    """Test that the daemon traces each message, state and write."""
+    path = tmp_path / "trace.bin"
+    daemon = FakeKCHDaemon(trace_path=path)
+    daemon._mqtt.deliver("astwifid", '{"status": "RUNNING", "hotspot_running": true}')
+    await settle(daemon)
+    daemon._tracer.close()
+
+    kinds = [(record.kind, record.topic) for record in read_trace(path)]
+    # The message is seen by both the astwifid and system status controllers.
+    assert kinds == [
+        (TraceKind.MESSAGE, "astoria/astwifid"),
+        (TraceKind.MESSAGE, "astoria/astwifid"),
+        (TraceKind.STATE, ""),
+        (TraceKind.WRITE, ""),
+    ]
+
+    result = CliRunner().invoke(trace_cli, [str(path)])
+    assert result.exit_code == 0
+    assert "astoria/astwifid" in result.output
@@ -0,0 +1,66 @@
+"""Test the streaming channel for the user LEDs."""
+import pytest
+from fakes import FakeKCHDaemon, settle
+
+from kchd.controllers.request import MQTTRequestController, is_newer_sequence
+from kchd.hardware import KCHLED, led_mask
+
+STREAM_TOPIC = "kchd/stream/leds"
+
+
+def test_is_newer_sequence() -> None:
+    """Test the comparison of sequence numbers, including wrapping."""
+    assert is_newer_sequence(2, 1)
+    assert not is_newer_sequence(1, 1)
+    assert not is_newer_sequence(1, 2)
+    assert is_newer_sequence(0, 2 ** 32 - 1)
+
+
+@pytest.mark.asyncio
+async def test_stream_frame(daemon: FakeKCHDaemon) -> None:
+    """Test that a frame sets the user LEDs."""
+    # USER_A_RED is bit 0 and START is bit 9
+    daemon._mqtt.deliver(STREAM_TOPIC, f"1,{1 | 1 << 9}")
+    await settle(daemon)
+
+    _, state = daemon._driver.writes[-1]
+    assert state == led_mask([KCHLED.USER_A_RED, KCHLED.START])
+
+
+@pytest.mark.asyncio
+async def test_stream_latest_wins(daemon: FakeKCHDaemon) -> None:
+    """Test that frames are coalesced, and that stale frames are dropped."""
+    for sequence in range(1, 11):
+        daemon._mqtt.deliver(STREAM_TOPIC, f"{sequence},{sequence}")
+    await settle(daemon)
+    daemon._mqtt.deliver(STREAM_TOPIC, "5,0")
+    await settle(daemon)
+
+    assert len(daemon._driver.writes) == 1
+    _, state = daemon._driver.writes[-1]
+    assert state == MQTTRequestController.stream_masks[10]
+    assert daemon._metrics.messages_superseded[f"astoria/{STREAM_TOPIC}"] == 9
+    assert daemon._metrics.messages_ignored[f"astoria/{STREAM_TOPIC}"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_restart(daemon: FakeKCHDaemon) -> None:
+    """Test that a sequence number of zero restarts the sequence."""
+    daemon._mqtt.deliver(STREAM_TOPIC, "100,1")
+    await settle(daemon)
+    daemon._mqtt.deliver(STREAM_TOPIC, "0,2")
+    await settle(daemon)
+
+    _, state = daemon._driver.writes[-1]
+    assert state == led_mask([KCHLED.USER_A_GREEN])
+
+
+@pytest.mark.asyncio
+async def test_stream_bad_frame(daemon: FakeKCHDaemon) -> None:
+    """Test that invalid frames are dropped."""
+    for payload in ("", "1", "1,2,3", "a,b", "1,1024", "-1,0"):
+        daemon._mqtt.deliver(STREAM_TOPIC, payload)
+        await settle(daemon)
+
+    assert daemon._driver.writes == []
+    assert daemon._metrics.parse_failures["stream"] == 6
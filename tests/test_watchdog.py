@@ -0,0 +1,76 @@
+"""Test the watchdog of the event loop."""
+import asyncio
+import time
+from typing import List
+
+import pytest
+from fakes import FakeKCHDaemon
+
+from kchd.app import LOOP_LAG_OVERRIDE, STATUS_MASK, STATUS_RED_MASK
+from kchd.controllers import AstprocdController
+from kchd.metrics import Histogram
+from kchd.watchdog import SUSTAINED_SAMPLES, LoopWatchdog
+
+
+def test_sustained_lag() -> None:
+    """Test that only lag that is sustained changes whether the loop is lagging."""
+    changes: List[bool] = []
+    lag = Histogram()
+    watchdog = LoopWatchdog(changes.append, interval=0.25, threshold=0.1, lag=lag)
+
+    for _ in range(SUSTAINED_SAMPLES - 1):
+        watchdog.sample(0.5)
+    watchdog.sample(0.0)
+    assert not watchdog.lagging
+
+    for _ in range(SUSTAINED_SAMPLES):
+        watchdog.sample(0.5)
+    assert watchdog.lagging
+
+    for _ in range(SUSTAINED_SAMPLES):
+        watchdog.sample(0.0)
+    assert not watchdog.lagging
+
+    assert changes == [True, False]
+    assert lag.count == 3 * SUSTAINED_SAMPLES
+
+
+@pytest.mark.asyncio
+async def test_blocked_loop() -> None:
+    """Test that a loop that is repeatedly blocked is detected as lagging."""
+    changes: List[bool] = []
+    watchdog = LoopWatchdog(changes.append, interval=0.01, threshold=0.01)
+    watchdog.start()
+    try:
+        for _ in range(SUSTAINED_SAMPLES * 2):
+            await asyncio.sleep(0.005)
+            time.sleep(0.03)
+    finally:
+        watchdog.stop()
+    assert changes[:1] == [True]
+
+
+@pytest.mark.asyncio
+async def test_disabled() -> None:
+    """Test that a threshold of zero disables the watchdog."""
+    watchdog = LoopWatchdog(lambda lagging: None, interval=0.01, threshold=0)
+    watchdog.start()
+    assert watchdog._task is None
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_signal(daemon: FakeKCHDaemon) -> None:
+    """Test that a lagging loop is shown on the STATUS LED, and in the status."""
+    daemon.controller("astprocd", AstprocdController)._state = STATUS_MASK
+    daemon.handle_loop_lag(True)
+    await daemon.update_leds()
+
+    assert daemon._state & STATUS_MASK == STATUS_RED_MASK
+    assert daemon.status.loop_lagging
+
+    daemon.handle_loop_lag(False)
+    await daemon.update_leds()
+
+    assert LOOP_LAG_OVERRIDE not in daemon._overrides
+    assert daemon._state & STATUS_MASK == STATUS_MASK
+    assert not daemon.status.loop_lagging